@@ -0,0 +1,3 @@
+"""
+Benchmarks of the add-on; see benchmark.base for how to run them.
+"""
@@ -0,0 +1,29 @@
+"""
+Run the benchmarks: python -m benchmark [module ...]
+"""
+
+import glob
+import os
+import sys
+import unittest
+
+
+def main(modules):
+    if not modules:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        modules = sorted(
+            os.path.basename(path)
+            for path in glob.glob(os.path.join(directory, "bench_*.py"))
+        )
+    loader = unittest.TestLoader()
+    loader.testMethodPrefix = "bench"
+    suite = loader.loadTestsFromNames(
+        [f"benchmark.{name.removesuffix('.py')}" for name in modules]
+    )
+    # The deprecation warnings of the dependencies would hide the results
+    result = unittest.TextTestRunner(verbosity=2, warnings="ignore").run(suite)
+    return not result.wasSuccessful()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
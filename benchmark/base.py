@@ -0,0 +1,129 @@
+"""
+Base class and decorator for the benchmarks of the add-on.
+
+The benchmarks are unittest test cases with methods named bench_* in files named
+bench_*.py, so they are not collected by the tests. Run them from the root of the
+repository with
+
+    python -m benchmark [name of a benchmark module, e.g. bench_widget_inputs]
+
+Each benchmarked method is called `warmup` times and then timed `repeat` times,
+`number` calls each; the mean and the standard deviation of the time per call
+are printed. Benchmarks of memory use `peak_memory`, which traces the allocations
+of Python and numpy.
+
+Benchmarks decorated with `benchmark_rows` are run on synthetic data of different
+sizes and report the time and the peak memory for each size. The numbers of rows
+are set with the environment variable BENCHMARK_ROWS, e.g.
+
+    BENCHMARK_ROWS=10000,10000000 python -m benchmark bench_evaluation
+"""
+
+import os
+import tracemalloc
+import unittest
+from functools import lru_cache, wraps
+from timeit import Timer
+
+import numpy as np
+
+from orangecontrib.fairness.synthetic import adult_like_data
+
+
+def benchmark(setup=None, number=10, repeat=3, warmup=1):
+    """
+    Decorator for the methods of Benchmark classes.
+
+    Args:
+        setup (str): the name of the method called before each repetition
+        number (int): the number of calls in a repetition
+        repeat (int): the number of repetitions
+        warmup (int): the number of calls before timing
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self):
+            for _ in range(warmup):
+                func(self)
+            timer = Timer(lambda: func(self), setup=getattr(self, setup or "", None) or "pass")
+            times = np.array(timer.repeat(repeat, number)) / number
+            self.report(func.__name__, times)
+
+        return wrapper
+
+    return decorator
+
+
+def benchmark_rows(number=1, repeat=3, warmup=1, max_rows=None, memory=True):
+    """
+    Decorator for the methods of Benchmark classes which benchmark data of different sizes.
+
+    The decorated method gets the number of rows, prepares the data (which is not timed)
+    and returns the function which is benchmarked.
+
+    Args:
+        number (int): the number of calls in a repetition
+        repeat (int): the number of repetitions
+        warmup (int): the number of calls before timing
+        max_rows (int): the largest number of rows this benchmark is run with
+        memory (bool): if true, the peak memory of a call is also reported
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self):
+            for n_rows in ROWS:
+                if max_rows is not None and n_rows > max_rows:
+                    continue
+                call = func(self, n_rows)
+                for _ in range(warmup):
+                    call()
+                name = f"{func.__name__}[{n_rows}]"
+                self.report(name, np.array(Timer(call).repeat(repeat, number)) / number)
+                if memory:
+                    self.report_memory(name, peak_memory(call))
+
+        return wrapper
+
+    return decorator
+
+
+# The numbers of rows of the data used by the benchmarks decorated with benchmark_rows
+ROWS = [
+    int(n_rows)
+    for n_rows in os.environ.get("BENCHMARK_ROWS", "10000,100000,1000000").split(",")
+]
+
+
+@lru_cache(maxsize=2)
+def adult_like_table(n_rows):
+    """Synthetic data like the Adult dataset with the fairness attributes"""
+    return adult_like_data(n_rows)
+
+
+def peak_memory(func):
+    """Call the function and return the peak memory (in bytes) allocated during the call"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Benchmark(unittest.TestCase):
+    """
+    Base class for benchmarks; the timings are printed with the name of the benchmark.
+    """
+
+    def report(self, name, times):
+        """Print the mean and the standard deviation of the times (in seconds)"""
+        print(
+            f"{type(self).__name__}.{name}: "
+            f"{np.mean(times) * 1000:.3f} ms +- {np.std(times) * 1000:.3f} ms"
+        )
+
+    def report_memory(self, name, size):
+        """Print the memory size (in bytes)"""
+        print(f"{type(self).__name__}.{name}: {size / 2 ** 20:.3f} MB")
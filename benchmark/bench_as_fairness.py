@@ -0,0 +1,72 @@
+"""
+Time and memory of the commits of the As Fairness Data widget on a large table.
+
+The output table shares the arrays with the input table, so a commit must not
+allocate memory proportional to the size of the data.
+"""
+
+import numpy as np
+
+from Orange.data import Table, Domain, ContinuousVariable, DiscreteVariable
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.widgets.owasfairness import OWAsFairness
+
+from benchmark.base import Benchmark, benchmark, peak_memory
+
+
+def large_table(n_rows=1_000_000, n_columns=20, seed=0):
+    """A table with `n_columns` numeric attributes, two categorical attributes and a class"""
+    rng = np.random.default_rng(seed)
+    domain = Domain(
+        [ContinuousVariable(f"x{i}") for i in range(n_columns)]
+        + [
+            DiscreteVariable("sex", values=("Female", "Male")),
+            DiscreteVariable("race", values=("A", "B", "C")),
+        ],
+        DiscreteVariable("y", values=("no", "yes")),
+    )
+    X = np.hstack(
+        (
+            rng.random((n_rows, n_columns)),
+            rng.integers(0, 2, (n_rows, 1)),
+            rng.integers(0, 3, (n_rows, 1)),
+        )
+    )
+    return Table.from_numpy(domain, X, rng.integers(0, 2, n_rows))
+
+
+class BenchAsFairness(Benchmark, WidgetTest):
+    """
+    Benchmarks of the As Fairness Data widget on a table with 1,000,000 rows.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = large_table()
+
+    def setUp(self):
+        self.widget = self.create_widget(OWAsFairness)
+        self.send_signal(self.widget.Inputs.data, self.data)
+
+    @benchmark(number=10)
+    def bench_commit(self):
+        """Annotate the data and send it to the output"""
+        self.widget.commit.now()
+
+    def bench_commit_memory(self):
+        """Check that a commit does not copy the arrays"""
+        size = peak_memory(self.widget.commit.now)
+        self.report_memory("bench_commit_memory", size)
+        self.assertLess(size, 0.01 * self.data.X.nbytes)
+
+        output = self.get_output(self.widget.Outputs.data)
+        self.assertTrue(np.shares_memory(output.X, self.data.X))
+        self.assertTrue(np.shares_memory(output.Y, self.data.Y))
+
+    def bench_transform_memory(self):
+        """The memory used by transforming the data, as done before, for comparison"""
+        output = self.get_output(self.widget.Outputs.data)
+        size = peak_memory(lambda: self.data.transform(output.domain))
+        self.report_memory("bench_transform_memory", size)
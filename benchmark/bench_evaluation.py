@@ -0,0 +1,106 @@
+"""
+Time and memory of the conversion to aif360 datasets, the fairness scorers
+and the Dataset Bias widget on synthetic data like the Adult dataset.
+"""
+
+import numpy as np
+
+from Orange.evaluation import Results
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.evaluation import scoring
+from orangecontrib.fairness.widgets.owdatasetbias import OWDatasetBias
+from orangecontrib.fairness.widgets.utils import table_to_standard_dataset
+
+from benchmark.base import ROWS, Benchmark, adult_like_table, benchmark_rows
+
+
+def random_results(data, seed=0):
+    """Test results of a model with random predictions"""
+    rng = np.random.default_rng(seed)
+    probabilities = rng.random((1, len(data)))
+    return Results(
+        data,
+        nmethods=1,
+        row_indices=np.arange(len(data)),
+        actual=data.Y,
+        predicted=(probabilities > 0.5).astype(float),
+        probabilities=np.stack((1 - probabilities, probabilities), axis=2),
+        store_data=True,
+    )
+
+
+class BenchConversion(Benchmark):
+    """
+    Benchmarks of the conversion of tables to aif360 StandardDatasets.
+    """
+
+    @benchmark_rows(max_rows=1_000_000)
+    def bench_table_to_standard_dataset(self, n_rows):
+        """Convert the whole table"""
+        data = adult_like_table(n_rows)
+        return lambda: table_to_standard_dataset(data)
+
+    @benchmark_rows(max_rows=1_000_000)
+    def bench_fairness_columns(self, n_rows):
+        """Convert only the class and the protected attribute"""
+        data = adult_like_table(n_rows)
+        return lambda: table_to_standard_dataset(data, fairness_columns_only=True)
+
+
+class BenchScorers(Benchmark):
+    """
+    Benchmarks of the fairness scorers on the results of a model.
+    """
+
+    @benchmark_rows(number=5)
+    def bench_statistical_parity_difference(self, n_rows):
+        results = random_results(adult_like_table(n_rows))
+        return lambda: scoring.StatisticalParityDifference(results)
+
+    @benchmark_rows(number=5)
+    def bench_equal_opportunity_difference(self, n_rows):
+        results = random_results(adult_like_table(n_rows))
+        return lambda: scoring.EqualOpportunityDifference(results)
+
+    @benchmark_rows(number=5)
+    def bench_average_odds_difference(self, n_rows):
+        results = random_results(adult_like_table(n_rows))
+        return lambda: scoring.AverageOddsDifference(results)
+
+    @benchmark_rows(number=5)
+    def bench_disparate_impact(self, n_rows):
+        results = random_results(adult_like_table(n_rows))
+        return lambda: scoring.DisparateImpact(results)
+
+    def bench_standard_dataset_size(self):
+        """The size of the StandardDataset the scorers converted the data to before"""
+        # The dataset was then subset by the row indices and copied, so the peak memory
+        # of the scorers was about three times this size
+        for n_rows in ROWS:
+            dataset, _, _ = table_to_standard_dataset(
+                adult_like_table(n_rows), fairness_columns_only=True
+            )
+            size = sum(
+                array.nbytes
+                for array in (
+                    dataset.features,
+                    dataset.labels,
+                    dataset.scores,
+                    dataset.protected_attributes,
+                    dataset.instance_weights,
+                )
+            )
+            self.report_memory(f"bench_standard_dataset_size[{n_rows}]", size)
+
+
+class BenchDatasetBias(Benchmark, WidgetTest):
+    """
+    Benchmarks of the computation of the bias in the Dataset Bias widget.
+    """
+
+    @benchmark_rows(number=5)
+    def bench_dataset_bias(self, n_rows):
+        widget = self.create_widget(OWDatasetBias)
+        data = adult_like_table(n_rows)
+        return lambda: self.send_signal(widget.Inputs.data, data, widget=widget)
@@ -0,0 +1,57 @@
+"""
+Time and memory of reading the fairness columns of a large table into a FairnessView,
+compared to converting them to an aif360 StandardDataset.
+"""
+
+from orangecontrib.fairness.widgets.utils import (
+    FairnessView,
+    as_fairness_data,
+    table_to_standard_dataset,
+)
+
+from benchmark.base import Benchmark, benchmark, peak_memory
+from benchmark.bench_as_fairness import large_table
+
+
+class BenchFairnessView(Benchmark):
+    """
+    Benchmarks of the FairnessView on a table with 1,000,000 rows.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = as_fairness_data(large_table(), "yes", "sex", ["Male"])
+
+    @benchmark(number=5)
+    def bench_view(self):
+        """Read the groups and the labels"""
+        FairnessView.from_table(self.data)
+
+    @benchmark(number=1)
+    def bench_standard_dataset(self):
+        """Convert the fairness columns to a StandardDataset, for comparison"""
+        table_to_standard_dataset(self.data, fairness_columns_only=True)
+
+    @benchmark(number=5)
+    def bench_dataset_bias(self):
+        """Compute the disparate impact and statistical parity difference"""
+        view = FairnessView.from_table(self.data)
+        view.disparate_impact()
+        view.statistical_parity_difference()
+
+    @benchmark(number=5)
+    def bench_reweighing(self):
+        """Fit the reweighing and compute the weights"""
+        view = FairnessView.from_table(self.data)
+        view.reweighed(view.reweighing_factors())
+
+    def bench_memory(self):
+        """Compare the peak memory of the view and the StandardDataset"""
+        view_size = peak_memory(lambda: FairnessView.from_table(self.data))
+        dataset_size = peak_memory(
+            lambda: table_to_standard_dataset(self.data, fairness_columns_only=True)
+        )
+        self.report_memory("bench_memory (view)", view_size)
+        self.report_memory("bench_memory (StandardDataset)", dataset_size)
+        self.assertLess(3 * view_size, dataset_size)
@@ -0,0 +1,292 @@
+"""
+Time and memory of fitting and predicting with the models of the add-on
+on synthetic data like the Adult dataset.
+
+The peak memory is traced by tracemalloc, which does not see the memory
+allocated by TensorFlow, so it is not reported for the adversarial debiasing.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import gettempdir
+from timeit import Timer
+
+import numpy as np
+
+from Orange.classification import LogisticRegressionLearner, RandomForestLearner
+from Orange.data import Domain, StringVariable, Table
+
+from orangecontrib.fairness.instrumentation import Tracer, tracing
+from orangecontrib.fairness.modeling.adversarial import AdversarialDebiasingLearner
+from orangecontrib.fairness.modeling.adversarial_network import table_to_arrays
+from orangecontrib.fairness.modeling.ensemble import (
+    AdversarialDebiasingEnsembleLearner,
+)
+from orangecontrib.fairness.modeling.parallel import available_cpus
+from orangecontrib.fairness.modeling.postprocessing import PostprocessingLearner
+from orangecontrib.fairness.modeling.weighted import WeightedLearner
+from orangecontrib.fairness.widgets.owreweighing import ReweighingTransform
+from orangecontrib.fairness.widgets.owweightedlogisticregression import (
+    WeightedLogisticRegressionLearner,
+)
+from orangecontrib.fairness.widgets.utils import get_weights_column
+
+from benchmark.base import (
+    ROWS,
+    Benchmark,
+    adult_like_table,
+    benchmark_rows,
+    peak_memory,
+)
+
+
+# Predictions are benchmarked with a model fitted on at most this many rows
+ROWS_FOR_FIT = 100_000
+
+
+class BenchPostprocessing(Benchmark):
+    """
+    Benchmarks of the equalized odds postprocessing of a logistic regression.
+    """
+
+    @benchmark_rows(max_rows=1_000_000)
+    def bench_fit(self, n_rows):
+        """Fit the model and the postprocessor (with 5-fold cross validation)"""
+        data = adult_like_table(n_rows)
+        learner = PostprocessingLearner(LogisticRegressionLearner(), repeatable=True)
+        return lambda: learner(data)
+
+    @benchmark_rows(number=5)
+    def bench_predict(self, n_rows):
+        """Predict with the postprocessed model"""
+        data = adult_like_table(n_rows)
+        model = PostprocessingLearner(LogisticRegressionLearner(), repeatable=True)(
+            adult_like_table(min(ROWS_FOR_FIT, n_rows))
+        )
+        return lambda: model(data)
+
+
+def epochs_per_second(n_rows, num_epochs=5, **params):
+    """
+    Fit the adversarial debiasing with the given parameters and return the
+    number of epochs per second (without building the graph).
+    """
+    data = adult_like_table(n_rows)
+    learner = AdversarialDebiasingLearner(num_epochs=num_epochs, seed=42, **params)
+    with tracing(Tracer()) as tracer:
+        learner(data)
+    seconds = sum(stage.seconds for stage in tracer.stages() if stage.name == "epoch")
+    return num_epochs / seconds
+
+
+class BenchAdversarialDebiasing(Benchmark):
+    """
+    Benchmarks of the adversarial debiasing.
+    """
+
+    @benchmark_rows(repeat=1, max_rows=1_000_000, memory=False)
+    def bench_epoch(self, n_rows):
+        """Fit the model with a single epoch (including building the graph)"""
+        data = adult_like_table(n_rows)
+        learner = AdversarialDebiasingLearner(num_epochs=1, seed=42)
+        return lambda: learner(data)
+
+    def bench_threads(self):
+        """
+        Epochs per second with 1, 2, 4, ... threads, up to the number of CPUs.
+
+        TensorFlow creates the pool of threads within operations once per process,
+        so each number of threads is run in a new process.
+        """
+        n_rows = min(ROWS_FOR_FIT, max(ROWS))
+        counts = [1]
+        while counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+        context = multiprocessing.get_context("spawn")
+        for threads in counts:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                rate = executor.submit(
+                    epochs_per_second,
+                    n_rows,
+                    intra_op_threads=threads,
+                    inter_op_threads=threads,
+                ).result()
+            print(
+                f"{type(self).__name__}.bench_threads[{n_rows}, {threads} threads]: "
+                f"{rate:.3f} epochs/s"
+            )
+
+    def bench_stream(self):
+        """
+        Rows per second of each epoch and the peak memory (of Python and numpy, not
+        TensorFlow) of the training on minibatches streamed from memory-mapped files,
+        compared with the training on the data in memory.
+        """
+        for n_rows in ROWS:
+            data = adult_like_table(n_rows)
+            for name, memmap_dir in (("in memory", None), ("streamed", gettempdir())):
+                learner = AdversarialDebiasingLearner(
+                    num_epochs=2, seed=42, memmap_dir=memmap_dir
+                )
+                model = None
+
+                def fit():
+                    nonlocal model
+                    model = learner(data)
+
+                size = peak_memory(fit)
+                prefix = f"{type(self).__name__}.bench_stream[{n_rows}, {name}]"
+                if memmap_dir is not None:
+                    for epoch, rate in enumerate(model._model.epoch_rows_per_second):
+                        print(f"{prefix}: epoch {epoch}: {rate:.0f} rows/s")
+                self.report_memory(f"bench_stream[{n_rows}, {name}]", size)
+
+    def bench_dtype(self):
+        """
+        Time and peak memory of converting the data to the arrays of the training and
+        of reweighing it with float64 (the default) and float32, and the epochs per
+        second of the training on the arrays of each dtype.
+        """
+        for n_rows in ROWS:
+            data = adult_like_table(n_rows)
+            for dtype in (np.float64, np.float32):
+                for stage, call in (
+                    ("table_to_arrays", lambda dtype=dtype: table_to_arrays(data, dtype)),
+                    ("reweighing", lambda dtype=dtype: ReweighingTransform(dtype)(data)),
+                ):
+                    name = f"bench_dtype[{n_rows}, {np.dtype(dtype).name}, {stage}]"
+                    self.report(name, Timer(call).repeat(3, 1))
+                    self.report_memory(name, peak_memory(call))
+
+        n_rows = min(ROWS_FOR_FIT, max(ROWS))
+        for dtype in (np.float64, np.float32):
+            rate = epochs_per_second(n_rows, dtype=dtype)
+            print(
+                f"{type(self).__name__}.bench_dtype[{n_rows}, {np.dtype(dtype).name}]: "
+                f"{rate:.3f} epochs/s"
+            )
+
+    def bench_ensemble(self):
+        """
+        Wall time of fitting an ensemble of 1, 2, 4, ... seeds (up to the number of
+        CPUs) in worker processes, compared with a single fit in this process.
+        """
+        n_rows = min(ROWS_FOR_FIT, max(ROWS))
+        data = adult_like_table(n_rows)
+        single = AdversarialDebiasingLearner(num_epochs=5, seed=42)
+        self.report(
+            f"bench_ensemble[{n_rows}, single]", Timer(lambda: single(data)).repeat(1, 1)
+        )
+        num_seeds = 1
+        while num_seeds <= available_cpus():
+            learner = AdversarialDebiasingEnsembleLearner(
+                num_seeds=num_seeds, num_epochs=5, seed=42
+            )
+            self.report(
+                f"bench_ensemble[{n_rows}, {num_seeds} seeds]",
+                Timer(lambda learner=learner: learner(data)).repeat(1, 1),
+            )
+            num_seeds *= 2
+
+    def bench_continue_fit(self):
+        """
+        Wall time of increasing the number of epochs from 5 to 10 by continuing the
+        training of the fitted model, compared with fitting a new model for 10 epochs.
+        """
+        n_rows = min(ROWS_FOR_FIT, max(ROWS))
+        data = adult_like_table(n_rows)
+        model = AdversarialDebiasingLearner(num_epochs=5, seed=42)(data)
+        learner = AdversarialDebiasingLearner(num_epochs=10, seed=42)
+        self.report(
+            f"bench_continue_fit[{n_rows}, refit]",
+            Timer(lambda: learner(data)).repeat(1, 1),
+        )
+        self.report(
+            f"bench_continue_fit[{n_rows}, continued]",
+            Timer(lambda: learner.continue_fit(model, data)).repeat(1, 1),
+        )
+
+    def bench_workers(self):
+        """
+        Epochs per second of the data-parallel training with 1, 2, 4, ... processes,
+        up to the number of CPUs, in the deterministic mode.
+
+        The processes synchronize at every minibatch, so the minibatches are larger
+        than the default, where the synchronization would take most of the time.
+        """
+        n_rows = min(ROWS_FOR_FIT, max(ROWS))
+        counts = [1]
+        while counts[-1] * 2 <= available_cpus():
+            counts.append(counts[-1] * 2)
+        for num_workers in counts:
+            rate = epochs_per_second(
+                n_rows, batch_size=1024, num_workers=num_workers, deterministic=True
+            )
+            print(
+                f"{type(self).__name__}.bench_workers[{n_rows}, {num_workers} processes]: "
+                f"{rate:.3f} epochs/s"
+            )
+
+
+class BenchWeightedLogisticRegression(Benchmark):
+    """
+    Benchmarks of the logistic regression with the weights from the reweighing.
+    """
+
+    @benchmark_rows()
+    def bench_fit(self, n_rows):
+        """Fit the model on reweighed data"""
+        data = ReweighingTransform()(adult_like_table(n_rows))
+        learner = WeightedLogisticRegressionLearner()
+        return lambda: learner(data)
+
+    def bench_weights_column(self):
+        """Read the weights from reweighed data with more and more string metas"""
+        data = ReweighingTransform()(adult_like_table(100_000))
+        weights = data.get_column("weights")
+        for n_metas in (0, 10, 100):
+            domain = data.domain
+            metas = tuple(StringVariable(f"s{i}") for i in range(n_metas))
+            table_metas = np.full((len(data), n_metas + 1), "text", dtype=object)
+            table_metas[:, n_metas] = weights
+            table = Table.from_numpy(
+                Domain(domain.attributes, domain.class_vars, metas + domain.metas[-1:]),
+                data.X,
+                data.Y,
+                table_metas,
+            )
+            times = np.array(Timer(lambda: get_weights_column(table)).repeat(3, 10))
+            self.report(f"bench_weights_column[{n_metas} string metas]", times / 10)
+            # The previous implementation sliced the table to get the column
+            times = np.array(
+                Timer(lambda: table[:, "weights"].metas[:, 0]).repeat(3, 10)
+            )
+            self.report(f"bench_table_slice[{n_metas} string metas]", times / 10)
+
+
+class BenchWeightedLearner(Benchmark):
+    """
+    Benchmarks of a random forest fitted with the weights from the reweighing,
+    passed as the sample_weight or used to resample the data.
+    """
+
+    @staticmethod
+    def fit(n_rows, resample):
+        data = ReweighingTransform()(adult_like_table(n_rows))
+        learner = WeightedLearner(
+            RandomForestLearner(n_estimators=10, random_state=0),
+            resample=resample,
+            repeatable=True,
+        )
+        return lambda: learner(data)
+
+    @benchmark_rows(max_rows=ROWS_FOR_FIT)
+    def bench_weighted_fit(self, n_rows):
+        """Fit with the weights as the sample_weight"""
+        return self.fit(n_rows, resample=False)
+
+    @benchmark_rows(max_rows=ROWS_FOR_FIT)
+    def bench_resampled_fit(self, n_rows):
+        """Fit on a sample drawn with the probabilities proportional to the weights"""
+        return self.fit(n_rows, resample=True)
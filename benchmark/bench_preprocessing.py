@@ -0,0 +1,26 @@
+"""
+Time and memory of the reweighing on synthetic data like the Adult dataset.
+"""
+
+from orangecontrib.fairness.widgets.owreweighing import ReweighingTransform
+
+from benchmark.base import Benchmark, adult_like_table, benchmark_rows
+
+
+class BenchReweighing(Benchmark):
+    """
+    Benchmarks of the reweighing preprocessor.
+    """
+
+    @benchmark_rows()
+    def bench_fit(self, n_rows):
+        """Fit the reweighing and add the weights to the data"""
+        data = adult_like_table(n_rows)
+        return lambda: ReweighingTransform()(data)
+
+    @benchmark_rows()
+    def bench_compute_value(self, n_rows):
+        """Compute the weights of new data with the fitted reweighing"""
+        data = adult_like_table(n_rows)
+        domain = ReweighingTransform()(data).domain
+        return lambda: data.transform(domain)
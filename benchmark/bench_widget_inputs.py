@@ -0,0 +1,116 @@
+"""
+Latency of the input checks done by the fairness widgets when they receive a signal.
+
+The handlers are decorated with the same stack of checks as the data input of the
+Adversarial Debiasing widget. A new table with a new domain measures the first signal,
+sending the same table again measures the cached checks.
+
+The fingerprints of the tables, by which the widgets find the models they already
+fitted, are benchmarked separately.
+"""
+
+import numpy as np
+
+from Orange.classification import LogisticRegressionLearner
+from Orange.data import Table, Domain, ContinuousVariable, DiscreteVariable
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.modeling.postprocessing import ThresholdOptimizerLearner
+from orangecontrib.fairness.widgets.owreweighing import OWReweighing
+from orangecontrib.fairness.widgets.utils import (
+    check_for_tensorflow,
+    check_fairness_data,
+    check_for_reweighted_data,
+    check_for_missing_values,
+    check_data_structure,
+    model_cache_key,
+    ModelCache,
+    _table_fingerprint,
+)
+
+from benchmark.base import Benchmark, adult_like_table, benchmark, benchmark_rows
+
+
+def wide_fairness_table(n_rows=1000, n_columns=10000, seed=0):
+    """A table with `n_columns` numeric attributes, a protected attribute and a class"""
+    rng = np.random.default_rng(seed)
+    protected = DiscreteVariable("sex", values=("Female", "Male"))
+    protected.attributes["privileged_pa_values"] = ["Male"]
+    class_var = DiscreteVariable("y", values=("no", "yes"))
+    class_var.attributes["favorable_class_value"] = "yes"
+    domain = Domain(
+        [ContinuousVariable(f"x{i}") for i in range(n_columns)] + [protected],
+        class_var,
+    )
+    X = np.hstack(
+        (rng.random((n_rows, n_columns)), rng.integers(0, 2, (n_rows, 1)))
+    )
+    return Table.from_numpy(domain, X, rng.integers(0, 2, n_rows))
+
+
+@check_for_tensorflow
+@check_fairness_data
+@check_for_reweighted_data
+@check_for_missing_values
+@check_data_structure
+def handler(widget, data):
+    """A handler which only runs the input checks"""
+    return data
+
+
+class BenchWidgetInputs(Benchmark, WidgetTest):
+    """
+    Benchmarks of the input checks on a table with 10,000 columns.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = wide_fairness_table()
+
+    def setUp(self):
+        self.widget = self.create_widget(OWReweighing)
+
+    def new_table(self):
+        """Create a table with a new domain, so nothing is cached"""
+        domain = self.data.domain
+        self.fresh_data = self.data.transform(
+            Domain(domain.attributes, domain.class_vars, domain.metas)
+        )
+
+    @benchmark(setup="new_table", number=1, repeat=5, warmup=0)
+    def bench_first_signal(self):
+        """Checks of a table which was not seen before"""
+        handler(self.widget, self.fresh_data)
+
+    @benchmark(number=100)
+    def bench_repeated_signal(self):
+        """Checks of a table which was already checked"""
+        handler(self.widget, self.data)
+
+    @benchmark(number=100)
+    def bench_no_data(self):
+        """Checks when the input is removed"""
+        handler(self.widget, None)
+
+
+class BenchModelCache(Benchmark):
+    """
+    Benchmarks of the fingerprints of the tables and of a fit taken from the cache.
+    """
+
+    @benchmark_rows(memory=False)
+    def bench_fingerprint(self, n_rows):
+        """Fingerprint of a table which was not seen before"""
+        data = adult_like_table(n_rows)
+        return lambda: _table_fingerprint(data)
+
+    @benchmark_rows(number=10, memory=False)
+    def bench_cached_fit(self, n_rows):
+        """Key of the fit (of a fingerprinted table) and the model from the cache"""
+        data = adult_like_table(n_rows)
+        learner = ThresholdOptimizerLearner(LogisticRegressionLearner())
+        cache = ModelCache()
+        cache.put(model_cache_key(learner, data), learner(data))
+        return lambda: cache.get(model_cache_key(learner, data))
+
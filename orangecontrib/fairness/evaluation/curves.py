@@ -0,0 +1,257 @@
+"""
+This module contains the FairnessCurves class, which computes fairness and accuracy
+metrics of a model for every decision threshold at once.
+
+Computing the fairness scores for many thresholds by re-thresholding the predictions
+and calling the FairnessScorer for each of them converts the data once per threshold.
+Instead, the scores of each group are sorted once and cumulative sums of the true
+labels are used to get the confusion matrices of the groups at all thresholds.
+"""
+
+import numpy as np
+
+from orangecontrib.fairness.widgets.utils import (
+    contains_fairness_attributes,
+    get_instance_weights,
+    get_privileged_mask,
+    get_favorable_class_index,
+    MISSING_FAIRNESS_ATTRIBUTES,
+)
+
+
+__all__ = ["FairnessCurves", "SortedScores", "GroupConfusion"]
+
+
+class GroupConfusion:
+    """
+    Confusion matrix counts of one group for a vector of thresholds.
+
+    With instance weights, the counts are the sums of the weights of the instances.
+
+    Attributes:
+        tot (int): number of instances in the group
+        p (int): number of instances with the favorable class in the group
+        n (int): number of instances with the unfavorable class in the group
+        tp, fp, tn, fn (np.ndarray): counts for each of the thresholds
+    """
+
+    def __init__(self, cumulative_positives, below, cumulative_weights=None):
+        if cumulative_weights is None:
+            self.tot = len(cumulative_positives) - 1
+            below_count = below
+        else:
+            self.tot = cumulative_weights[-1]
+            below_count = cumulative_weights[below]
+        self.p = cumulative_positives[-1]
+        self.n = self.tot - self.p
+        self.fn = cumulative_positives[below]
+        self.tn = below_count - self.fn
+        self.tp = self.p - self.fn
+        self.fp = self.n - self.tn
+
+    def selection_rate(self):
+        """Proportion of instances classified as favorable"""
+        return _divide(self.tp + self.fp, self.tot)
+
+    def tpr(self):
+        """True positive rate"""
+        return _divide(self.tp, self.p)
+
+    def fpr(self):
+        """False positive rate"""
+        return _divide(self.fp, self.n)
+
+    def tnr(self):
+        """True negative rate"""
+        return _divide(self.tn, self.n)
+
+
+class SortedScores:
+    """
+    Predicted probabilities of one group, sorted once.
+
+    The sorted probabilities and the cumulative number of instances with the favorable
+    class give the confusion matrix for any vector of thresholds with a binary search.
+
+    Arguments:
+        ytrue (np.ndarray): boolean vector, true if the instance has the favorable class
+        probs (np.ndarray): vector of predicted probabilities of the favorable class
+        weights (np.ndarray): vector of instance weights, None to count the instances
+    """
+
+    def __init__(self, ytrue, probs, weights=None):
+        sortind = np.argsort(probs, kind="stable")
+        self.probs = probs[sortind]
+        if weights is None:
+            self.cumulative_weights = None
+            self.cumulative_positives = np.hstack(([0], np.cumsum(ytrue[sortind])))
+        else:
+            weights = weights[sortind]
+            self.cumulative_weights = np.hstack(([0], np.cumsum(weights)))
+            self.cumulative_positives = np.hstack(
+                ([0], np.cumsum(np.where(ytrue[sortind], weights, 0)))
+            )
+
+    def confusion(self, thresholds, inclusive=True):
+        """
+        Compute the confusion matrices for the given thresholds.
+
+        Args:
+            thresholds (np.ndarray): vector of thresholds
+            inclusive (bool): if true, instances with probabilities equal to the
+                threshold are classified as favorable, otherwise as unfavorable
+
+        Returns:
+            confusion (GroupConfusion)
+        """
+        # The number of instances classified as unfavorable
+        below = np.searchsorted(
+            self.probs, thresholds, side="left" if inclusive else "right"
+        )
+        return GroupConfusion(
+            self.cumulative_positives, below, self.cumulative_weights
+        )
+
+
+def _divide(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.true_divide(a, b)
+
+
+class FairnessCurves:
+    """
+    Computation of fairness curves (SPD, EOD, AOD, DI) and the accuracy curve.
+
+    Attribute `thresholds` contains the ordered predicted probabilities of the favorable
+    class and all curves represent the scores of a classifier which classifies an instance
+    as favorable if its probability equals or exceeds the threshold, that is `spd()[i]`
+    is the statistical parity difference of the classifier with the threshold
+    `thresholds[i]`. This follows the conventions of Orange's `Curves`.
+
+    The scores of each group are sorted once, so all the curves are computed in
+    O(n log n) time regardless of the number of thresholds. With instance weights,
+    the rates are the proportions of the weights instead of the counts.
+
+    Arguments:
+        ytrue (np.ndarray): boolean vector, true if the instance has the favorable class
+        probs (np.ndarray): vector of predicted probabilities of the favorable class
+        privileged (np.ndarray): boolean vector, true if the instance is privileged
+        weights (np.ndarray): vector of instance weights, None to count the instances
+
+    Attributes:
+        thresholds (np.ndarray): ordered vector of thresholds
+        privileged (GroupConfusion): counts for the privileged group
+        unprivileged (GroupConfusion): counts for the unprivileged group
+    """
+
+    def __init__(self, ytrue, probs, privileged, weights=None):
+        ytrue = np.asarray(ytrue, dtype=bool)
+        probs = np.asarray(probs, dtype=float)
+        privileged = np.asarray(privileged, dtype=bool)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+
+        self.thresholds = np.hstack((np.sort(probs), [1]))
+        self.privileged, self.unprivileged = (
+            SortedScores(
+                ytrue[mask], probs[mask], None if weights is None else weights[mask]
+            ).confusion(self.thresholds)
+            for mask in (privileged, ~privileged)
+        )
+        self.tot = self.privileged.tot + self.unprivileged.tot
+
+    @classmethod
+    def from_results(cls, results, model_index=None):
+        """
+        Construct an instance of `FairnessCurves` from test results.
+
+        The results must contain the data (`store_data=True`) with the fairness
+        attributes, which are used to get the groups, the favorable class and the
+        instance weights (see get_instance_weights). Instances with missing class
+        values or predicted probabilities are removed.
+
+        Args:
+            results (Results): test results
+            model_index (int): model index; if there is only one model, this
+                argument can be omitted
+
+        Returns:
+            curves (FairnessCurves)
+        """
+        if results.data is None:
+            raise ValueError("Results do not contain the data.")
+        if not contains_fairness_attributes(results.data.domain):
+            raise ValueError(MISSING_FAIRNESS_ATTRIBUTES)
+        if model_index is None:
+            if results.probabilities.shape[0] != 1:
+                raise ValueError(
+                    "Argument 'model_index' is required when there are multiple models"
+                )
+            model_index = 0
+
+        favorable_class = get_favorable_class_index(results.data.domain)
+        # Rows can be used multiple times (or not at all), so the groups
+        # are read for the whole data and then gathered by the row indices
+        privileged = get_privileged_mask(results.data)[results.row_indices]
+        actual = results.actual
+        probs = results.probabilities[model_index, :, favorable_class]
+        weights = get_instance_weights(results.data)
+        if weights is not None:
+            weights = weights[results.row_indices]
+
+        nans = np.isnan(actual) | np.isnan(probs)
+        if nans.any():
+            actual, probs, privileged = actual[~nans], probs[~nans], privileged[~nans]
+            if weights is not None:
+                weights = weights[~nans]
+        return cls(actual == favorable_class, probs, privileged, weights)
+
+    def ca(self):
+        """Classification accuracy curve"""
+        correct = (
+            self.privileged.tp
+            + self.privileged.tn
+            + self.unprivileged.tp
+            + self.unprivileged.tn
+        )
+        return _divide(correct, self.tot)
+
+    def selection_rates(self):
+        """Selection rate curves of the unprivileged and privileged group"""
+        return self.unprivileged.selection_rate(), self.privileged.selection_rate()
+
+    def tprs(self):
+        """True positive rate curves of the unprivileged and privileged group"""
+        return self.unprivileged.tpr(), self.privileged.tpr()
+
+    def fprs(self):
+        """False positive rate curves of the unprivileged and privileged group"""
+        return self.unprivileged.fpr(), self.privileged.fpr()
+
+    def spd(self):
+        """Statistical parity difference curve"""
+        unprivileged, privileged = self.selection_rates()
+        return unprivileged - privileged
+
+    def di(self):
+        """
+        Disparate impact curve
+
+        The value is undefined (nan or inf) at thresholds at which
+        no instance from the privileged group is classified as favorable.
+        """
+        unprivileged, privileged = self.selection_rates()
+        return _divide(unprivileged, privileged)
+
+    def eod(self):
+        """Equal opportunity difference curve"""
+        unprivileged, privileged = self.tprs()
+        return unprivileged - privileged
+
+    def aod(self):
+        """Average odds difference curve"""
+        tpr_unprivileged, tpr_privileged = self.tprs()
+        fpr_unprivileged, fpr_privileged = self.fprs()
+        return 0.5 * (
+            (fpr_unprivileged - fpr_privileged) + (tpr_unprivileged - tpr_privileged)
+        )
@@ -2,25 +2,32 @@
 This module contains classes for computing fairness scores.
 
 Classes:
+- FairnessResult
 - StatisticalParityDifference
 - EqualOpportunityDifference
 - AverageOddsDifference
 - DisparateImpact
 """
 
-from abc import abstractmethod
+from warnings import warn
+
+import numpy as np
+
 from Orange.data import DiscreteVariable, ContinuousVariable, Domain
 from Orange.evaluation.scoring import Score
 
-from aif360.metrics import ClassificationMetric
-
+from orangecontrib.fairness.instrumentation import span
 from orangecontrib.fairness.widgets.utils import (
-    table_to_standard_dataset,
+    DEFAULT_DTYPE,
     contains_fairness_attributes,
+    fairness_view,
+    get_favorable_class_index,
+    table_to_standard_dataset,
 )
 
 
 __all__ = [
+    "FairnessResult",
     "StatisticalParityDifference",
     "EqualOpportunityDifference",
     "AverageOddsDifference",
@@ -28,14 +35,115 @@ __all__ = [
 ]
 
 
+class FairnessResult:
+    """
+    The parts of the test results which the fairness scores are computed from.
+
+    The fairness scores only need the group, the true and the predicted class of each
+    instance, so instead of keeping copies of the data they use these compact arrays
+    (3 bytes per instance and model). The scores of all models are computed at once
+    from the weighted confusion matrices of the groups.
+
+    Attributes:
+        groups (np.ndarray): int8 vector, 1 for the privileged and 0 for the unprivileged
+            instances
+        actual (np.ndarray): int8 vector, 1 for the instances with the favorable class,
+            0 for the unfavorable and -1 for the unknown class
+        predicted (np.ndarray): int8 array (models x instances), 1 if the model predicted
+            the favorable class and 0 otherwise
+        weights (np.ndarray or None): vector of instance weights, float64 by default
+    """
+
+    __slots__ = ("groups", "actual", "predicted", "weights")
+
+    def __init__(self, groups, actual, predicted, weights=None):
+        self.groups = groups
+        self.actual = actual
+        self.predicted = predicted
+        self.weights = weights
+
+    @classmethod
+    def from_results(cls, results, dtype=DEFAULT_DTYPE):
+        """
+        Construct the fairness result from the test results, which must contain
+        the data (`store_data=True`) with the fairness attributes.
+
+        Args:
+            results (Results): the test results
+            dtype (np.dtype): the dtype of the weights
+        """
+        favorable_class = get_favorable_class_index(results.data.domain)
+        # Rows can be used multiple times (or not at all), e.g. in bootstrap or leave
+        # one out, so the int8 codes are read once for the whole data and then gathered
+        # by the row indices; no data of the length of the row indices is converted
+        view = fairness_view(results.data, dtype).subset(results.row_indices)
+        predicted = (results.predicted == favorable_class).astype(np.int8)
+        return cls(view.groups, view.labels, predicted, view.weights)
+
+    def confusion(self):
+        """
+        Return the weighted confusion matrices of the groups for each model.
+
+        Returns:
+            counts (np.ndarray): float64 array indexed by the model, the group, the
+                true class (unknown, unfavorable, favorable) and the predicted class
+        """
+        # The cells of the confusion matrices fit in int8, so no large temporary arrays
+        # are made, except for the one bincount casts its input to
+        cells = 6 * self.groups + 2 * (self.actual + 1)
+        counts = [
+            np.bincount(cells + predicted, self.weights, minlength=12)
+            for predicted in self.predicted
+        ]
+        return np.array(counts, dtype=float).reshape(-1, 2, 3, 2)
+
+    def _rates(self):
+        """Return the selection rates, true positive and false positive rates
+        of the groups (the last axis) for each model"""
+        counts = self.confusion()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            selection = counts[..., 1].sum(axis=2) / counts.sum(axis=(2, 3))
+            tpr = counts[:, :, 2, 1] / counts[:, :, 2].sum(axis=2)
+            fpr = counts[:, :, 1, 1] / counts[:, :, 1].sum(axis=2)
+        return selection, tpr, fpr
+
+    def statistical_parity_difference(self):
+        """Difference of the selection rates of the unprivileged and privileged group"""
+        selection, _, _ = self._rates()
+        return selection[:, 0] - selection[:, 1]
+
+    def disparate_impact(self):
+        """Ratio of the selection rates of the unprivileged and privileged group"""
+        selection, _, _ = self._rates()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return selection[:, 0] / selection[:, 1]
+
+    def equal_opportunity_difference(self):
+        """Difference of the true positive rates of the unprivileged and privileged group"""
+        _, tpr, _ = self._rates()
+        return tpr[:, 0] - tpr[:, 1]
+
+    def average_odds_difference(self):
+        """Average of the differences of the false and true positive rates"""
+        _, tpr, fpr = self._rates()
+        return 0.5 * ((fpr[:, 0] - fpr[:, 1]) + (tpr[:, 0] - tpr[:, 1]))
+
+
 class FairnessScorer(Score, abstract=True):
     """
     Abstract class for computing fairness scores.
 
     Abstract class which will allow fairness scores to be calculated and displayed.
-    Subclasses need to implement the metric method which will return the fairness score.
+    Subclasses need to implement the result_metric method which will return the fairness
+    scores. Subclasses which only implement the deprecated metric method, which takes an
+    aif360 ClassificationMetric, are still computed from a ClassificationMetric.
+
+    Attributes:
+        dtype (np.dtype): the dtype of the weights the scores are computed with
     """
 
+    dtype = DEFAULT_DTYPE
+
     class_types = (
         DiscreteVariable,
         ContinuousVariable,
@@ -52,20 +160,40 @@ class FairnessScorer(Score, abstract=True):
         """
         return contains_fairness_attributes(domain)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__()
+        if "metric" in cls.__dict__ and "result_metric" not in cls.__dict__:
+            warn(
+                f"{cls.__name__}.metric(classification_metric) is deprecated; "
+                "implement result_metric(result), which takes a FairnessResult",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+
     def compute_score(self, results):
         """
-        Creates a ClassificationMetric object used to compute fairness scores
+        Computes the fairness scores of all models from the FairnessResult
 
         Args:
             results (Results): The results of the model.
         """
+        with span(f"score: {self.name}", models=len(results.predicted)):
+            if type(self).result_metric is FairnessScorer.result_metric:
+                return self._classification_metric_score(results)
+            return list(
+                self.result_metric(FairnessResult.from_results(results, self.dtype))
+            )
+
+    def _classification_metric_score(self, results):
+        """
+        Computes the fairness score with the deprecated metric method from an aif360
+        ClassificationMetric, as before the FairnessResult
+        """
+        from aif360.metrics import ClassificationMetric
 
         dataset, privileged_groups, unprivileged_groups = table_to_standard_dataset(
             results.data
         )
-
-        # We need to subset the created dataset so that it will match the shape/order
-        # This is needed when/if some of the rows in the data were used multiple times
         dataset = dataset.subset(results.row_indices)
         dataset_pred = dataset.copy()
         dataset_pred.labels = results.predicted
@@ -78,10 +206,21 @@ class FairnessScorer(Score, abstract=True):
         )
         return [self.metric(classification_metric)]
 
-    @abstractmethod
+    def result_metric(self, result):
+        """
+        Method that needs to be implemented by subclasses.
+
+        It should return the fairness scores of all models.
+
+        Args:
+            result (FairnessResult):
+                The FairnessResult object used to compute fairness scores.
+        """
+        raise NotImplementedError
+
     def metric(self, classification_metric):
         """
-        Abstract method that needs to be implemented by subclasses.
+        Deprecated: implement result_metric instead.
 
         It should return the fairness score.
 
@@ -89,7 +228,7 @@ class FairnessScorer(Score, abstract=True):
             classification_metric (ClassificationMetric):
                 The ClassificationMetric object used to compute fairness scores.
         """
-        pass
+        raise NotImplementedError
 
 
 class StatisticalParityDifference(FairnessScorer):
@@ -107,8 +246,8 @@ class StatisticalParityDifference(FairnessScorer):
         "</ul>"
     )
 
-    def metric(self, classification_metric):
-        return classification_metric.statistical_parity_difference()
+    def result_metric(self, result):
+        return result.statistical_parity_difference()
 
 
 class EqualOpportunityDifference(FairnessScorer):
@@ -126,8 +265,8 @@ class EqualOpportunityDifference(FairnessScorer):
         "</ul>"
     )
 
-    def metric(self, classification_metric):
-        return classification_metric.equal_opportunity_difference()
+    def result_metric(self, result):
+        return result.equal_opportunity_difference()
 
 
 class AverageOddsDifference(FairnessScorer):
@@ -146,8 +285,8 @@ class AverageOddsDifference(FairnessScorer):
         "</ul>"
     )
 
-    def metric(self, classification_metric):
-        return classification_metric.average_odds_difference()
+    def result_metric(self, result):
+        return result.average_odds_difference()
 
 
 class DisparateImpact(FairnessScorer):
@@ -169,5 +308,5 @@ class DisparateImpact(FairnessScorer):
     # TODO: When using randomize, models sometimes predict the same class for all instances
     # This can lead to division by zero in the Disparate Impact score
     # and untrue results for the other scores.
-    def metric(self, classification_metric):
-        return classification_metric.disparate_impact()
+    def result_metric(self, result):
+        return result.disparate_impact()
@@ -0,0 +1,266 @@
+"""
+This module contains the instrumentation of the add-on: named spans and counters
+around the stages of the conversion, fitting and scoring.
+
+The instrumentation is disabled by default, in which case a span only checks a
+global variable and returns a shared no-op context manager. It is enabled
+
+- within the `tracing` context manager, which records into a Tracer, or
+- for the whole session by setting the environment variable ORANGE_FAIRNESS_TRACE
+  to the path of a file, where the trace is saved when Python exits. The trace is
+  in the Chrome trace format (which can be opened in chrome://tracing or Perfetto)
+  unless ORANGE_FAIRNESS_TRACE_FORMAT is set to "json".
+
+Example:
+    >>> with tracing() as tracer:
+    ...     model = learner(data)
+    >>> print(tracer.summary())
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+
+__all__ = ["Tracer", "span", "count", "merge", "tracing", "recording", "enabled"]
+
+
+TRACE_ENV = "ORANGE_FAIRNESS_TRACE"
+TRACE_FORMAT_ENV = "ORANGE_FAIRNESS_TRACE_FORMAT"
+
+SpanEvent = namedtuple("SpanEvent", ("name", "start", "duration", "thread", "args"))
+Stage = namedtuple("Stage", ("name", "calls", "seconds"))
+
+# The tracers which record the spans and counters; a tuple, so spans from
+# other threads can iterate over it while tracing starts or stops
+_active = ()
+_active_lock = threading.Lock()
+
+# The context manager returned by span when the instrumentation is disabled
+_DISABLED = nullcontext()
+
+
+class Tracer:
+    """
+    A recorder of spans and counters.
+
+    Attributes:
+        events (list of SpanEvent): the recorded spans; the start and the duration
+            are in nanoseconds, the start is relative to the creation of the tracer
+        counters (dict): the values of the counters
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end, args):
+        """Record a span which started and ended at the given times (in nanoseconds)"""
+        self.events.append(
+            SpanEvent(
+                name, start - self.origin, end - start, threading.get_ident(), args
+            )
+        )
+
+    def add_count(self, name, value):
+        """Add the value to the counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        """
+        Add the spans and counters of another tracer, e.g. one from a worker process.
+
+        The times of both tracers come from the same monotonic clock, so the spans
+        are only shifted to the origin of this tracer.
+        """
+        shift = other.origin - self.origin
+        self.events.extend(
+            event._replace(start=event.start + shift) for event in other.events
+        )
+        for name, value in other.counters.items():
+            self.add_count(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def stages(self):
+        """
+        Return the number of calls and the total time of each named span,
+        in the order of their first occurrence.
+
+        Returns:
+            stages (list of Stage): the stages with the times in seconds
+        """
+        calls, nanoseconds = {}, {}
+        for event in self.events:
+            calls[event.name] = calls.get(event.name, 0) + 1
+            nanoseconds[event.name] = nanoseconds.get(event.name, 0) + event.duration
+        return [Stage(name, calls[name], nanoseconds[name] / 1e9) for name in calls]
+
+    def summary(self):
+        """Return the time spent in each stage and the counters as lines of text"""
+        lines = [
+            f"{stage.name}: {stage.seconds * 1000:.1f} ms"
+            + (f" ({stage.calls} calls)" if stage.calls > 1 else "")
+            for stage in self.stages()
+        ]
+        lines += [f"{name}: {value:g}" for name, value in self.counters.items()]
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Return the trace as a dictionary with the spans, stages and counters"""
+        return {
+            "spans": [
+                {
+                    "name": event.name,
+                    "start_ms": event.start / 1e6,
+                    "duration_ms": event.duration / 1e6,
+                    "thread": event.thread,
+                    "args": event.args,
+                }
+                for event in self.events
+            ],
+            "stages": [
+                {"name": stage.name, "calls": stage.calls, "seconds": stage.seconds}
+                for stage in self.stages()
+            ],
+            "counters": dict(self.counters),
+        }
+
+    def to_chrome_trace(self):
+        """Return the trace in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": event.name,
+                "ph": "X",
+                "ts": event.start / 1e3,
+                "dur": event.duration / 1e3,
+                "pid": pid,
+                "tid": event.thread,
+                "args": event.args,
+            }
+            for event in self.events
+        ]
+        end = max((event.start + event.duration for event in self.events), default=0)
+        events += [
+            {"name": name, "ph": "C", "ts": end / 1e3, "pid": pid, "args": {name: value}}
+            for name, value in self.counters.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path, chrome=True):
+        """Save the trace to a file, in the Chrome trace format or as plain JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace() if chrome else self.to_json(), f)
+
+
+class _Span:
+    __slots__ = ("name", "args", "tracers", "start")
+
+    def __init__(self, name, args, tracers):
+        self.name = name
+        self.args = args
+        self.tracers = tracers
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        end = time.perf_counter_ns()
+        for tracer in self.tracers:
+            tracer.add_span(self.name, self.start, end, self.args)
+
+
+def span(name, **args):
+    """
+    Return a context manager which records the time spent within it as a named span.
+
+    Args:
+        name (str): the name of the stage
+        args: additional values stored with the span (e.g. the number of rows)
+    """
+    if not _active:
+        return _DISABLED
+    return _Span(name, args, _active)
+
+
+def count(name, value=1):
+    """Add the value to the named counter"""
+    for tracer in _active:
+        tracer.add_count(name, value)
+
+
+def merge(tracer):
+    """Add the spans and counters of a tracer (e.g. from a worker process) to the active tracers"""
+    for active in _active:
+        active.merge(tracer)
+
+
+def recording():
+    """Return True if the spans are recorded, in a tracing context or the whole session"""
+    return bool(_active)
+
+
+def enabled():
+    """Return True if the instrumentation is enabled for the whole session"""
+    return _session_tracer is not None
+
+
+@contextmanager
+def tracing(tracer=None):
+    """
+    Enable the instrumentation within the context.
+
+    Spans and counters from all threads are recorded, so the stages of work
+    started within the context in other threads are also included.
+
+    Args:
+        tracer (Tracer): the tracer which records the spans; a new one if not given
+
+    Yields:
+        tracer (Tracer)
+    """
+    global _active
+
+    tracer = tracer or Tracer()
+    with _active_lock:
+        _active = _active + (tracer,)
+    try:
+        yield tracer
+    finally:
+        with _active_lock:
+            _active = tuple(active for active in _active if active is not tracer)
+
+
+def _start_session_tracer():
+    global _active
+
+    path = os.environ.get(TRACE_ENV)
+    # Worker processes inherit the environment, but send their spans to the
+    # parent instead of overwriting its trace
+    if not path or multiprocessing.parent_process() is not None:
+        return None
+    tracer = Tracer()
+    _active = (tracer,)
+    chrome = os.environ.get(TRACE_FORMAT_ENV, "chrome").lower() != "json"
+    atexit.register(tracer.save, path, chrome)
+    return tracer
+
+
+_session_tracer = _start_session_tracer()
@@ -1,27 +1,56 @@
 """
-This module contains the AdversarialDebiasingLearner and AdversarialDebiasingModel classes 
-which are used to create and fit the AdversarialDebiasing model from the aif360 library.
+This module contains the AdversarialDebiasingLearner and AdversarialDebiasingModel classes
+which are used to create and fit the adversarial debiasing model (the same model as the
+AdversarialDebiasing from the aif360 library, see the adversarial_network module).
 """
 
+import copy
+import os
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
 import numpy as np
 
 from Orange.base import Learner, Model
 from Orange.data import Table
-from Orange.preprocess import Normalize
+from Orange.preprocess import Impute, AdaptiveNormalize
+from Orange.util import dummy_callback
+
+from orangecontrib.fairness.instrumentation import span
 
+from orangecontrib.fairness.modeling.adversarial_network import (
+    AdversarialNetwork,
+    table_to_arrays,
+    _import_tensorflow,
+)
+from orangecontrib.fairness.modeling.streaming import MemmapDataset, MinibatchStream
 from orangecontrib.fairness.widgets.utils import (
-    table_to_standard_dataset,
+    DEFAULT_DTYPE,
+    codes_dtype,
     contains_fairness_attributes,
+    get_favorable_class_index,
     MISSING_FAIRNESS_ATTRIBUTES,
     is_tensorflow_installed,
 )
 
-if is_tensorflow_installed():
-    from aif360.algorithms.inprocessing import AdversarialDebiasing
-    import tensorflow.compat.v1 as tf
-else:
-    AdversarialDebiasing = None
-    tf = None
+
+@contextmanager
+def cpu_affinity(cpus):
+    """
+    Restrict the calling thread, and the threads it starts (like the thread pools of
+    a new TensorFlow session), to the given CPUs. Does nothing if no CPUs are given
+    or the platform does not support setting the affinity (only Linux does).
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
 
 
 # This gets called after the model is created and fitted
@@ -29,11 +58,16 @@ else:
 class AdversarialDebiasingModel(Model):
     """
     Model created and fitted by the AdversarialDebiasingLearner, used to predict on new data.
+
+    Args:
+        model (AdversarialNetwork): the fitted network
+        dtype (np.dtype): the dtype the features are converted to for predictions
     """
 
-    def __init__(self, model):
+    def __init__(self, model, dtype=DEFAULT_DTYPE):
         super().__init__()
         self._model = model
+        self.dtype = dtype
 
     def predict(self, data):
         """
@@ -43,25 +77,22 @@ class AdversarialDebiasingModel(Model):
             data (Table): The data to predict on.
         """
         if isinstance(data, Table):
-            standard_dataset, _, _ = table_to_standard_dataset(data)
-            predictions = self._model.predict(standard_dataset)
-
-            # Array of scores with a column of scores for each class
+            with span("table_to_arrays", rows=len(data)):
+                features, _, _ = table_to_arrays(data, self.dtype)
             # The scores given by the model are always for the favorable class
-            # If the favorable class is 1 then the scores need to be flipped or
-            # else the AUC will be "reversed"
-            # (the first column is 1 - scores and the second column is scores)
-            if standard_dataset.favorable_label == 0:
-                scores = np.hstack(
-                    (predictions.scores, (1 - predictions.scores).reshape(-1, 1))
-                )
-            else:
-                scores = np.hstack(
-                    ((1 - predictions.scores).reshape(-1, 1), predictions.scores)
-                )
-
-            predictions_scores = np.squeeze(predictions.labels, axis=1), scores
-            return predictions_scores
+            with span("predict", rows=len(data)):
+                favorable_scores = self._model.predict_scores(features)
+
+            # Array of scores with a column of scores for each class, so the
+            # other column (of the unfavorable class) is 1 - scores
+            favorable = get_favorable_class_index(data.domain)
+            unfavorable = 1 - favorable
+            scores = np.empty((len(favorable_scores), 2))
+            scores[:, favorable] = favorable_scores
+            scores[:, unfavorable] = 1 - favorable_scores
+
+            labels = np.where(favorable_scores > 0.5, favorable, unfavorable)
+            return labels.astype(float), scores
         else:
             raise TypeError("Data is not of type Table")
 
@@ -93,10 +124,37 @@ if is_tensorflow_installed():
             debias (bool): Whether to debias the model
             adversary_loss_weight (float): Weight of the adversary loss
             seed (int): Seed used to initialize the model
+            intra_op_threads (int): Number of threads used within an operation (e.g. a
+                matrix multiplication), 0 lets TensorFlow choose
+            inter_op_threads (int): Number of threads used to run independent operations,
+                0 lets TensorFlow choose
+            cpu_affinity (list of int): The CPUs the training runs on, None for all
+            num_workers (int): Number of processes which compute the gradients on shards
+                of each minibatch, 1 trains without additional processes
+            deterministic (bool): Whether the training with several processes gives the
+                same model in every run (with a seed), at the cost of a thread per process
+            memmap_dir (str): If given, the data is written to float32 memory-mapped files
+                in a temporary directory within this one and the network is trained on
+                shuffled minibatches streamed from them, which bounds the memory used by
+                the training
+            shuffle_buffer (int): Number of rows shuffled together when streaming
+            dtype (str or np.dtype): The dtype the features are converted to in memory,
+                float64 or float32 (the precision of the network, which gives the same
+                model with half the memory); with float32 the labels and the protected
+                attribute are int8
+            keep_training_state (bool): Whether the pickled models include the states of
+                the optimizers, so their training can continue after unpickling (e.g.
+                when they are fitted in another process, see partial_fit)
+
+        TensorFlow can share the pool of threads for the operations between the sessions of
+        a process, which is then created with the numbers of threads of the first session.
         """
 
         __returns__ = AdversarialDebiasingModel
-        preprocessors = [Normalize()]
+        # The imputation is a preprocessor, so its statistics are computed on the training
+        # data and the model's domain reuses them for imputing the data at predict time.
+        # Sparse data is only scaled, since centering would make it dense.
+        preprocessors = [Impute(), AdaptiveNormalize()]
         callback = None
 
         def __init__(
@@ -108,9 +166,25 @@ if is_tensorflow_installed():
             debias=True,
             adversary_loss_weight=0.1,
             seed=-1,
+            intra_op_threads=0,
+            inter_op_threads=0,
+            cpu_affinity=None,
+            num_workers=1,
+            deterministic=False,
+            memmap_dir=None,
+            shuffle_buffer=65536,
+            dtype=DEFAULT_DTYPE,
+            keep_training_state=False,
         ):
             super().__init__(preprocessors=preprocessors)
+            codes_dtype(dtype)
             self.params = vars()
+            self.intra_op_threads = intra_op_threads
+            self.inter_op_threads = inter_op_threads
+            self.cpu_affinity = cpu_affinity
+            self.memmap_dir = memmap_dir
+            self.shuffle_buffer = shuffle_buffer
+            self.dtype = np.dtype(dtype)
 
             self.model_params = {
                 "classifier_num_hidden_units": classifier_num_hidden_units,
@@ -118,16 +192,26 @@ if is_tensorflow_installed():
                 "batch_size": batch_size,
                 "debias": debias,
                 "adversary_loss_weight": adversary_loss_weight,
+                "num_workers": num_workers,
+                "deterministic": deterministic,
+                "keep_training_state": keep_training_state,
                 **({"seed": seed} if seed != -1 else {}),
             }
 
-        def _calculate_total_runs(self, data):
+        def __getstate__(self):
+            # The progress callback belongs to the caller, e.g. a widget's thread
+            state = self.__dict__.copy()
+            state["callback"] = None
+            return state
+
+        def _calculate_total_runs(self, data, num_epochs=None):
             """
             Method for calculating the total number of runs the learner will perform on the data
 
             Used to calculate and display the progress of the training.
             """
-            num_epochs = self.params["num_epochs"]
+            if num_epochs is None:
+                num_epochs = self.params["num_epochs"]
             batch_size = self.params["batch_size"]
             num_instances = len(data)
             num_batches = np.ceil(num_instances / batch_size)
@@ -143,6 +227,18 @@ if is_tensorflow_installed():
             if not contains_fairness_attributes(domain):
                 return MISSING_FAIRNESS_ATTRIBUTES
 
+        def preprocess(self, data, progress_callback=None):
+            """Apply the preprocessors, timing each of them (e.g. the imputation)"""
+            if progress_callback is None:
+                progress_callback = dummy_callback
+            preprocessors = list(self.active_preprocessors)
+            for i, pp in enumerate(preprocessors):
+                progress_callback(i / len(preprocessors))
+                with span(f"preprocess: {type(pp).__name__}", rows=len(data)):
+                    data = pp(data)
+            progress_callback(1)
+            return data
+
         def fit_storage(self, data):
             return self.fit(data)
 
@@ -155,32 +251,130 @@ if is_tensorflow_installed():
         # Fit storage and fit functions were modified to use a Table/Storage object
         # This is because it's the easiest way to get the domain, and meta attributes
         def fit(self, data: Table) -> AdversarialDebiasingModel:
-            (
-                standard_dataset,
-                privileged_groups,
-                unprivileged_groups,
-            ) = table_to_standard_dataset(data)
+            return self._train(data)
+
+        def partial_fit(self, model, data, num_epochs=None):
+            """
+            Continue the training of a fitted model on the data, e.g. for more epochs or
+            on new instances.
+
+            The network of the model is copied together with the states of its
+            optimizers, so the model itself does not change. An unpickled model can only
+            be trained further if it was fitted with keep_training_state. The data is
+            transformed to the domain of the model, i.e. imputed and normalized with the
+            statistics of the model's original training data.
+
+            Args:
+                model (AdversarialDebiasingModel): the model
+                data (Table): the data the training continues on
+                num_epochs (int): the number of additional epochs, the learner's number
+                    of epochs if None
+
+            Returns:
+                model (AdversarialDebiasingModel): the model with the further trained network
+
+            Raises:
+                ValueError: if the model was unpickled without the state of the training
+            """
+            if num_epochs is None:
+                num_epochs = self.model_params["num_epochs"]
+            if data.domain != model.domain:
+                data = data.transform(model.domain)
+            network = model._model.copy()
+            continued = copy.copy(model)
+            continued._model = self._train(data, network, num_epochs)._model
+            return continued
+
+        def continue_fit(self, model, data, progress_callback=None):
+            """
+            Continue the training of the model on the data (see partial_fit) until its
+            network is trained for the learner's number of epochs, e.g. after the number
+            of epochs was increased, instead of fitting a new model.
+
+            With a seed, the model is not the same as the one fitted for all the epochs
+            at once, since the minibatches and the dropout are drawn anew.
+            """
+            self.callback = progress_callback
+            epochs = self.model_params["num_epochs"] - model._model.epochs_trained
+            continued = self.partial_fit(model, data, max(epochs, 0))
+            continued.params = self.params
+            return continued
 
+        def _train(self, data, network=None, num_epochs=None):
+            """
+            Train a new network or continue the training of the given one for num_epochs
+            and return the model.
+            """
+            continued = network is not None
+            if self.memmap_dir is None:
+                with span("table_to_arrays", rows=len(data)):
+                    arrays = table_to_arrays(data, self.dtype)
+
+                def train(network):
+                    if continued:
+                        return network.partial_fit(*arrays, num_epochs)
+                    return network.fit(*arrays)
+
+                return self._fit_network(data, train, network, num_epochs)
+
+            # The data is written to temporary memory-mapped files and the network
+            # is trained on the minibatches streamed from them
+            with tempfile.TemporaryDirectory(dir=self.memmap_dir) as directory:
+                with span("write memmap", rows=len(data)):
+                    dataset = MemmapDataset.from_table(data, directory)
+                stream = MinibatchStream(
+                    dataset,
+                    self.model_params["batch_size"],
+                    buffer_rows=self.shuffle_buffer,
+                    seed=self.model_params.get("seed"),
+                )
+
+                def train_stream(network):
+                    if continued:
+                        return network.partial_fit_stream(stream, num_epochs)
+                    return network.fit_stream(stream)
+
+                return self._fit_network(data, train_stream, network, num_epochs)
+
+        def _fit_network(self, data, train, network=None, num_epochs=None):
+            """
+            Create the session and the network (unless the training of the given network
+            continues), train it with the function and return the model
+            """
+            tf = _import_tensorflow()
             tf.disable_eager_execution()
             tf.reset_default_graph()
             if tf.get_default_session() is not None:
                 tf.get_default_session().close()
-            sess = CallbackSession(
-                callback=self.callback, total_runs=self._calculate_total_runs(data)
-            )
 
-            # Create a model using the parameters from the widget and fit it to the data
-            model = AdversarialDebiasing(
-                **self.model_params,
-                unprivileged_groups=unprivileged_groups,
-                privileged_groups=privileged_groups,
-                sess=sess,
-                scope_name="adversarial_debiasing"
+            with cpu_affinity(self.cpu_affinity):
+                sess = _callback_session_class()(
+                    config=self._session_config(tf),
+                    callback=self.callback,
+                    total_runs=self._calculate_total_runs(data, num_epochs),
+                )
+
+                # Create a model using the parameters from the widget and fit it to the data
+                if network is None:
+                    network = AdversarialNetwork(**self.model_params, sess=sess)
+                else:
+                    network.sess = sess
+                sess.enable_callback()
+                network = train(network)
+                sess.disable_callback()
+            return AdversarialDebiasingModel(model=network, dtype=self.dtype)
+
+        def _session_config(self, tf):
+            """Return the configuration of the session with the numbers of threads"""
+            if not self.intra_op_threads and not self.inter_op_threads:
+                return None
+            return tf.ConfigProto(
+                intra_op_parallelism_threads=self.intra_op_threads,
+                inter_op_parallelism_threads=self.inter_op_threads,
+                # The inter-op threads are created for the session, not taken
+                # from the pool of the process
+                use_per_session_threads=bool(self.inter_op_threads),
             )
-            sess.enable_callback()
-            model = model.fit(standard_dataset)
-            sess.disable_callback()
-            return AdversarialDebiasingModel(model=model)
 
         def __call__(self, data, progress_callback=None):
             """
@@ -193,52 +387,64 @@ if is_tensorflow_installed():
             model.params = self.params
             return model
 
-    class CallbackSession(tf.Session):
-        """
-        Subclass of tensorflow session.
+    @lru_cache(maxsize=None)
+    def _callback_session_class():
+        """Create the CallbackSession class, which subclasses the (lazily imported) tf.Session"""
+        tf = _import_tensorflow()
 
-        It adds callback functionality for progress tracking and displaying.
+        class CallbackSession(tf.Session):
+            """
+            Subclass of tensorflow session.
 
-        Attributes:
-            callback (function): Callback function used to track the progress of the model fitting
-            run_count (int): Number of times the run function has been called
-            callback_enabled (bool): Flag to enable or disable the callback function
-            total_runs (int): Total number of runs the session will perform
-        """
+            It adds callback functionality for progress tracking and displaying.
 
-        def __init__(
-            self, target="", graph=None, config=None, callback=None, total_runs=0
-        ):
-            super().__init__(target=target, graph=graph, config=config)
-            self.callback = callback
-            self.run_count = 0
-            self.callback_enabled = False
-            self.total_runs = total_runs
-
-        def run(self, fetches, feed_dict=None, options=None, run_metadata=None):
+            Attributes:
+                callback (function): Callback function used to track the progress of the model fitting
+                run_count (int): Number of times the run function has been called
+                callback_enabled (bool): Flag to enable or disable the callback function
+                total_runs (int): Total number of runs the session will perform
             """
-            A overridden run function which calls the callback function and calculates the progress
 
-            To calculate the progress using these ways we need to know the number of expected
-            calls to the callback function and count how many times it has been called.
-            """
+            def __init__(
+                self, target="", graph=None, config=None, callback=None, total_runs=0
+            ):
+                super().__init__(target=target, graph=graph, config=config)
+                self.callback = callback
+                self.run_count = 0
+                self.callback_enabled = False
+                self.total_runs = total_runs
+
+            def run(self, fetches, feed_dict=None, options=None, run_metadata=None):
+                """
+                A overridden run function which calls the callback function and calculates the progress
+
+                To calculate the progress using these ways we need to know the number of expected
+                calls to the callback function and count how many times it has been called.
+                """
+
+                self.run_count += 1
+                if self.callback_enabled and self.callback and self.total_runs:
+                    self.callback((self.run_count / self.total_runs) * 100)
+
+                return super().run(
+                    fetches, feed_dict=feed_dict, options=options, run_metadata=run_metadata
+                )
 
-            self.run_count += 1
-            progress = (self.run_count / self.total_runs) * 100
-            if self.callback_enabled and self.callback:
-                self.callback(progress)
+            def enable_callback(self):
+                """Enable callback method for the model fitting fase"""
+                self.callback_enabled = True
 
-            return super().run(
-                fetches, feed_dict=feed_dict, options=options, run_metadata=run_metadata
-            )
+            def disable_callback(self):
+                """Disable callback method for the model prediction fase"""
+                self.callback_enabled = False
 
-        def enable_callback(self):
-            """Enable callback method for the model fitting fase"""
-            self.callback_enabled = True
+        return CallbackSession
 
-        def disable_callback(self):
-            """Disable callback method for the model prediction fase"""
-            self.callback_enabled = False
+    def __getattr__(name):
+        # CallbackSession is created on the first access, which imports TensorFlow
+        if name == "CallbackSession":
+            return _callback_session_class()
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 else:
 
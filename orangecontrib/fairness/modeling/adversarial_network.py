@@ -0,0 +1,738 @@
+"""
+This module contains the AdversarialNetwork class, the TensorFlow graph and the training
+loop of the adversarial debiasing, and the function which gets its inputs from a table.
+
+The network is the same as the one of aif360's AdversarialDebiasing (and uses the random
+generators in the same way, so it gives the same model for the same seed), but it is
+fitted on arrays taken directly from the table instead of an aif360 StandardDataset.
+This means that sparse data is never densified: the features are kept in a CSR matrix
+and the first layer of the classifier multiplies the sparse batches with the weights.
+"""
+
+import time
+from contextlib import closing, nullcontext
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.fairness.instrumentation import count, span
+from orangecontrib.fairness.widgets.utils import (
+    DEFAULT_DTYPE,
+    codes_dtype,
+    get_favorable_class_index,
+    get_privileged_mask,
+    get_protected_attribute_index,
+)
+
+
+# TensorFlow takes seconds to import, so it is only imported when a model is fitted,
+# not when Orange discovers the widgets of the add-on.
+def _import_tensorflow():
+    import tensorflow.compat.v1 as tf
+
+    return tf
+
+
+def table_to_arrays(data, dtype=DEFAULT_DTYPE):
+    """
+    Get the features, the labels and the protected attribute of the data.
+
+    The features are the attributes of the data, except that the values of the
+    protected attribute are replaced by 1 (privileged) and 0 (unprivileged), like in
+    the StandardDataset made by the table_to_standard_dataset function. Sparse data
+    stays sparse (in the CSR format), dense data is copied once, directly to the dtype.
+
+    Args:
+        data (Table): the data with the fairness attributes
+        dtype (np.dtype): the dtype of the features, float64 or float32 (the precision
+            the network computes in, which halves the memory of the features); the
+            labels and the protected attribute are int8 with float32 (see codes_dtype)
+
+    Returns:
+        features (np.ndarray or sp.csr_matrix): matrix of features
+        labels (np.ndarray): 1 for the instances with the favorable class, 0 otherwise
+        protected (np.ndarray): 1 for the privileged instances, 0 otherwise
+    """
+    domain = data.domain
+    codes = codes_dtype(dtype)
+    protected = get_privileged_mask(data).astype(codes)
+    labels = (data.Y == get_favorable_class_index(domain)).astype(codes)
+    column = get_protected_attribute_index(domain)
+
+    if sp.issparse(data.X):
+        features = sp.csr_matrix(data.X, dtype=dtype, copy=True)
+        # Zero the stored values of the protected attribute and add the mapped ones
+        features.data[features.indices == column] = 0
+        features = features + sp.csr_matrix(
+            (
+                protected.astype(dtype),
+                (np.arange(len(protected)), np.full(len(protected), column)),
+            ),
+            shape=features.shape,
+        )
+        features.eliminate_zeros()
+    else:
+        features = np.array(data.X, dtype=dtype)
+        features[:, column] = protected
+    return features, labels, protected
+
+
+class AdversarialNetwork:
+    """
+    Classifier trained together with an adversary which predicts the protected attribute
+    from the classifier's output (Zhang et al., Mitigating Unwanted Biases with
+    Adversarial Learning).
+
+    Attributes:
+        sparse (bool): whether the network was fitted on (and predicts from) sparse features
+
+    Args:
+        sess (tf.Session): the session in which the network is built and run
+        classifier_num_hidden_units (int): Number of hidden units in the classifier
+        num_epochs (int): Number of epochs to train the model
+        batch_size (int): Batch size used to train the model
+        debias (bool): Whether to debias the model
+        adversary_loss_weight (float): Weight of the adversary loss
+        seed (int): Seed used to initialize the model, None for a random seed
+        scope_name (str): Name of the variable scope of the network
+        num_workers (int): Number of processes which compute the gradients on shards
+            of each minibatch (see the parallel module); 1 trains in this process
+        deterministic (bool): Whether the parallel training gives the same model in
+            every run (with a seed), which makes the workers use a single thread
+        keep_training_state (bool): Whether the pickled network includes the states
+            of the optimizers, so its training can continue after unpickling (see
+            partial_fit); they take several times the memory of the weights
+    """
+
+    def __init__(
+        self,
+        sess,
+        classifier_num_hidden_units=100,
+        num_epochs=50,
+        batch_size=128,
+        debias=True,
+        adversary_loss_weight=0.1,
+        seed=None,
+        scope_name="adversarial_debiasing",
+        num_workers=1,
+        deterministic=False,
+        keep_training_state=False,
+    ):
+        self.sess = sess
+        self.classifier_num_hidden_units = classifier_num_hidden_units
+        self.num_epochs = num_epochs
+        self.batch_size = batch_size
+        self.debias = debias
+        self.adversary_loss_weight = adversary_loss_weight
+        self.seed = seed
+        self.scope_name = scope_name
+        self.num_workers = num_workers
+        self.deterministic = deterministic
+        self.keep_training_state = keep_training_state
+        self._reset(sparse=False)
+
+    def _classifier_model(self, tf, features, features_dim, keep_prob, seeds):
+        """Compute the classifier predictions for the outcome variable"""
+        with tf.variable_scope("classifier_model"):
+            W1 = tf.get_variable(
+                "W1",
+                [features_dim, self.classifier_num_hidden_units],
+                initializer=tf.initializers.glorot_uniform(seed=seeds[0]),
+            )
+            b1 = tf.Variable(
+                tf.zeros(shape=[self.classifier_num_hidden_units]), name="b1"
+            )
+            W2 = tf.get_variable(
+                "W2",
+                [self.classifier_num_hidden_units, 1],
+                initializer=tf.initializers.glorot_uniform(seed=seeds[2]),
+            )
+            b2 = tf.Variable(tf.zeros(shape=[1]), name="b2")
+
+            return self._classifier_forward(
+                tf, features, (W1, b1, W2, b2), keep_prob, seeds[1]
+            )
+
+    def _classifier_forward(self, tf, features, weights, keep_prob, seed):
+        """Compute the classifier predictions with the given weights (W1, b1, W2, b2)"""
+        W1, b1, W2, b2 = weights
+        if self.sparse:
+            h1 = tf.sparse.sparse_dense_matmul(features, W1)
+        else:
+            h1 = tf.matmul(features, W1)
+        h1 = tf.nn.relu(h1 + b1)
+        h1 = tf.nn.dropout(h1, keep_prob=keep_prob, seed=seed)
+
+        pred_logit = tf.matmul(h1, W2) + b2
+        pred_label = tf.sigmoid(pred_logit)
+        return pred_label, pred_logit
+
+    def _adversary_model(self, tf, pred_logits, true_labels, seeds):
+        """Compute the adversary predictions for the protected attribute"""
+        with tf.variable_scope("adversary_model"):
+            c = tf.get_variable("c", initializer=tf.constant(1.0))
+            W2 = tf.get_variable(
+                "W2", [3, 1], initializer=tf.initializers.glorot_uniform(seed=seeds[3])
+            )
+            b2 = tf.Variable(tf.zeros(shape=[1]), name="b2")
+
+            return self._adversary_forward(tf, pred_logits, true_labels, (c, W2, b2))
+
+    @staticmethod
+    def _adversary_forward(tf, pred_logits, true_labels, weights):
+        """Compute the adversary predictions with the given weights (c, W2, b2)"""
+        c, W2, b2 = weights
+        s = tf.sigmoid((1 + tf.abs(c)) * pred_logits)
+        return (
+            tf.matmul(tf.concat([s, s * true_labels, s * (1.0 - true_labels)], 1), W2)
+            + b2
+        )
+
+    @staticmethod
+    def _loss(tf, labels, logits):
+        """Mean sigmoid cross entropy of the logits"""
+        return tf.reduce_mean(
+            tf.nn.sigmoid_cross_entropy_with_logits(labels=labels, logits=logits)
+        )
+
+    def _build_placeholders(self, tf, features_dim):
+        """Build the placeholders of the features, the labels and the protected attribute"""
+        if self.sparse:
+            self.features_ph = tf.sparse_placeholder(
+                tf.float32, shape=[None, features_dim]
+            )
+        else:
+            self.features_ph = tf.placeholder(tf.float32, shape=[None, features_dim])
+        self.keep_prob = tf.placeholder(tf.float32)
+        self.protected_attributes_ph = tf.placeholder(tf.float32, shape=[None, 1])
+        self.true_labels_ph = tf.placeholder(tf.float32, shape=[None, 1])
+
+    def _build_classifier(self, tf, features_dim, seeds):
+        """Build the placeholders and the classifier"""
+        self._build_placeholders(tf, features_dim)
+        return self._classifier_model(
+            tf, self.features_ph, features_dim, self.keep_prob, seeds
+        )
+
+    def _trainable_variables(self, tf):
+        """Return the variables of the classifier and of the adversary, in the order of creation"""
+        variables = tf.trainable_variables(scope=self.scope_name)
+        return (
+            [var for var in variables if "classifier_model" in var.name],
+            [var for var in variables if "adversary_model" in var.name],
+        )
+
+    def _build(self, tf, features_dim, seeds):
+        """Build the placeholders, the losses and the optimizers of the network"""
+        self.pred_labels, pred_logits = self._build_classifier(tf, features_dim, seeds)
+        self.pred_labels_loss = self._loss(tf, self.true_labels_ph, pred_logits)
+        if self.debias:
+            pred_protected_attributes_logits = self._adversary_model(
+                tf, pred_logits, self.true_labels_ph, seeds
+            )
+            self.pred_protected_attributes_loss = self._loss(
+                tf, self.protected_attributes_ph, pred_protected_attributes_logits
+            )
+
+        classifier_vars, adversary_vars = self._trainable_variables(tf)
+        gradients = tf.gradients(self.pred_labels_loss, classifier_vars)
+        if self.debias:
+            gradients += tf.gradients(
+                self.pred_protected_attributes_loss, classifier_vars
+            )
+            gradients += tf.gradients(
+                self.pred_protected_attributes_loss, adversary_vars
+            )
+        self.minimizers = self._minimizers(
+            tf, classifier_vars, adversary_vars, gradients
+        )
+
+    def _build_parallel(self, tf, features_dim, seeds):
+        """
+        Build the classifier, the adversary and the optimizers of the network, which
+        update the weights with the gradients computed by the gradient workers.
+        """
+        self.pred_labels, pred_logits = self._build_classifier(tf, features_dim, seeds)
+        if self.debias:
+            self._adversary_model(tf, pred_logits, self.true_labels_ph, seeds)
+
+        classifier_vars, adversary_vars = self._trainable_variables(tf)
+        gradient_vars = classifier_vars + (
+            classifier_vars + adversary_vars if self.debias else []
+        )
+        self.gradients_ph = [
+            tf.placeholder(tf.float32, shape=var.shape) for var in gradient_vars
+        ]
+        self.weights = classifier_vars + adversary_vars
+        minimizers = self._minimizers(
+            tf, classifier_vars, adversary_vars, self.gradients_ph
+        )
+        # The updated weights are read in the same run, after the updates
+        with tf.control_dependencies(minimizers):
+            self.updated_weights = [var.read_value() for var in self.weights]
+
+    def _build_gradients(self, tf, shapes, num_classifier_vars):
+        """
+        Build the gradients of the losses for the weights, which are fed to placeholders
+        (in a gradient worker, which has no variables).
+
+        Args:
+            shapes (list of tuple): the shapes of the classifier's and the adversary's weights
+            num_classifier_vars (int): the number of the classifier's weights
+
+        Returns:
+            gradients (list): the gradients in the order of the parallel network's placeholders
+        """
+        self._build_placeholders(tf, shapes[0][0])
+        self.weights_ph = [tf.placeholder(tf.float32, shape=shape) for shape in shapes]
+        classifier_weights = self.weights_ph[:num_classifier_vars]
+        _, pred_logits = self._classifier_forward(
+            tf, self.features_ph, classifier_weights, self.keep_prob, None
+        )
+        gradients = tf.gradients(
+            self._loss(tf, self.true_labels_ph, pred_logits), classifier_weights
+        )
+        if self.debias:
+            adversary_weights = self.weights_ph[num_classifier_vars:]
+            adversary_loss = self._loss(
+                tf,
+                self.protected_attributes_ph,
+                self._adversary_forward(
+                    tf, pred_logits, self.true_labels_ph, adversary_weights
+                ),
+            )
+            gradients += tf.gradients(adversary_loss, classifier_weights)
+            gradients += tf.gradients(adversary_loss, adversary_weights)
+        return gradients
+
+    def _minimizers(self, tf, classifier_vars, adversary_vars, gradients):
+        """
+        Build the operations which update the weights with the gradients.
+
+        Args:
+            classifier_vars (list): the variables of the classifier
+            adversary_vars (list): the variables of the adversary
+            gradients (list): the gradients of the classifier's loss for the classifier's
+                variables and, when debiasing, the gradients of the adversary's loss for
+                the classifier's and for the adversary's variables
+
+        Returns:
+            minimizers (list): the operations
+        """
+        global_step = tf.Variable(0, trainable=False)
+        learning_rate = tf.train.exponential_decay(
+            0.001, global_step, 1000, 0.96, staircase=True
+        )
+        classifier_opt = tf.train.AdamOptimizer(learning_rate)
+        num_classifier_vars = len(classifier_vars)
+        classifier_grads = gradients[:num_classifier_vars]
+
+        if self.debias:
+            adversary_opt = tf.train.AdamOptimizer(learning_rate)
+            adversary_grads = gradients[num_classifier_vars : 2 * num_classifier_vars]
+
+        def normalize(x):
+            return x / (tf.norm(x) + np.finfo(np.float32).tiny)
+
+        # The classifier's gradients are projected so they do not help the adversary
+        projected_grads = []
+        for i, (grad, var) in enumerate(zip(classifier_grads, classifier_vars)):
+            if self.debias:
+                unit_adversary_grad = normalize(adversary_grads[i])
+                grad -= tf.reduce_sum(grad * unit_adversary_grad) * unit_adversary_grad
+                grad -= self.adversary_loss_weight * adversary_grads[i]
+            projected_grads.append((grad, var))
+        minimizers = [
+            classifier_opt.apply_gradients(projected_grads, global_step=global_step)
+        ]
+
+        if self.debias:
+            with tf.control_dependencies(minimizers):
+                minimizers.append(
+                    adversary_opt.apply_gradients(
+                        zip(gradients[2 * num_classifier_vars :], adversary_vars)
+                    )
+                )
+        return minimizers
+
+    def _features_value(self, tf, features):
+        """Return the value fed to the features placeholder for a batch of features"""
+        if not self.sparse:
+            return features
+        features = features.tocoo()
+        return tf.SparseTensorValue(
+            np.column_stack((features.row, features.col)).astype(np.int64),
+            features.data.astype(np.float32),
+            features.shape,
+        )
+
+    def fit(self, features, labels, protected):
+        """
+        Compute the weights of the classifier and the adversary with gradient descent.
+
+        Args:
+            features (np.ndarray or sp.spmatrix): matrix of features
+            labels (np.ndarray): 1 for the instances with the favorable class, 0 otherwise
+            protected (np.ndarray): 1 for the privileged instances, 0 otherwise
+
+        Returns:
+            network (AdversarialNetwork): self
+        """
+        self._reset(sparse=sp.issparse(features))
+        return self.partial_fit(features, labels, protected)
+
+    def partial_fit(self, features, labels, protected, num_epochs=None):
+        """
+        Continue the training with the current weights and states of the optimizers,
+        e.g. for more epochs or on new instances (with the same features).
+
+        An unpickled network is trained in a new session (the network's session must be
+        set to it), where the graph of the training is built again and the variables
+        get their pickled values.
+
+        Args:
+            features (np.ndarray or sp.spmatrix): matrix of features
+            labels (np.ndarray): 1 for the instances with the favorable class, 0 otherwise
+            protected (np.ndarray): 1 for the privileged instances, 0 otherwise
+            num_epochs (int): the number of epochs, the network's num_epochs if None
+
+        Returns:
+            network (AdversarialNetwork): self
+        """
+        tf = _import_tensorflow()
+        if self.sparse:
+            # Rows are sliced from the CSR format without copying the whole matrix
+            features = sp.csr_matrix(features)
+        elif sp.issparse(features):
+            features = features.toarray()
+        labels = np.reshape(labels, (-1, 1))
+        protected = np.reshape(protected, (-1, 1))
+        num_train_samples, features_dim = features.shape
+
+        num_batches = num_train_samples // self.batch_size
+        parallel = self.num_workers > 1
+        with self.sess.graph.as_default(), tf.variable_scope(self.scope_name):
+            self._prepare(tf, features_dim, parallel)
+            with self._start_workers(features, labels, protected) if parallel else (
+                nullcontext()
+            ) as workers:
+                for _ in range(self.num_epochs if num_epochs is None else num_epochs):
+                    with span("epoch", epoch=self.epochs_trained, batches=num_batches):
+                        if parallel:
+                            self._fit_epoch_parallel(workers, num_train_samples)
+                        else:
+                            self._fit_epoch(tf, features, labels, protected)
+                    count("session runs", num_batches)
+                    self.epochs_trained += 1
+        return self
+
+    def fit_stream(self, stream):
+        """
+        Compute the weights with gradient descent on the minibatches of a stream, e.g.
+        a MinibatchStream of a memory-mapped dataset, which need not fit in memory.
+
+        The number of rows per second of each epoch is stored in epoch_rows_per_second.
+
+        Args:
+            stream (MinibatchStream): the stream; its epoch method returns the minibatches
+                of the (dense) features, the labels and the protected attribute
+
+        Returns:
+            network (AdversarialNetwork): self
+        """
+        self._reset(sparse=False)
+        return self.partial_fit_stream(stream)
+
+    def partial_fit_stream(self, stream, num_epochs=None):
+        """
+        Continue the training on the minibatches of a stream (see partial_fit and
+        fit_stream).
+
+        Args:
+            stream (MinibatchStream): the stream
+            num_epochs (int): the number of epochs, the network's num_epochs if None
+
+        Returns:
+            network (AdversarialNetwork): self
+        """
+        if self.num_workers > 1:
+            raise ValueError("Streamed minibatches are trained in a single process.")
+        if self.sparse:
+            raise ValueError("The network was trained on sparse features.")
+        tf = _import_tensorflow()
+        self.epoch_rows_per_second = []
+
+        with self.sess.graph.as_default(), tf.variable_scope(self.scope_name):
+            self._prepare(tf, stream.features_dim, False)
+            for _ in range(self.num_epochs if num_epochs is None else num_epochs):
+                rows, start = 0, time.perf_counter()
+                with span(
+                    "epoch", epoch=self.epochs_trained, batches=stream.num_batches
+                ):
+                    with closing(stream.epoch()) as batches:
+                        for features, labels, protected in batches:
+                            self._run_minibatch(tf, features, labels, protected)
+                            rows += len(labels)
+                self.epoch_rows_per_second.append(rows / (time.perf_counter() - start))
+                count("session runs", stream.num_batches)
+                count("streamed rows", rows)
+                self.epochs_trained += 1
+        return self
+
+    def _reset(self, sparse):
+        """Forget the training, so the next one starts with new weights"""
+        self.sparse = sparse
+        self.epochs_trained = 0
+        self._training_state = None
+        self._graph_built = False
+
+    def _prepare(self, tf, features_dim, parallel):
+        """
+        Build the graph of the training, unless it is already built in the session,
+        and initialize the variables or set them to the pickled values.
+        """
+        if self._graph_built:
+            return
+        if self.epochs_trained and self._training_state is None:
+            # The training would silently start again with new weights
+            raise ValueError(
+                "The network was pickled without the state of its training "
+                "(see keep_training_state)."
+            )
+        seeds = self._seeds(tf)
+        with span("build graph", features=features_dim, sparse=self.sparse):
+            if parallel:
+                self._build_parallel(tf, features_dim, seeds)
+            else:
+                self._build(tf, features_dim, seeds)
+            if self._training_state is None:
+                self.sess.run(tf.global_variables_initializer())
+            else:
+                # All the variables are set to their pickled values in a single run
+                variables = self._network_variables(tf)
+                self.sess.run(
+                    [var.initializer for var in variables.values()],
+                    feed_dict={
+                        var.initializer.inputs[1]: self._training_state[name]
+                        for name, var in variables.items()
+                    },
+                )
+                self._training_state = None
+            self.sess.run(tf.local_variables_initializer())
+        self._graph_built = True
+
+    def _seeds(self, tf):
+        """Seed numpy's generator, if there is a seed, and draw the seeds of the graph"""
+        if tf.executing_eagerly():
+            raise RuntimeError("AdversarialNetwork does not work in eager execution.")
+
+        # A continued training does not repeat the shuffles of the first epochs
+        if self.seed is not None:
+            np.random.seed(self.seed + self.epochs_trained)
+        ii32 = np.iinfo(np.int32)
+        return np.random.randint(ii32.min, ii32.max, size=4)
+
+    def _batches(self, num_train_samples):
+        """Return the indices of the instances in the minibatches of an epoch"""
+        shuffled_ids = np.random.choice(
+            num_train_samples, num_train_samples, replace=False
+        )
+        return (
+            shuffled_ids[self.batch_size * i : self.batch_size * (i + 1)]
+            for i in range(num_train_samples // self.batch_size)
+        )
+
+    def _start_workers(self, features, labels, protected):
+        """Start the processes which compute the gradients for the parallel training"""
+        # pylint: disable=import-outside-toplevel
+        from orangecontrib.fairness.modeling.parallel import GradientWorkers
+
+        with span("start workers", workers=self.num_workers):
+            classifier_vars, adversary_vars = self._trainable_variables(
+                _import_tensorflow()
+            )
+            workers = GradientWorkers(
+                self,
+                features,
+                labels,
+                protected,
+                [tuple(var.shape.as_list()) for var in self.weights],
+                len(classifier_vars),
+                self.num_workers,
+                seed=self.seed,
+                deterministic=self.deterministic,
+            )
+            workers.set_weights(self.sess.run(self.weights))
+        return workers
+
+    def _fit_epoch_parallel(self, workers, num_train_samples):
+        """Run one pass of minibatch gradient descent with the gradients of the workers"""
+        for batch_ids in self._batches(num_train_samples):
+            gradients = workers.gradients(batch_ids, keep_prob=0.8)
+            workers.set_weights(
+                self.sess.run(
+                    self.updated_weights,
+                    feed_dict=dict(zip(self.gradients_ph, gradients)),
+                )
+            )
+
+    def _fit_epoch(self, tf, features, labels, protected):
+        """Run one pass of minibatch gradient descent over the shuffled data"""
+        for batch_ids in self._batches(features.shape[0]):
+            self._run_minibatch(
+                tf, features[batch_ids], labels[batch_ids], protected[batch_ids]
+            )
+
+    def _run_minibatch(self, tf, features, labels, protected):
+        """Update the weights with the gradients of a minibatch"""
+        self.sess.run(
+            self.minimizers,
+            feed_dict={
+                self.features_ph: self._features_value(tf, features),
+                self.true_labels_ph: labels,
+                self.protected_attributes_ph: protected,
+                self.keep_prob: 0.8,
+            },
+        )
+
+    def _classifier_variables(self, tf):
+        """Return the variables of the classifier by their names within the network"""
+        prefix = f"{self.scope_name}/"
+        return {
+            var.op.name[len(prefix) :]: var
+            for var in self.sess.graph.get_collection(
+                tf.GraphKeys.TRAINABLE_VARIABLES, scope=f"{prefix}classifier_model/"
+            )
+        }
+
+    def _network_variables(self, tf):
+        """Return all variables of the network (including the states of the optimizers)
+        by their names within the network"""
+        prefix = f"{self.scope_name}/"
+        return {
+            var.op.name[len(prefix) :]: var
+            for var in self.sess.graph.get_collection(
+                tf.GraphKeys.GLOBAL_VARIABLES, scope=prefix
+            )
+        }
+
+    def training_state(self):
+        """
+        Return the values of all variables of the training (the weights of the classifier
+        and the adversary and the states of the optimizers) by their names within the
+        network, or None if the network was not trained.
+        """
+        if self._training_state is not None:
+            return dict(self._training_state)
+        if not self._graph_built:
+            return None
+        variables = self._network_variables(_import_tensorflow())
+        return dict(zip(variables, self.sess.run(list(variables.values()))))
+
+    def __getstate__(self):
+        """
+        Return the parameters and the weights of the classifier, which is all the
+        network needs to predict, and with keep_training_state the state of the
+        training, which is needed to continue it; the session and the graph are not
+        pickled.
+        """
+        return self._state(self.keep_training_state)
+
+    def copy(self):
+        """
+        Return a copy of the network with the state of its training, which continues
+        in a new session (its session must be set) without changing this network.
+
+        Raises:
+            ValueError: if the network was unpickled without the state of the training
+        """
+        state = self._state(training=True)
+        if state["_training_state"] is None:
+            raise ValueError(
+                "The network was pickled without the state of its training "
+                "(see keep_training_state)."
+            )
+        network = type(self).__new__(type(self))
+        network.__setstate__(state)
+        return network
+
+    def _state(self, training):
+        """Return the state of the network, with the state of the training if training"""
+        state = {
+            name: value
+            for name, value in self.__dict__.items()
+            if isinstance(value, (bool, int, float, str, type(None)))
+            and name != "_graph_built"
+        }
+        state["weights"] = self.classifier_weights()
+        state["_training_state"] = self.training_state() if training else None
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self._weights = state.pop("weights")
+        self.__dict__.update(state)
+        self.sess = None
+        self._graph_built = False
+
+    def classifier_weights(self):
+        """
+        Return the weights of the classifier.
+
+        Returns:
+            weights (dict): the arrays of the weights by their names within the network,
+                e.g. "classifier_model/W1"
+        """
+        if self.sess is None:
+            return dict(self._weights)
+        variables = self._classifier_variables(_import_tensorflow())
+        return dict(zip(variables, self.sess.run(list(variables.values()))))
+
+    def _restore(self, tf):
+        """Build the classifier in a new graph and session with the unpickled weights"""
+        graph = tf.Graph()
+        with graph.as_default(), tf.variable_scope(self.scope_name):
+            features_dim = self._weights["classifier_model/W1"].shape[0]
+            self.pred_labels, _ = self._build_classifier(tf, features_dim, [None] * 3)
+            self.sess = tf.Session(graph=graph)
+            for name, var in self._classifier_variables(tf).items():
+                var.load(self._weights[name], self.sess)
+        del self._weights
+
+    def predict_scores(self, features):
+        """
+        Predict the probabilities of the favorable class.
+
+        Args:
+            features (np.ndarray or sp.spmatrix): matrix of features
+
+        Returns:
+            scores (np.ndarray): vector of probabilities
+        """
+        tf = _import_tensorflow()
+        if self.sess is None:
+            self._restore(tf)
+        return self._predict(tf, features)[:, 0]
+
+    def _predict(self, tf, features):
+        """Return the outputs of the built classifier (a column for each output unit)"""
+        if self.sparse:
+            features = sp.csr_matrix(features)
+        elif sp.issparse(features):
+            features = features.toarray()
+
+        outputs = []
+        for start in range(0, features.shape[0], self.batch_size):
+            batch = features[start : start + self.batch_size]
+            outputs.append(
+                self.sess.run(
+                    self.pred_labels,
+                    feed_dict={
+                        self.features_ph: self._features_value(tf, batch),
+                        self.keep_prob: 1.0,
+                    },
+                )
+            )
+        if not outputs:
+            return np.empty((0, int(self.pred_labels.shape[1])))
+        return np.vstack(outputs).astype(float)
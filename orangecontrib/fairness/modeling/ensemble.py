@@ -0,0 +1,209 @@
+"""
+This module contains the AdversarialDebiasingEnsembleLearner, which trains the
+adversarial debiasing with several seeds and averages the predictions of the networks.
+
+The results of the adversarial debiasing vary a lot between the seeds, so the
+networks of an ensemble are trained concurrently, each in its own worker process
+(with its own TensorFlow graph), on the data preprocessed once in the calling process.
+At predict time the classifiers of all networks are stacked into a single classifier
+with a unit for each seed: the weights of their hidden layers are concatenated and
+the weights of their output layers form a block diagonal matrix, so the features are
+converted once and every minibatch is multiplied with the weights in one pass.
+"""
+
+import numpy as np
+import scipy.linalg
+
+from orangecontrib.fairness.evaluation.scoring import FairnessResult
+from orangecontrib.fairness.instrumentation import span
+from orangecontrib.fairness.modeling.adversarial import (
+    AdversarialDebiasingLearner,
+    AdversarialDebiasingModel,
+)
+from orangecontrib.fairness.modeling.adversarial_network import (
+    AdversarialNetwork,
+    table_to_arrays,
+    _import_tensorflow,
+)
+from orangecontrib.fairness.modeling.parallel import available_cpus
+from orangecontrib.fairness.modeling.process import fit_in_processes
+from orangecontrib.fairness.widgets.utils import DEFAULT_DTYPE, FairnessView
+
+
+# The fairness scores computed for the network of each seed
+FAIRNESS_METRICS = (
+    "statistical_parity_difference",
+    "disparate_impact",
+    "equal_opportunity_difference",
+    "average_odds_difference",
+)
+
+
+class EnsembleNetwork:
+    """
+    The classifiers of several fitted AdversarialNetworks, which predict in one pass.
+
+    Args:
+        networks (list of AdversarialNetwork): the networks, with the same number of
+            hidden units, fitted on the same features
+    """
+
+    def __init__(self, networks):
+        self.networks = networks
+        self._classifier = None
+
+    def _build(self, tf):
+        """Build the stacked classifier in a new graph and session"""
+        first = self.networks[0]
+        weights = [network.classifier_weights() for network in self.networks]
+        W1, b1, W2, b2 = (
+            [network_weights[f"classifier_model/{name}"] for network_weights in weights]
+            for name in ("W1", "b1", "W2", "b2")
+        )
+        classifier = AdversarialNetwork(None, batch_size=first.batch_size)
+        classifier.sparse = first.sparse
+        graph = tf.Graph()
+        with graph.as_default():
+            classifier._build_placeholders(tf, W1[0].shape[0])
+            classifier.pred_labels, _ = classifier._classifier_forward(
+                tf,
+                classifier.features_ph,
+                [
+                    tf.constant(value)
+                    for value in (
+                        np.hstack(W1),
+                        np.hstack(b1),
+                        scipy.linalg.block_diag(*W2),
+                        np.hstack(b2),
+                    )
+                ],
+                classifier.keep_prob,
+                None,
+            )
+            classifier.sess = tf.Session(graph=graph)
+        self._classifier = classifier
+
+    def member_scores(self, features):
+        """
+        Predict the probabilities of the favorable class with each network.
+
+        Args:
+            features (np.ndarray or sp.spmatrix): matrix of features
+
+        Returns:
+            scores (np.ndarray): array of probabilities (networks x instances)
+        """
+        tf = _import_tensorflow()
+        if self._classifier is None:
+            self._build(tf)
+        return self._classifier._predict(tf, features).T
+
+    def predict_scores(self, features):
+        """Predict the mean of the networks' probabilities of the favorable class"""
+        return self.member_scores(features).mean(axis=0)
+
+    def __getstate__(self):
+        # The stacked classifier is built again after unpickling
+        return {"networks": self.networks, "_classifier": None}
+
+
+class AdversarialDebiasingEnsembleModel(AdversarialDebiasingModel):
+    """
+    Model created and fitted by the AdversarialDebiasingEnsembleLearner, which predicts
+    the mean of the probabilities predicted by the networks of the seeds.
+
+    Attributes:
+        seed_fairness (dict): the fairness scores of the network of each seed on the
+            training data, by the names of the FairnessResult's methods (see
+            FAIRNESS_METRICS)
+
+    Args:
+        networks (list of AdversarialNetwork): the networks of the seeds
+        dtype (np.dtype): the dtype the features are converted to for predictions
+    """
+
+    def __init__(self, networks, dtype=DEFAULT_DTYPE):
+        super().__init__(EnsembleNetwork(networks), dtype)
+        self.seed_fairness = None
+
+    @property
+    def networks(self):
+        """The networks of the seeds"""
+        return self._model.networks
+
+    def fairness_by_seed(self, data):
+        """
+        Compute the fairness scores of the network of each seed on the data.
+
+        Args:
+            data (Table): the data with the fairness attributes and the class
+
+        Returns:
+            scores (dict): the arrays of the scores of the networks, by the names of
+                the FairnessResult's methods (see FAIRNESS_METRICS)
+        """
+        if data.domain != self.domain:
+            data = data.transform(self.domain)
+        with span("table_to_arrays", rows=len(data)):
+            features, _, _ = table_to_arrays(data, self.dtype)
+        with span("predict", rows=len(data), seeds=len(self.networks)):
+            scores = self._model.member_scores(features)
+        view = FairnessView.from_table(data, self.dtype)
+        result = FairnessResult(
+            view.groups,
+            view.labels,
+            (scores > 0.5).astype(np.int8),
+            view.weights,
+        )
+        return {name: getattr(result, name)() for name in FAIRNESS_METRICS}
+
+
+class AdversarialDebiasingEnsembleLearner(AdversarialDebiasingLearner):
+    """
+    Learner of an ensemble of adversarial debiasing networks trained with different
+    seeds, concurrently in worker processes.
+
+    Args:
+        preprocessors (list): List of preprocessors, applied once for all the networks
+        num_seeds (int): Number of networks (seeds) in the ensemble
+        max_processes (int): Number of networks trained at the same time, None for
+            one for each CPU
+        **kwargs: The parameters of the AdversarialDebiasingLearner; with a seed, the
+            networks get the seeds seed, seed + 1, ..., otherwise random seeds
+
+    If the numbers of threads are not given, the CPUs are divided between the
+    processes, so the concurrent trainings do not compete for them.
+    """
+
+    __returns__ = AdversarialDebiasingEnsembleModel
+
+    def __init__(self, preprocessors=None, num_seeds=10, max_processes=None, **kwargs):
+        super().__init__(preprocessors=preprocessors, **kwargs)
+        self.num_seeds = num_seeds
+        self.max_processes = max_processes
+        self.network_params = kwargs
+        self.params = {**self.params, "num_seeds": num_seeds}
+
+    def _learners(self, processes):
+        """Return the learners of the networks, which do not preprocess the data"""
+        seed = self.params["seed"]
+        learners = []
+        for i in range(self.num_seeds):
+            params = dict(self.network_params, seed=seed + i if seed != -1 else -1)
+            if not self.intra_op_threads and not self.inter_op_threads:
+                params["intra_op_threads"] = max(1, available_cpus() // processes)
+            learners.append(AdversarialDebiasingLearner(preprocessors=[], **params))
+        return learners
+
+    def fit(self, data):
+        processes = self.max_processes or min(self.num_seeds, available_cpus())
+        with span("fit ensemble", seeds=self.num_seeds, processes=processes):
+            models = fit_in_processes(
+                self._learners(processes), data, self.callback, processes
+            )
+        model = AdversarialDebiasingEnsembleModel(
+            [model._model for model in models], self.dtype
+        )
+        model.domain = data.domain
+        model.seed_fairness = model.fairness_by_seed(data)
+        return model
@@ -0,0 +1,325 @@
+"""
+This module contains the GradientWorkers, the worker processes of the data-parallel
+training of the adversarial debiasing.
+
+Each minibatch is split into as many shards as there are workers. Every worker
+computes the gradients of the classifier's and the adversary's losses on its shard
+with the current weights and writes them to its row of a shared array; the training
+process averages the rows (weighted by the sizes of the shards, so the result is
+the gradient of the whole minibatch), updates the weights with the optimizers and
+writes them to the shared array of weights for the next step.
+
+The data, the weights and the gradients are in shared memory, so the workers do
+not copy them; only the indices of the shards go through the pipes, which also
+synchronize the steps. The rows are averaged in the order of the workers, so with
+seeded workers, one thread per worker and TensorFlow's deterministic operations the
+training gives the same model in every run.
+"""
+
+import multiprocessing
+import os
+import traceback
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.fairness.modeling.process import WorkerError
+
+
+def available_cpus():
+    """Return the number of CPUs the process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class SharedArray:
+    """
+    A numpy array in shared memory, which is passed to the worker processes
+    when they are started.
+
+    Attributes:
+        array (np.ndarray): the array, a view of the shared memory
+    """
+
+    def __init__(self, context, dtype, shape):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self._raw = context.RawArray(
+            np.ctypeslib.as_ctypes_type(self.dtype), max(int(np.prod(shape)), 1)
+        )
+        self.array = self._view()
+
+    @classmethod
+    def copy(cls, context, array, dtype):
+        """Return a shared array with a copy of the array"""
+        shared = cls(context, dtype, np.shape(array))
+        shared.array[...] = array
+        return shared
+
+    def _view(self):
+        size = int(np.prod(self.shape))
+        return np.frombuffer(self._raw, self.dtype, size).reshape(self.shape)
+
+    def __getstate__(self):
+        return {"dtype": self.dtype, "shape": self.shape, "_raw": self._raw}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.array = self._view()
+
+
+def split(vector, shapes):
+    """Split the vector into arrays of the given shapes"""
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    return [
+        part.reshape(shape)
+        for part, shape in zip(np.split(vector, np.cumsum(sizes)[:-1]), shapes)
+    ]
+
+
+def _gradient_worker(
+    connection,
+    index,
+    arrays,
+    weights,
+    gradients,
+    network_params,
+    shapes,
+    seed,
+    deterministic,
+    threads,
+):
+    """Compute the gradients on the shards sent by the training process until it stops"""
+    # pylint: disable=import-outside-toplevel
+    from orangecontrib.fairness.modeling.adversarial_network import (
+        AdversarialNetwork,
+        _import_tensorflow,
+    )
+
+    try:
+        tf = _import_tensorflow()
+        tf.disable_eager_execution()
+        if deterministic:
+            import tensorflow
+
+            tensorflow.config.experimental.enable_op_determinism()
+
+        num_classifier_vars = network_params.pop("num_classifier_vars")
+        sparse = network_params.pop("sparse")
+        graph = tf.Graph()
+        with graph.as_default():
+            if seed is not None:
+                tf.set_random_seed(seed)
+            network = AdversarialNetwork(None, **network_params)
+            network.sparse = sparse
+            gradient_tensors = network._build_gradients(tf, shapes, num_classifier_vars)
+        sess = tf.Session(
+            graph=graph,
+            config=tf.ConfigProto(
+                intra_op_parallelism_threads=threads, inter_op_parallelism_threads=1
+            ),
+        )
+
+        labels, protected = arrays["labels"].array, arrays["protected"].array
+        if sparse:
+            features = sp.csr_matrix(
+                (arrays["data"].array, arrays["indices"].array, arrays["indptr"].array),
+                shape=(len(labels), shapes[0][0]),
+            )
+        else:
+            features = arrays["features"].array
+        weight_values = split(weights.array, shapes)
+        row = gradients.array[index]
+        connection.send(None)
+
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            batch_ids, keep_prob = message
+            if len(batch_ids):
+                feed_dict = dict(zip(network.weights_ph, weight_values))
+                feed_dict.update(
+                    {
+                        network.features_ph: network._features_value(
+                            tf, features[batch_ids]
+                        ),
+                        network.true_labels_ph: labels[batch_ids],
+                        network.protected_attributes_ph: protected[batch_ids],
+                        network.keep_prob: keep_prob,
+                    }
+                )
+                values = sess.run(gradient_tensors, feed_dict=feed_dict)
+                row[:] = np.concatenate([value.ravel() for value in values])
+            else:
+                row[:] = 0
+            connection.send(None)
+    except EOFError:
+        # The training process stopped
+        pass
+    except Exception:  # pylint: disable=broad-except
+        connection.send(traceback.format_exc())
+    finally:
+        connection.close()
+
+
+class GradientWorkers:
+    """
+    Worker processes which compute the gradients of the network's losses on shards
+    of the minibatches; the workers are stopped when the context is exited.
+
+    Args:
+        network (AdversarialNetwork): the network, built with _build_parallel
+        features (np.ndarray or sp.csr_matrix): matrix of features
+        labels (np.ndarray): column of labels
+        protected (np.ndarray): column of the protected attribute
+        shapes (list of tuple): the shapes of the classifier's and the adversary's weights
+        num_classifier_vars (int): the number of the classifier's weights
+        num_workers (int): the number of worker processes
+        seed (int): the seeds of the workers are the following numbers (so they
+            drop out different units); None for random seeds
+        deterministic (bool): if true, the workers run with one thread and
+            TensorFlow's deterministic operations
+    """
+
+    def __init__(
+        self,
+        network,
+        features,
+        labels,
+        protected,
+        shapes,
+        num_classifier_vars,
+        num_workers,
+        seed=None,
+        deterministic=False,
+    ):
+        context = multiprocessing.get_context("spawn")
+        arrays = {
+            "labels": SharedArray.copy(context, labels, np.float32),
+            "protected": SharedArray.copy(context, protected, np.float32),
+        }
+        # The features are fed to float32 placeholders, so they are shared as float32
+        if sp.issparse(features):
+            arrays["data"] = SharedArray.copy(context, features.data, np.float32)
+            arrays["indices"] = SharedArray.copy(
+                context, features.indices, features.indices.dtype
+            )
+            arrays["indptr"] = SharedArray.copy(
+                context, features.indptr, features.indptr.dtype
+            )
+        else:
+            arrays["features"] = SharedArray.copy(context, features, np.float32)
+
+        self.shapes = shapes
+        self.gradient_shapes = shapes[:num_classifier_vars] + (
+            shapes if network.debias else []
+        )
+        self._weights = SharedArray(
+            context, np.float32, (int(sum(map(np.prod, shapes))),)
+        )
+        self._gradients = SharedArray(
+            context,
+            np.float32,
+            (num_workers, int(sum(map(np.prod, self.gradient_shapes)))),
+        )
+        network_params = {
+            "classifier_num_hidden_units": network.classifier_num_hidden_units,
+            "debias": network.debias,
+            "sparse": network.sparse,
+            "num_classifier_vars": num_classifier_vars,
+        }
+        threads = 1 if deterministic else max(1, available_cpus() // num_workers)
+
+        self._connections, self._processes = [], []
+        try:
+            for index in range(num_workers):
+                connection, worker_connection = context.Pipe()
+                process = context.Process(
+                    target=_gradient_worker,
+                    args=(
+                        worker_connection,
+                        index,
+                        arrays,
+                        self._weights,
+                        self._gradients,
+                        dict(network_params),
+                        shapes,
+                        None if seed is None else seed + 1 + index,
+                        deterministic,
+                        threads,
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                worker_connection.close()
+                self._connections.append(connection)
+                self._processes.append(process)
+            self._wait()
+        except BaseException:
+            self.stop()
+            raise
+
+    def _wait(self):
+        """Wait until all workers finish their step"""
+        for connection, process in zip(self._connections, self._processes):
+            try:
+                message = connection.recv()
+            except EOFError:
+                process.join()
+                raise WorkerError(
+                    f"A gradient worker exited with the code {process.exitcode}."
+                ) from None
+            if message is not None:
+                raise WorkerError(f"A gradient worker failed:\n{message}")
+
+    def set_weights(self, values):
+        """Write the weights (the arrays in the order of the shapes) for the next step"""
+        self._weights.array[:] = np.concatenate([np.ravel(value) for value in values])
+
+    def gradients(self, batch_ids, keep_prob):
+        """
+        Compute the gradients of the minibatch with the current weights.
+
+        Args:
+            batch_ids (np.ndarray): the indices of the instances in the minibatch
+            keep_prob (float): the probability of keeping the units in the dropout
+
+        Returns:
+            gradients (list of np.ndarray): the gradients in the order of the
+                network's placeholders
+        """
+        shards = np.array_split(batch_ids, len(self._connections))
+        for connection, shard in zip(self._connections, shards):
+            connection.send((shard, keep_prob))
+        self._wait()
+
+        # The rows are always added in the same order
+        rows = self._gradients.array
+        total = rows[0] * (len(shards[0]) / len(batch_ids))
+        for shard, row in zip(shards[1:], rows[1:]):
+            total += row * (len(shard) / len(batch_ids))
+        return split(total, self.gradient_shapes)
+
+    def stop(self):
+        """Stop the workers, killing those which do not stop within a few seconds"""
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections, self._processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
@@ -2,22 +2,37 @@
 This module contains the PostprocessingModel and PostprocessingLearner classes 
 
 These are used to create and fit the model and postprocessor and create the PostprocessingModel.
+
+It also contains postprocessors which only change the predicted probabilities of the
+favorable class for each group: the ThresholdOptimizerLearner (a decision threshold
+for each group), the CalibratedEqOddsLearner and the RejectOptionLearner.
+Instead of converting the data to aif360 datasets, they are fitted with vectorized
+computations on the sorted scores of the groups.
 """
 
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from warnings import warn
+
 import numpy as np
 
 from Orange.base import Learner, Model
 from Orange.data import Table
 from Orange.evaluation import CrossValidation
 
-from aif360.algorithms.postprocessing import EqOddsPostprocessing
-
+from orangecontrib.fairness.evaluation.curves import SortedScores
+from orangecontrib.fairness.instrumentation import span
 from orangecontrib.fairness.widgets.utils import (
     table_to_standard_dataset,
     contains_fairness_attributes,
+    get_privileged_mask,
+    get_favorable_class_index,
+    get_instance_weights,
     MISSING_FAIRNESS_ATTRIBUTES,
 )
 
+BINARY_CLASS_REQUIRED: str = "The postprocessing requires a binary class variable."
+
 
 class PostprocessingModel(Model):
     """
@@ -47,7 +62,9 @@ class PostprocessingModel(Model):
         if isinstance(data, Table):
             predictions, _ = self.model(data, ret=Model.ValueProbs)
 
-            standard_dataset, _, _ = table_to_standard_dataset(data)
+            standard_dataset, _, _ = table_to_standard_dataset(
+                data, fairness_columns_only=True
+            )
             standard_dataset_pred = standard_dataset.copy(deepcopy=True)
             standard_dataset_pred.labels = predictions.reshape(-1, 1)
 
@@ -127,24 +144,28 @@ class PostprocessingLearner(Learner):
             # Fit the model to the data
             # the callback is currently not used for progress but to allow
             # the user to interrupt the widget while the model is training
-            model = self.learner(data, self.callback)
+            with span("fit model", rows=len(data)):
+                model = self.learner(data, self.callback)
 
             # Use cross validation to get the predictions, we do this to avoid having to use
             # a train/validation split to get the predictions required to fit the postprocessor
             cv = CrossValidation(k=5)
             # Including the callback in the cross validation will allow the user to
             # interrupt the widget when it's in the cross validation phase
-            res = cv(data, [self.learner], callback=self.callback)
+            with span("cross validation", rows=len(data), folds=5):
+                res = cv(data, [self.learner], callback=self.callback)
             predictions = res.predicted[0]
             row_indices = res.row_indices
             predictions = predictions[np.argsort(row_indices)]
 
+            from aif360.algorithms.postprocessing import EqOddsPostprocessing
+
             # Get the predictions which will be used to fit the postprocessor
             (
                 standard_dataset,
                 privileged_groups,
                 unprivileged_groups,
-            ) = table_to_standard_dataset(data)
+            ) = table_to_standard_dataset(data, fairness_columns_only=True)
             standard_dataset_pred = standard_dataset.copy(deepcopy=True)
             standard_dataset_pred.labels = predictions
 
@@ -154,11 +175,18 @@ class PostprocessingLearner(Learner):
                 privileged_groups=privileged_groups,
                 seed=self.seed,
             )
-            postprocessor.fit(standard_dataset, standard_dataset_pred)
+            with span("fit postprocessor"):
+                postprocessor.fit(standard_dataset, standard_dataset_pred)
             return PostprocessingModel(model, postprocessor)
         else:
             raise TypeError("Data is not of type Table")
 
+    def __getstate__(self):
+        # The progress callback belongs to the caller, e.g. a widget's thread
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
     def __call__(self, data, progress_callback=None):
         self.callback = progress_callback
         # By adding this line, the progress will "work" for learners with the
@@ -167,3 +195,579 @@ class PostprocessingLearner(Learner):
         model = super().__call__(data)
         model.params = self.params
         return model
+
+
+class ScorePostprocessingModel(Model):
+    """
+    Base class for models which postprocess the predicted probabilities of a model
+
+    Subclasses implement the postprocess method, which changes the probabilities of the
+    favorable class and decides which instances are classified as favorable.
+
+    Attributes:
+    - model (Model): The model used to make predictions
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.params = vars()
+
+    def predict(self, data):
+        """
+        Method used to predict on new data and postprocess the probabilities.
+        """
+        if isinstance(data, Table):
+            probs = self.model(data, ret=Model.Probs)
+            favorable_class = get_favorable_class_index(data.domain)
+
+            favorable, favorable_probs = self.postprocess(
+                probs[:, favorable_class], get_privileged_mask(data)
+            )
+            values = np.where(favorable, favorable_class, 1 - favorable_class)
+            if favorable_probs is not None:
+                probs = np.empty_like(probs)
+                probs[:, favorable_class] = favorable_probs
+                probs[:, 1 - favorable_class] = 1 - favorable_probs
+            return values.astype(float), probs
+        else:
+            raise TypeError("Data is not of type Table")
+
+    @abstractmethod
+    def postprocess(self, probs, privileged):
+        """
+        Postprocess the predicted probabilities of the favorable class
+
+        Args:
+            probs (np.ndarray): probabilities of the favorable class
+            privileged (np.ndarray): boolean vector, true if the instance is privileged
+
+        Returns:
+            favorable (np.ndarray): boolean vector, true if the instance is
+                classified as favorable
+            probs (np.ndarray or None): the new probabilities of the favorable
+                class or None if the probabilities are not changed
+        """
+
+    def predict_storage(self, data):
+        if isinstance(data, Table):
+            return self.predict(data)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def __call__(self, data, ret=Model.Value):
+        return super().__call__(data, ret)
+
+
+class ScorePostprocessingLearner(Learner):
+    """
+    Base class for learners which fit a postprocessor on the predicted probabilities
+
+    The learner is fitted on the data and the postprocessor is fitted on the probabilities
+    predicted in cross validation, for the same reason as in the PostprocessingLearner.
+    Subclasses implement the fit_postprocessor method.
+
+    Attributes:
+    - learner (Learner): The learner used to create the model
+    - preprocessors (list): The preprocessors used to preprocess the data
+    - callback (function): The callback used to interrupt the widget
+    - params (dict): The parameters used in the __call__ method
+    """
+
+    def __init__(self, learner, preprocessors=None):
+        super().__init__(preprocessors=preprocessors)
+        self.learner = learner
+        self.callback = None
+        self.params = vars()
+
+    def incompatibility_reason(self, domain):
+        """
+        Method used to check if the domain contains the fairness attributes
+        and a binary class variable
+        """
+        if not contains_fairness_attributes(domain):
+            return MISSING_FAIRNESS_ATTRIBUTES
+        if len(domain.class_var.values) != 2:
+            return BINARY_CLASS_REQUIRED
+
+    def fit_storage(self, data):
+        if isinstance(data, Table):
+            return self.fit(data)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def _fit_model(self, data):
+        if type(self).fit is Learner.fit:
+            return self.fit_storage(data)
+        else:
+            return self.fit(data)
+
+    def fit(self, data):
+        """
+        Method used to fit the model and the postprocessor
+        """
+        if isinstance(data, Table):
+            reason = self.incompatibility_reason(data.domain)
+            if reason is not None:
+                raise ValueError(reason)
+
+            with span("fit model", rows=len(data)):
+                model = self.learner(data, self.callback)
+
+            cv = CrossValidation(k=5)
+            with span("cross validation", rows=len(data), folds=5):
+                res = cv(data, [self.learner], callback=self.callback)
+            favorable_class = get_favorable_class_index(data.domain)
+            probs = res.probabilities[0, :, favorable_class]
+            privileged = get_privileged_mask(data)[res.row_indices]
+            weights = get_instance_weights(data)
+            if weights is not None:
+                weights = weights[res.row_indices]
+
+            with span("fit postprocessor"):
+                return self.fit_postprocessor(
+                    model, res.actual == favorable_class, probs, privileged, weights
+                )
+        else:
+            raise TypeError("Data is not of type Table")
+
+    @abstractmethod
+    def fit_postprocessor(self, model, ytrue, probs, privileged, weights=None):
+        """
+        Fit the postprocessor and return the postprocessing model
+
+        Args:
+            model (Model): The fitted model
+            ytrue (np.ndarray): boolean vector, true if the instance has the favorable class
+            probs (np.ndarray): cross validated probabilities of the favorable class
+            privileged (np.ndarray): boolean vector, true if the instance is privileged
+            weights (np.ndarray): instance weights, None if the instances are not weighted
+        """
+
+    def __getstate__(self):
+        # The progress callback belongs to the caller, e.g. a widget's thread
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+    def __call__(self, data, progress_callback=None):
+        self.callback = progress_callback
+        model = super().__call__(data)
+        model.params = self.params
+        return model
+
+
+class ThresholdOptimizerModel(ScorePostprocessingModel):
+    """
+    Model created and fitted by the ThresholdOptimizerLearner
+
+    An instance is classified as favorable if the probability of the favorable class
+    predicted by the model equals or exceeds the threshold of the instance's group.
+
+    Attributes:
+    - model (Model): The model used to make predictions
+    - thresholds (tuple): The thresholds of the unprivileged and privileged group
+    """
+
+    def __init__(self, model, thresholds):
+        super().__init__(model)
+        self.thresholds = thresholds
+
+    def postprocess(self, probs, privileged):
+        unprivileged_threshold, privileged_threshold = self.thresholds
+        thresholds = np.where(privileged, privileged_threshold, unprivileged_threshold)
+        return probs >= thresholds, None
+
+
+def _nearest_index(cumulative, values):
+    """Indices of the elements of the increasing vector which are nearest to the values"""
+    if len(cumulative) == 1:
+        return np.zeros(len(values), dtype=int)
+    right = np.clip(np.searchsorted(cumulative, values), 1, len(cumulative) - 1)
+    left = right - 1
+    return np.where(
+        values - cumulative[left] <= cumulative[right] - values, left, right
+    )
+
+
+def _group_threshold(sorted_probs, selected):
+    """
+    Compute the threshold which selects the given number of top scored instances.
+
+    The threshold is the midpoint between the lowest selected score and the highest
+    score which is not selected, with infinite thresholds for selecting all or none.
+    """
+    scores = np.hstack(([np.inf], sorted_probs, [-np.inf]))
+    return (scores[selected] + scores[selected + 1]) / 2
+
+
+def fit_group_thresholds(ytrue, probs, privileged, constraint, weights=None):
+    """
+    Find the thresholds of the unprivileged and privileged group which satisfy the
+    fairness constraint with the highest accuracy.
+
+    The scores are sorted once. Selecting the k highest scored instances of a group is
+    equivalent to using a threshold between the k-th and k+1-th score, so cumulative
+    sums of the true labels give the true positives for every possible threshold of a
+    group. A threshold selects all the instances with tied scores, so only the numbers
+    of instances above the distinct scores are candidates. For each candidate number of
+    selected privileged instances, the candidate number of selected unprivileged
+    instances is found which (most nearly) equalizes the selection rates (demographic
+    parity) or the true positive rates (equal opportunity) and the pair with the
+    highest accuracy is chosen. The search is thus O(n log n) without a linear program.
+    With instance weights, the cumulative sums of the weights replace the counts.
+
+    Args:
+        ytrue (np.ndarray): boolean vector, true if the instance has the favorable class
+        probs (np.ndarray): vector of predicted probabilities of the favorable class
+        privileged (np.ndarray): boolean vector, true if the instance is privileged
+        constraint (str): ThresholdOptimizerLearner.DemographicParity
+            or ThresholdOptimizerLearner.EqualOpportunity
+        weights (np.ndarray): instance weights, None if the instances are not weighted
+
+    Returns:
+        thresholds (tuple): thresholds of the unprivileged and the privileged group
+    """
+    # A single stable sort of all the scores, split into groups which keep the order
+    order = np.argsort(-probs, kind="stable")
+    sorted_privileged = privileged[order]
+    sorted_probs, sorted_ytrue = probs[order], ytrue[order]
+    sorted_weights = np.ones(len(probs)) if weights is None else weights[order]
+
+    groups = []
+    for mask in (~sorted_privileged, sorted_privileged):
+        group_weights = sorted_weights[mask]
+        true_positives = np.hstack(
+            ([0], np.cumsum(np.where(sorted_ytrue[mask], group_weights, 0)))
+        )
+        # The (weighted) number of selected instances for each threshold
+        selected = np.hstack(([0], np.cumsum(group_weights)))
+        # Thresholds can only separate distinct scores, so the candidates are the
+        # numbers of instances before the first instance of each distinct score
+        group_probs = sorted_probs[mask]
+        cuts = np.union1d(
+            [0, len(group_probs)],
+            np.flatnonzero(group_probs[1:] != group_probs[:-1]) + 1,
+        )
+        groups.append((group_probs, cuts, true_positives[cuts], selected[cuts]))
+    (probs_u, cuts_u, tp_u, sel_u), (probs_p, cuts_p, tp_p, sel_p) = groups
+    n_u, n_p = sel_u[-1], sel_p[-1]
+    pos_u, pos_p = tp_u[-1], tp_p[-1]
+
+    # Index of the candidate of the privileged group, one for each threshold
+    selected_p = np.arange(len(cuts_p))
+    if constraint == ThresholdOptimizerLearner.DemographicParity:
+        selected_u = _nearest_index(sel_u, sel_p * n_u / (n_p or 1))
+    elif constraint == ThresholdOptimizerLearner.EqualOpportunity:
+        # The smallest number of selected unprivileged instances which reaches
+        # the true positive rate of the privileged group
+        tpr_p = tp_p / max(pos_p, 1)
+        selected_u = np.searchsorted(tp_u, tpr_p * pos_u - 1e-9, side="left")
+        selected_u = np.minimum(selected_u, len(cuts_u) - 1)
+    else:
+        raise ValueError(f"Unknown constraint: {constraint}")
+
+    # Correct predictions are the true positives and the true negatives
+    correct = (
+        2 * tp_p[selected_p] - sel_p[selected_p] + (n_p - pos_p)
+        + 2 * tp_u[selected_u] - sel_u[selected_u] + (n_u - pos_u)
+    )
+    best = np.argmax(correct)
+    return (
+        _group_threshold(probs_u, cuts_u[selected_u[best]]),
+        _group_threshold(probs_p, cuts_p[selected_p[best]]),
+    )
+
+
+class ThresholdOptimizerLearner(ScorePostprocessingLearner):
+    """
+    Postprocessing learner which selects a decision threshold for each group
+
+    The thresholds are chosen so that the groups have equal selection rates
+    (demographic parity) or equal true positive rates (equal opportunity) while
+    keeping the accuracy as high as possible. Unlike the PostprocessingLearner,
+    the postprocessing is deterministic and fitting it requires only sorting the
+    scores, which makes it cheap to refit.
+
+    Attributes:
+    - learner (Learner): The learner used to create the model
+    - constraint (str): The fairness constraint the thresholds satisfy
+    - preprocessors (list): The preprocessors used to preprocess the data
+    """
+
+    __returns__ = ThresholdOptimizerModel
+
+    DemographicParity = "demographic_parity"
+    EqualOpportunity = "equal_opportunity"
+
+    def __init__(self, learner, constraint=EqualOpportunity, preprocessors=None):
+        super().__init__(learner, preprocessors=preprocessors)
+        self.constraint = constraint
+        self.params = vars()
+
+    def fit_postprocessor(self, model, ytrue, probs, privileged, weights=None):
+        thresholds = fit_group_thresholds(
+            ytrue, probs, privileged, self.constraint, weights
+        )
+        return ThresholdOptimizerModel(model, thresholds)
+
+
+class CalibratedEqOddsModel(ScorePostprocessingModel):
+    """
+    Model created and fitted by the CalibratedEqOddsLearner
+
+    The probability of a randomly chosen part of the group with the lower cost is
+    replaced by the base rate of the group, which equalizes the costs of the groups
+    while keeping the probabilities calibrated.
+
+    Attributes:
+    - model (Model): The model used to make predictions
+    - base_rates (tuple): The base rates of the unprivileged and privileged group
+    - mix_rates (tuple): The proportions of the unprivileged and privileged group
+        for which the probability is replaced by the base rate
+    - seed (int): The seed used to make the predictions repeatable
+    """
+
+    def __init__(self, model, base_rates, mix_rates, seed=None):
+        super().__init__(model)
+        self.base_rates = base_rates
+        self.mix_rates = mix_rates
+        self.seed = seed
+
+    def postprocess(self, probs, privileged):
+        rng = np.random.default_rng(self.seed)
+        mix_rates = np.where(privileged, self.mix_rates[1], self.mix_rates[0])
+        base_rates = np.where(privileged, self.base_rates[1], self.base_rates[0])
+        probs = np.where(rng.random(len(probs)) <= mix_rates, base_rates, probs)
+        return probs >= 0.5, probs
+
+
+class CalibratedEqOddsLearner(ScorePostprocessingLearner):
+    """
+    Calibrated equalized odds postprocessing
+
+    This is the algorithm of aif360's CalibratedEqOddsPostprocessing, which equalizes the
+    generalized false positive rates, false negative rates or their weighted combination
+    (the cost) of the groups. Its parameters have a closed form, which is computed from
+    the sums of the probabilities in each group and class with a single bincount instead
+    of constructing ClassificationMetric objects.
+
+    Attributes:
+    - learner (Learner): The learner used to create the model
+    - cost_constraint (str): "fpr", "fnr" or "weighted"
+    - preprocessors (list): The preprocessors used to preprocess the data
+    - seed (int): The seed used to make the model repeatable
+    """
+
+    __returns__ = CalibratedEqOddsModel
+
+    def __init__(
+        self, learner, cost_constraint="weighted", preprocessors=None, repeatable=None
+    ):
+        super().__init__(learner, preprocessors=preprocessors)
+        if cost_constraint not in ("fpr", "fnr", "weighted"):
+            raise ValueError(f"Unknown cost constraint: {cost_constraint}")
+        self.cost_constraint = cost_constraint
+        self.seed = 42 if repeatable else None
+        self.params = vars()
+
+    def _costs(self, base_rate, generalized_fpr, generalized_fnr):
+        if self.cost_constraint == "fpr":
+            return generalized_fpr
+        if self.cost_constraint == "fnr":
+            return generalized_fnr
+        return (generalized_fpr * (1 - base_rate) + generalized_fnr * base_rate) / 2
+
+    def fit_postprocessor(self, model, ytrue, probs, privileged, weights=None):
+        # Index 2 * group + class, where the group is 1 for privileged instances
+        index = 2 * privileged.astype(np.intp) + ytrue
+        weighted_probs = probs if weights is None else probs * weights
+        counts = np.bincount(index, weights=weights, minlength=4).reshape(2, 2)
+        sums = np.bincount(index, weights=weighted_probs, minlength=4).reshape(2, 2)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            base_rates = counts[:, 1] / counts.sum(axis=1)
+            generalized_fpr = sums[:, 0] / counts[:, 0]
+            generalized_fnr = (counts[:, 1] - sums[:, 1]) / counts[:, 1]
+        costs = self._costs(base_rates, generalized_fpr, generalized_fnr)
+        # The trivial classifier predicts the base rate of the group
+        trivial_costs = self._costs(base_rates, base_rates, 1 - base_rates)
+
+        unprivileged_cost, privileged_cost = costs
+        if unprivileged_cost > privileged_cost:
+            mix_rates = (
+                0,
+                (unprivileged_cost - privileged_cost)
+                / (trivial_costs[1] - privileged_cost),
+            )
+        else:
+            mix_rates = (
+                (privileged_cost - unprivileged_cost)
+                / (trivial_costs[0] - unprivileged_cost),
+                0,
+            )
+        return CalibratedEqOddsModel(
+            model,
+            tuple(map(float, base_rates)),
+            tuple(map(float, mix_rates)),
+            seed=self.seed,
+        )
+
+
+class RejectOptionModel(ScorePostprocessingModel):
+    """
+    Model created and fitted by the RejectOptionLearner
+
+    Instances with probabilities in the critical region around the classification
+    threshold are classified as favorable if they are unprivileged and as unfavorable
+    if they are privileged. Outside of the region the classification threshold is used.
+
+    Attributes:
+    - model (Model): The model used to make predictions
+    - classification_threshold (float): The classification threshold
+    - margin (float): The half width of the critical region
+    """
+
+    def __init__(self, model, classification_threshold, margin):
+        super().__init__(model)
+        self.classification_threshold = classification_threshold
+        self.margin = margin
+
+    def postprocess(self, probs, privileged):
+        thresholds = np.where(
+            privileged,
+            self.classification_threshold + self.margin,
+            self.classification_threshold - self.margin,
+        )
+        return probs > thresholds, None
+
+
+class RejectOptionLearner(ScorePostprocessingLearner):
+    """
+    Reject option classification
+
+    This is the algorithm of aif360's RejectOptionClassification, which searches a grid
+    of classification thresholds and critical region margins for the one with the highest
+    balanced accuracy whose fairness metric is within the bounds. Instead of predicting
+    and computing metrics for each grid point, the scores of each group are sorted once
+    and the confusion matrices of all grid points are computed with a binary search on
+    the cumulative counts. The grid can optionally be split among several threads.
+
+    Attributes:
+    - learner (Learner): The learner used to create the model
+    - low_class_thresh, high_class_thresh (float): The range of classification thresholds
+    - num_class_thresh (int): The number of classification thresholds
+    - num_roc_margin (int): The number of margins for each threshold
+    - metric (str): "spd", "aod" or "eod"
+    - metric_lb, metric_ub (float): The bounds of the fairness metric
+    - n_jobs (int): The number of threads used to evaluate the grid
+    - preprocessors (list): The preprocessors used to preprocess the data
+    """
+
+    __returns__ = RejectOptionModel
+
+    Metrics = ("spd", "aod", "eod")
+
+    def __init__(
+        self,
+        learner,
+        low_class_thresh=0.01,
+        high_class_thresh=0.99,
+        num_class_thresh=100,
+        num_roc_margin=50,
+        metric="spd",
+        metric_lb=-0.05,
+        metric_ub=0.05,
+        n_jobs=1,
+        preprocessors=None,
+    ):
+        super().__init__(learner, preprocessors=preprocessors)
+        if (
+            not 0 <= low_class_thresh < high_class_thresh <= 1
+            or num_class_thresh < 1
+            or num_roc_margin < 1
+        ):
+            raise ValueError("Input parameter values out of bounds")
+        if metric not in self.Metrics:
+            raise ValueError(f"Unknown metric: {metric}")
+        self.low_class_thresh = low_class_thresh
+        self.high_class_thresh = high_class_thresh
+        self.num_class_thresh = num_class_thresh
+        self.num_roc_margin = num_roc_margin
+        self.metric = metric
+        self.metric_lb = metric_lb
+        self.metric_ub = metric_ub
+        self.n_jobs = n_jobs
+        self.params = vars()
+
+    def grid(self):
+        """
+        The grid of classification thresholds and margins, in the order used by aif360
+        """
+        thresholds = np.linspace(
+            self.low_class_thresh, self.high_class_thresh, self.num_class_thresh
+        )
+        # The margin goes up to the nearest end of the probability interval
+        fractions = np.linspace(0, 1, self.num_roc_margin)
+        margins = np.outer(np.minimum(thresholds, 1 - thresholds), fractions)
+        return np.repeat(thresholds, self.num_roc_margin), margins.ravel()
+
+    def _evaluate(self, unprivileged, privileged, thresholds, margins):
+        """Compute the balanced accuracy and the fairness metric of grid points"""
+        conf_u = unprivileged.confusion(thresholds - margins, inclusive=False)
+        conf_p = privileged.confusion(thresholds + margins, inclusive=False)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tpr = (conf_u.tp + conf_p.tp) / (conf_u.p + conf_p.p)
+            tnr = (conf_u.tn + conf_p.tn) / (conf_u.n + conf_p.n)
+        balanced_accuracy = (tpr + tnr) / 2
+
+        if self.metric == "spd":
+            fairness = conf_u.selection_rate() - conf_p.selection_rate()
+        elif self.metric == "eod":
+            fairness = conf_u.tpr() - conf_p.tpr()
+        else:
+            fairness = (
+                conf_u.fpr() - conf_p.fpr() + conf_u.tpr() - conf_p.tpr()
+            ) / 2
+        return balanced_accuracy, fairness
+
+    def fit_postprocessor(self, model, ytrue, probs, privileged, weights=None):
+        unprivileged_scores, privileged_scores = (
+            SortedScores(
+                ytrue[mask], probs[mask], None if weights is None else weights[mask]
+            )
+            for mask in (~privileged, privileged)
+        )
+        thresholds, margins = self.grid()
+
+        if self.n_jobs > 1:
+            chunks = np.array_split(np.arange(len(thresholds)), self.n_jobs)
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                evaluated = list(
+                    executor.map(
+                        lambda chunk: self._evaluate(
+                            unprivileged_scores,
+                            privileged_scores,
+                            thresholds[chunk],
+                            margins[chunk],
+                        ),
+                        chunks,
+                    )
+                )
+        else:
+            evaluated = [
+                self._evaluate(
+                    unprivileged_scores, privileged_scores, thresholds, margins
+                )
+            ]
+        balanced_accuracy = np.hstack([acc for acc, _ in evaluated])
+        fairness = np.hstack([metric for _, metric in evaluated])
+
+        # Select the grid point the same way as aif360 does
+        relevant = (fairness >= self.metric_lb) & (fairness <= self.metric_ub)
+        if relevant.any():
+            best = np.flatnonzero(relevant)[np.argmax(balanced_accuracy[relevant])]
+        else:
+            warn("Unable to satisfy fairness constraints")
+            best = np.argmin(fairness)
+        return RejectOptionModel(model, thresholds[best], margins[best])
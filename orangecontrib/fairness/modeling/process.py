@@ -0,0 +1,156 @@
+"""
+This module contains the functions which fit learners in separate worker processes.
+
+The worker gets the learner and the data, fits the model with its own TensorFlow
+graph and session and sends the progress and the pickled model back over a pipe.
+The worker process is killed as soon as the fitting is cancelled, so the caller
+does not wait for the current epoch to end, and any number of models can be fitted
+at the same time without sharing TensorFlow's global default graph.
+
+The worker is started with the "spawn" method, since forking a process with Qt and
+TensorFlow threads is not safe; it imports the add-on (and TensorFlow) anew, which
+takes a few seconds, and the data is copied to it.
+"""
+
+import multiprocessing
+import traceback
+from contextlib import nullcontext
+from multiprocessing.connection import wait
+
+from orangecontrib.fairness.instrumentation import Tracer, merge, recording, tracing
+
+
+# The interval (in seconds) at which the caller's callback is called while the
+# worker sends no progress, so a cancellation is noticed while the worker imports
+# TensorFlow or builds the graph
+POLL_INTERVAL = 0.1
+
+
+class WorkerError(RuntimeError):
+    """An error raised in the worker process, with the worker's traceback"""
+
+
+def _fit_worker(connection, learner, data, trace):
+    """Fit the learner on the data and send the progress and the model to the parent"""
+    last_progress = None
+
+    def callback(progress, _=None):
+        # The progress is only sent when it changes by at least a percent
+        nonlocal last_progress
+        if last_progress is None or abs(progress - last_progress) >= 1:
+            last_progress = progress
+            connection.send(("progress", progress))
+
+    try:
+        with tracing(Tracer()) if trace else nullcontext() as tracer:
+            model = learner(data, progress_callback=callback)
+        connection.send(("model", model, tracer))
+    except Exception:  # pylint: disable=broad-except
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def fit_in_process(learner, data, progress_callback=None):
+    """
+    Fit the learner on the data in a new worker process and return the model.
+
+    If the instrumentation records, the spans and counters of the worker are added
+    to the active tracers.
+
+    Args:
+        learner (Learner): the learner; it and the model must be picklable
+        data (Table): the training data
+        progress_callback (function): called with the progress (between 0 and 100)
+            and also regularly without any new progress; an exception raised by it
+            (e.g. on cancellation) kills the worker and is propagated
+
+    Returns:
+        model (Model): the fitted model
+
+    Raises:
+        WorkerError: if the fitting fails or the worker exits unexpectedly
+    """
+    return fit_in_processes([learner], data, progress_callback)[0]
+
+
+def fit_in_processes(learners, data, progress_callback=None, max_processes=None):
+    """
+    Fit each learner on the data in its own worker process and return the models.
+
+    The workers run concurrently, at most max_processes at a time; a new worker is
+    started whenever one of them sends its model. Each worker has its own TensorFlow
+    graph and session, and gets its own copy of the data.
+
+    Args:
+        learners (list of Learner): the learners; they and the models must be picklable
+        data (Table): the training data
+        progress_callback (function): called with the mean progress of the learners
+            (between 0 and 100), see fit_in_process; an exception raised by it kills
+            all the workers and is propagated
+        max_processes (int): the number of concurrent workers, None for one per learner
+
+    Returns:
+        models (list of Model): the fitted models, in the order of the learners
+
+    Raises:
+        WorkerError: if a fitting fails or a worker exits unexpectedly
+    """
+    context = multiprocessing.get_context("spawn")
+    learners = list(learners)
+    max_processes = max(1, max_processes or len(learners))
+    trace = recording()
+    waiting = list(enumerate(learners))
+    running = {}  # the receiving end of each worker's pipe -> (index, process)
+    progress = [0] * len(learners)
+    models = [None] * len(learners)
+    try:
+        while waiting or running:
+            while waiting and len(running) < max_processes:
+                index, learner = waiting.pop(0)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_fit_worker,
+                    args=(sender, learner, data, trace),
+                    # Not a daemon, since daemons cannot start the processes of the
+                    # data-parallel training; the worker is killed when the fitting ends
+                    daemon=False,
+                )
+                process.start()
+                # The worker holds the only sending end, so the receiver gets an
+                # EOFError if the worker exits without sending the model
+                sender.close()
+                running[receiver] = (index, process)
+
+            for receiver in wait(list(running), POLL_INTERVAL):
+                index, process = running[receiver]
+                try:
+                    kind, *values = receiver.recv()
+                except EOFError:
+                    process.join()
+                    raise WorkerError(
+                        f"The worker process exited with the code {process.exitcode}."
+                    ) from None
+                if kind == "progress":
+                    progress[index] = values[0]
+                elif kind == "error":
+                    raise WorkerError(
+                        f"Fitting failed in the worker process:\n{values[0]}"
+                    )
+                else:
+                    models[index], worker_tracer = values
+                    if worker_tracer is not None:
+                        merge(worker_tracer)
+                    progress[index] = 100
+                    del running[receiver]
+                    process.join()
+                    receiver.close()
+            if progress_callback is not None:
+                progress_callback(sum(progress) / len(learners))
+        return models
+    finally:
+        for receiver, (_, process) in running.items():
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
@@ -0,0 +1,205 @@
+"""
+This module contains the MemmapDataset and the MinibatchStream, which are used to
+train the adversarial debiasing on data which does not fit in memory.
+
+The features are stored in a memory-mapped float32 (or float64) file and the labels and the
+protected attribute in small int8 files. The MinibatchStream reads the features in
+contiguous blocks (in a random order), shuffles the rows of a buffer of blocks and
+yields the minibatches, which a background thread prepares while the network trains
+on the previous ones. The memory used by the training is therefore bounded by the
+size of the shuffle buffer and the number of prefetched minibatches.
+"""
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+from orangecontrib.fairness.modeling.adversarial_network import table_to_arrays
+
+
+class MemmapDataset:
+    """
+    The features, the labels and the protected attribute in memory-mapped files.
+
+    Attributes:
+        features (np.memmap): float32 (or float64) matrix of features
+        labels (np.memmap): 1 for the instances with the favorable class, 0 otherwise
+        protected (np.memmap): 1 for the privileged instances, 0 otherwise
+    """
+
+    FILES = ("features.npy", "labels.npy", "protected.npy")
+
+    def __init__(self, features, labels, protected):
+        self.features = features
+        self.labels = labels
+        self.protected = protected
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def open(cls, directory):
+        """Open the dataset in the directory (read only)"""
+        return cls(
+            *(
+                np.load(os.path.join(directory, name), mmap_mode="r")
+                for name in cls.FILES
+            )
+        )
+
+    @classmethod
+    def from_table(cls, data, directory, dtype=np.float32, chunk_rows=65536):
+        """
+        Write the features, the labels and the protected attribute of the data
+        (see table_to_arrays) to the directory and return the dataset.
+
+        The data is converted in chunks of rows, so only a chunk is in memory at a
+        time; sparse data is stored as dense.
+
+        Args:
+            data (Table): the data with the fairness attributes
+            directory (str): the directory of the files, which are overwritten
+            dtype (np.dtype): the dtype of the features, float32 (the precision the
+                network computes in) by default; the labels and the protected
+                attribute are stored as int8
+            chunk_rows (int): the number of rows converted at once
+        """
+        n_rows, n_features = len(data), data.X.shape[1]
+        features, labels, protected = (
+            np.lib.format.open_memmap(
+                os.path.join(directory, name), mode="w+", dtype=dtype, shape=shape
+            )
+            for name, dtype, shape in zip(
+                cls.FILES,
+                (dtype, np.int8, np.int8),
+                ((n_rows, n_features), (n_rows,), (n_rows,)),
+            )
+        )
+        for start in range(0, n_rows, chunk_rows):
+            stop = min(start + chunk_rows, n_rows)
+            chunk_features, chunk_labels, chunk_protected = table_to_arrays(
+                data[start:stop], dtype
+            )
+            if not isinstance(chunk_features, np.ndarray):
+                chunk_features = chunk_features.toarray()
+            features[start:stop] = chunk_features
+            labels[start:stop] = chunk_labels
+            protected[start:stop] = chunk_protected
+        for array in (features, labels, protected):
+            array.flush()
+        return cls.open(directory)
+
+
+class MinibatchStream:
+    """
+    Shuffled minibatches of a MemmapDataset, prepared by a background thread.
+
+    Args:
+        dataset (MemmapDataset): the dataset
+        batch_size (int): the number of instances in a minibatch; the last
+            incomplete minibatch of an epoch is dropped
+        buffer_rows (int): the number of rows which are shuffled together
+        block_rows (int): the number of contiguous rows read from the file at once
+        prefetch (int): the number of minibatches prepared ahead
+        seed (int): seed of the shuffling, None for a random seed
+    """
+
+    def __init__(
+        self,
+        dataset,
+        batch_size=128,
+        buffer_rows=65536,
+        block_rows=4096,
+        prefetch=4,
+        seed=None,
+    ):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.block_rows = max(1, min(block_rows, buffer_rows))
+        self.blocks_in_buffer = max(1, buffer_rows // self.block_rows)
+        self.prefetch = prefetch
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def features_dim(self):
+        """The number of features"""
+        return self.dataset.features.shape[1]
+
+    @property
+    def num_batches(self):
+        """The number of minibatches in an epoch"""
+        return len(self.dataset) // self.batch_size
+
+    def _batches(self):
+        """Yield the shuffled minibatches of an epoch"""
+        dataset = self.dataset
+        starts = self._rng.permutation(np.arange(0, len(dataset), self.block_rows))
+        remainder = None
+        for first in range(0, len(starts), self.blocks_in_buffer):
+            parts = [
+                tuple(
+                    np.asarray(array[start : start + self.block_rows])
+                    for array in (dataset.features, dataset.labels, dataset.protected)
+                )
+                for start in starts[first : first + self.blocks_in_buffer]
+            ]
+            if remainder is not None:
+                parts.append(remainder)
+            features, labels, protected = (np.concatenate(part) for part in zip(*parts))
+            order = self._rng.permutation(len(labels))
+            num_full = len(order) // self.batch_size * self.batch_size
+            for i in range(0, num_full, self.batch_size):
+                ids = order[i : i + self.batch_size]
+                yield (
+                    features[ids],
+                    labels[ids].astype(np.float32).reshape(-1, 1),
+                    protected[ids].astype(np.float32).reshape(-1, 1),
+                )
+            # The rows which do not fill a minibatch are shuffled with the next blocks
+            ids = order[num_full:]
+            remainder = (features[ids], labels[ids], protected[ids])
+
+    def epoch(self):
+        """
+        Return an iterator over the minibatches of an epoch, each a tuple of the features,
+        the labels and the protected attribute (columns of float32).
+        """
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Waits for a free place unless the consumer stopped
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches():
+                    if not put(batch):
+                        return
+                put(done)
+            except BaseException as ex:  # pylint: disable=broad-except
+                put(ex)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    return
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield batch
+        finally:
+            # The training stopped early (e.g. it was cancelled)
+            stop.set()
+            thread.join()
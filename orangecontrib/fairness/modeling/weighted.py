@@ -0,0 +1,165 @@
+"""
+This module contains the WeightedLearner and WeightedModel classes, which make any
+learner use the instance weights from the "weights" meta attribute (added by the
+reweighing preprocessor).
+
+Learners which support instance weights get the weights as the weights of the table
+(which are passed to scikit-learn as the sample_weight), the other learners are
+fitted on a sample of the data drawn with the probabilities proportional to the weights.
+"""
+
+import numpy as np
+
+from Orange.base import Learner, Model
+from Orange.data import Table
+
+from orangecontrib.fairness.instrumentation import span
+from orangecontrib.fairness.widgets.utils import get_instance_weights
+
+
+def weighted_table(data, weights):
+    """
+    Return a table with the given instance weights which shares the other arrays
+    (the features, the class and the metas) with the data.
+    """
+    return Table.from_numpy(
+        data.domain,
+        data.X,
+        data.Y,
+        data.metas,
+        np.asarray(weights, dtype=float),
+        attributes=data.attributes,
+    )
+
+
+def weighted_sample_indices(weights, size=None, seed=None):
+    """
+    Draw the indices of instances with the probabilities proportional to the weights.
+
+    The cumulative weights are computed once and all indices are found with a single
+    binary search. Instances with missing weights (unknown classes) are never drawn.
+
+    Args:
+        weights (np.ndarray): vector of instance weights
+        size (int): the number of indices, the number of weights if not given
+        seed (int): seed of the random generator
+
+    Returns:
+        indices (np.ndarray): vector of indices
+    """
+    weights = np.nan_to_num(np.asarray(weights, dtype=float), nan=0)
+    cumulative = np.cumsum(weights)
+    if not len(weights) or cumulative[-1] <= 0:
+        raise ValueError("The instance weights must have a positive sum.")
+    size = len(weights) if size is None else size
+    rng = np.random.default_rng(seed)
+    indices = np.searchsorted(
+        cumulative, rng.random(size) * cumulative[-1], side="right"
+    )
+    return np.minimum(indices, len(weights) - 1)
+
+
+class WeightedModel(Model):
+    """
+    Model created and fitted by the WeightedLearner, which predicts with the wrapped model
+
+    Attributes:
+    - model (Model): The model fitted on the weighted data
+    - resampled (bool): Whether the model was fitted on a weighted sample of the data
+    """
+
+    def __init__(self, model, resampled=False):
+        super().__init__()
+        self.model = model
+        self.resampled = resampled
+
+    def predict(self, data):
+        """
+        Method used to predict on new data with the wrapped model.
+        """
+        if isinstance(data, Table):
+            return self.model(data, ret=Model.ValueProbs)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def predict_storage(self, data):
+        if isinstance(data, Table):
+            return self.predict(data)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def __call__(self, data, ret=Model.Value):
+        return super().__call__(data, ret)
+
+
+class WeightedLearner(Learner):
+    """
+    Learner which fits the wrapped learner with the instance weights of the data
+
+    The weights are read from the "weights" meta attribute or, if there is none, from
+    the weights of the table. Learners which support weights get them as the weights of
+    the table, the other learners are fitted on a weighted sample of the data.
+
+    Attributes:
+    - learner (Learner): The learner fitted on the weighted data
+    - resample (bool): If true, the data is resampled even if the learner supports weights
+    - preprocessors (list): The preprocessors used to preprocess the data
+    - seed (int): The seed used to make the resampling repeatable
+    - params (dict): The parameters used in the __call__ method
+    """
+
+    __returns__ = WeightedModel
+
+    def __init__(self, learner, resample=False, preprocessors=None, repeatable=None):
+        super().__init__(preprocessors=preprocessors)
+        self.learner = learner
+        self.resample = resample
+        self.seed = 42 if repeatable else None
+        self.callback = None
+        self.params = vars()
+
+    def incompatibility_reason(self, domain):
+        """
+        Method used to check if the wrapped learner is compatible with the domain
+        """
+        return self.learner.incompatibility_reason(domain)
+
+    def fit_storage(self, data):
+        if isinstance(data, Table):
+            return self.fit(data)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def _fit_model(self, data):
+        if type(self).fit is Learner.fit:
+            return self.fit_storage(data)
+        else:
+            return self.fit(data)
+
+    def fit(self, data):
+        """
+        Method used to fit the wrapped learner with the weights of the data
+        """
+        if isinstance(data, Table):
+            weights = get_instance_weights(data)
+            if weights is None:
+                return WeightedModel(self.learner(data, self.callback))
+
+            if self.learner.supports_weights and not self.resample:
+                with span("weighted fit", rows=len(data)):
+                    model = self.learner(weighted_table(data, weights), self.callback)
+                return WeightedModel(model)
+
+            with span("resample", rows=len(data)):
+                sample = data[weighted_sample_indices(weights, seed=self.seed)]
+            with span("resampled fit", rows=len(sample)):
+                model = self.learner(sample, self.callback)
+            return WeightedModel(model, resampled=True)
+        else:
+            raise TypeError("Data is not of type Table")
+
+    def __call__(self, data, progress_callback=None):
+        self.callback = progress_callback
+        model = super().__call__(data)
+        model.params = self.params
+        return model
@@ -0,0 +1,57 @@
+"""
+This module contains a generator of synthetic data with the fairness attributes,
+which resembles the Adult dataset and is used by the tests and the benchmarks of
+the add-on, so they do not depend on downloading the datasets.
+"""
+
+import numpy as np
+
+from Orange.data import Table, Domain, DiscreteVariable, ContinuousVariable
+
+
+__all__ = ["adult_like_data"]
+
+
+def adult_like_data(n_rows=2000, seed=0):
+    """
+    Create a synthetic dataset resembling the Adult dataset with the fairness attributes.
+
+    The favorable class value is ">50K", the protected attribute is "sex" and the
+    privileged value is "Male". The class depends on the protected attribute, so the
+    dataset (and models trained on it) are biased in favor of the privileged group.
+
+    Args:
+        n_rows (int): The number of rows of the dataset.
+        seed (int): The seed used for generating the data.
+    """
+    rng = np.random.default_rng(seed)
+    sex = DiscreteVariable("sex", values=("Female", "Male"))
+    sex.attributes["privileged_pa_values"] = ["Male"]
+    race = DiscreteVariable("race", values=("Black", "Other", "White"))
+    workclass = DiscreteVariable("workclass", values=("Private", "Public", "Self"))
+    age = ContinuousVariable("age")
+    education = ContinuousVariable("education-num")
+    hours = ContinuousVariable("hours-per-week")
+    income = DiscreteVariable("y", values=("<=50K", ">50K"))
+    income.attributes["favorable_class_value"] = ">50K"
+    domain = Domain([age, workclass, education, race, sex, hours], income)
+
+    x = np.column_stack(
+        (
+            rng.integers(17, 90, n_rows),
+            rng.integers(0, 3, n_rows),
+            rng.integers(1, 17, n_rows),
+            rng.choice(3, n_rows, p=(0.1, 0.05, 0.85)),
+            rng.choice(2, n_rows, p=(0.33, 0.67)),
+            rng.integers(10, 80, n_rows),
+        )
+    ).astype(float)
+    logit = (
+        0.03 * (x[:, 0] - 40)
+        + 0.3 * (x[:, 2] - 10)
+        + 0.04 * (x[:, 5] - 40)
+        + 1.2 * x[:, 4]
+        - 1.5
+    )
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(float)
+    return Table.from_numpy(domain, x, y)
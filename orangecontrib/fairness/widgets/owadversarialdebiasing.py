@@ -2,8 +2,12 @@
 This module contains the OWAdversarialDebiasing widget.
 """
 
+import os
+from functools import partial
 from itertools import chain
 
+import numpy as np
+
 from Orange.widgets import gui
 from Orange.widgets.settings import Setting
 from Orange.widgets.utils.owlearnerwidget import OWBaseLearner
@@ -18,14 +22,26 @@ from AnyQt.QtWidgets import QFormLayout, QLabel, QVBoxLayout, QPushButton
 from AnyQt.QtCore import Qt
 
 from orangecontrib.fairness.modeling.adversarial import AdversarialDebiasingLearner
+from orangecontrib.fairness.modeling.ensemble import (
+    AdversarialDebiasingEnsembleLearner,
+    AdversarialDebiasingEnsembleModel,
+)
+from orangecontrib.fairness.modeling.process import fit_in_process
+from orangecontrib.fairness.instrumentation import Tracer
 from orangecontrib.fairness.widgets.utils import (
     check_fairness_data,
     check_for_reweighing_preprocessor,
     check_for_reweighted_data,
     check_for_missing_values,
     check_for_tensorflow,
+    fitted_models,
     is_tensorflow_installed,
+    model_cache_key,
     TENSORFLOW_NOT_INSTALLED,
+    new_tracer,
+    show_timing,
+    timing_box,
+    traced,
 )
 
 
@@ -35,29 +51,102 @@ class InterruptException(Exception):
     pass
 
 
+def parse_cpu_list(text):
+    """
+    Parse a list of CPUs like "0-3,8" (ranges are inclusive); an empty text means all.
+
+    Returns:
+        cpus (list of int or None): the CPUs, None for all
+
+    Raises:
+        ValueError: if the text is not a valid list of CPUs
+    """
+    cpus = []
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        first, dash, last = part.partition("-")
+        first = int(first)
+        last = int(last) if dash else first
+        if first < 0 or last < first:
+            raise ValueError(f"Invalid range of CPUs: {part}")
+        cpus.extend(range(first, last + 1))
+    return sorted(set(cpus)) or None
+
+
+# The parameters of the learner which do not change the trained model, apart from the
+# number of epochs, by which the training of a fitted model can continue
+_NON_TRAINING_PARAMS = (
+    "self",
+    "__class__",
+    "num_epochs",
+    "intra_op_threads",
+    "inter_op_threads",
+    "cpu_affinity",
+)
+
+
+def _training_params(learner):
+    """Return the parameters of the learner which change the trained model"""
+    return {
+        name: value
+        for name, value in learner.params.items()
+        if name not in _NON_TRAINING_PARAMS
+    }
+
+
 class AdversarialDebiasingRunner:
     """
     A class used to run the AdversarialDebiasingLearner in a separate
-    thread and display progress using the callback.
+    process and display progress using the callback.
+
+    The thread of the widget only waits for the worker process, which is
+    killed as soon as the user cancels the training or changes the inputs.
+    The ensemble learner trains its networks in worker processes itself.
     """
 
     @staticmethod
     def run(
-        learner: AdversarialDebiasingLearner, data: Table, state: TaskState
+        learner: AdversarialDebiasingLearner,
+        data: Table,
+        state: TaskState,
+        tracer: Tracer = None,
+        warm_start: Model = None,
+        cached: bool = False,
     ) -> Model:
         """
         Method used to run the AdversarialDebiasingLearner in a separate
-        thread and display progress using the callback.
+        process and display progress using the callback.
+
+        If a fitted model is given as warm_start, the learner continues its training
+        instead of fitting a new model. If cached, the model is taken from the cache
+        of fitted models if the learner was already fitted on the data, otherwise the
+        fitted model is added to it. The key is computed here, since hashing the data
+        would block the widget's thread.
         """
         if data is None:
             return None
+        cache_key = model_cache_key(learner, data) if cached else None
+        model = fitted_models.get(cache_key)
+        if model is not None:
+            return model
 
         def callback(progress: float, msg: str = None) -> bool:
             state.set_progress_value(progress)
             if state.is_interruption_requested():
                 raise InterruptException
 
-        model = learner(data, progress_callback=callback)
+        # The stages of the fitting are timed for the widget's timing box
+        with traced(tracer):
+            if isinstance(learner, AdversarialDebiasingEnsembleLearner):
+                model = learner(data, progress_callback=callback)
+            elif warm_start is not None:
+                model = fit_in_process(
+                    partial(learner.continue_fit, warm_start),
+                    data,
+                    progress_callback=callback,
+                )
+            else:
+                model = fit_in_process(learner, data, progress_callback=callback)
+        fitted_models.put(cache_key, model)
         return model
 
 
@@ -82,6 +171,13 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
 
         pass
 
+    class Error(OWBaseLearner.Error):
+        """Errors shown to the user when the settings are invalid"""
+
+        invalid_cpu_affinity = Msg(
+            "Invalid list of CPUs, e.g. '0-3,8'; the training runs on all CPUs."
+        )
+
     class Information(OWBaseLearner.Information):
         """Information shown to the user when the user specifies custom preprocessors"""
 
@@ -92,6 +188,9 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
             "replaced with user-specified preprocessors. \n"
             "Problems may occur if these are inadequate for the given data."
         )
+        seed_fairness = Msg(
+            "Fairness of the {} seeds on the training data (mean ± std): {}"
+        )
 
     # We define the learner we want to use
     LEARNER = AdversarialDebiasingLearner
@@ -118,8 +217,16 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
     debias = Setting(True)
     lambda_index = Setting(1)
     repeatable = Setting(False)
+    intra_op_threads = Setting(0)
+    inter_op_threads = Setting(0)
+    cpu_affinity = Setting("")
+    num_workers = Setting(1)
+    num_seeds = Setting(1)
 
     def __init__(self):
+        self._tracer = None
+        # The learner and the data of the running fit and of the output model
+        self._fitting = self._fitted = None
         ConcurrentWidgetMixin.__init__(self)
         OWBaseLearner.__init__(self)
 
@@ -213,6 +320,68 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
                 attribute=Qt.WA_LayoutUsesWidgetRect,
             )
         )
+        # Spin boxes for the numbers of threads, 0 lets TensorFlow choose
+        for attribute, label in (
+            ("intra_op_threads", "Threads within operations:"),
+            ("inter_op_threads", "Threads across operations:"),
+        ):
+            form.addRow(
+                label,
+                gui.spin(
+                    None,
+                    self,
+                    attribute,
+                    0,
+                    os.cpu_count() or 1,
+                    label=label,
+                    orientation=Qt.Horizontal,
+                    alignment=Qt.AlignRight,
+                    callback=self.settings_changed,
+                    specialValueText="Automatic",
+                ),
+            )
+        # Spin box for the number of processes of the data-parallel training
+        form.addRow(
+            "Training processes:",
+            gui.spin(
+                None,
+                self,
+                "num_workers",
+                1,
+                os.cpu_count() or 1,
+                label="Training processes:",
+                orientation=Qt.Horizontal,
+                alignment=Qt.AlignRight,
+                callback=self.settings_changed,
+            ),
+        )
+        # Spin box for the number of seeds of the ensemble, 1 trains a single network
+        form.addRow(
+            "Seeds in ensemble:",
+            gui.spin(
+                None,
+                self,
+                "num_seeds",
+                1,
+                100,
+                label="Seeds in ensemble:",
+                orientation=Qt.Horizontal,
+                alignment=Qt.AlignRight,
+                callback=self.settings_changed,
+                specialValueText="No ensemble",
+            ),
+        )
+        # Line edit for the CPUs the training runs on
+        form.addRow(
+            "CPUs:",
+            gui.lineEdit(
+                None,
+                self,
+                "cpu_affinity",
+                placeholderText="All, e.g. 0-3,8",
+                callback=self.settings_changed,
+            ),
+        )
         self.set_lambda()
         self._debias_changed()
 
@@ -262,6 +431,7 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
             self.tensorflow_layout()
         else:
             self.no_tensorflow_layout()
+        timing_box(self, self.controlArea)
 
     # ---------Methods related to UI------------
 
@@ -314,7 +484,21 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
         It is called in the superclass by the update_learner method
         """
         if is_tensorflow_installed():
-            return self.LEARNER(
+            self.Error.invalid_cpu_affinity.clear()
+            try:
+                cpus = parse_cpu_list(self.cpu_affinity)
+            except ValueError:
+                self.Error.invalid_cpu_affinity()
+                cpus = None
+            if self.num_seeds > 1:
+                learner_class = partial(
+                    AdversarialDebiasingEnsembleLearner, num_seeds=self.num_seeds
+                )
+            else:
+                # The models from the worker process keep the states of the optimizers,
+                # so the widget can continue their training (see update_model)
+                learner_class = partial(self.LEARNER, keep_training_state=True)
+            return learner_class(
                 preprocessors=self.preprocessors,
                 seed=42 if self.repeatable else -1,
                 classifier_num_hidden_units=self.hidden_layers_neurons,
@@ -322,6 +506,11 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
                 batch_size=self.batch_size,
                 debias=self.debias,
                 adversary_loss_weight=self.selected_lambda if self.debias else 0,
+                intra_op_threads=self.intra_op_threads,
+                inter_op_threads=self.inter_op_threads,
+                cpu_affinity=cpus,
+                num_workers=self.num_workers,
+                deterministic=self.repeatable,
             )
 
     def update_model(self):
@@ -331,14 +520,51 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
 
         This method is called along with the update_learner
         method in the apply method of the superclass
+
+        The model is taken from the cache if the same learner was already fitted
+        on the same data with replicable training
         """
 
         self.cancel()
         if self.data is not None:
-            self.start(AdversarialDebiasingRunner.run, self.learner, self.data)
+            self._tracer = new_tracer()
+            self._fitting = (self.learner, self.data)
+            warm_start = self._warm_start_model()
+            self.start(
+                AdversarialDebiasingRunner.run,
+                self.learner,
+                self.data,
+                tracer=self._tracer,
+                warm_start=warm_start,
+                # Without a seed, applying again must train a new network, and
+                # a continued model differs from the model fitted at once
+                cached=self.repeatable and warm_start is None,
+            )
         else:
             self.Outputs.model.send(None)
 
+    def _warm_start_model(self):
+        """
+        Return the output model if only the number of epochs increased since it was
+        fitted on the same data, so its training can continue, otherwise None.
+
+        With replicable training the model is always fitted from scratch, since the
+        continued training does not give the same model as a fit of all the epochs.
+        """
+        if self.repeatable or self.model is None or self._fitted is None:
+            return None
+        learner, data = self._fitted
+        if (
+            data is not self.data
+            or type(learner) is not type(self.learner)
+            or isinstance(learner, AdversarialDebiasingEnsembleLearner)
+            or _training_params(learner) != _training_params(self.learner)
+        ):
+            return None
+        if self.number_of_epochs <= self.model._model.epochs_trained:
+            return None
+        return self.model
+
     def get_learner_parameters(self):
         parameters = [
             ("Neurons in hidden layers", self.hidden_layers_neurons),
@@ -349,6 +575,13 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
 
         if self.debias:
             parameters.append(("Adversary Loss Weight", self.selected_lambda))
+        if self.intra_op_threads or self.inter_op_threads:
+            parameters.append(("Threads within operations", self.intra_op_threads))
+            parameters.append(("Threads across operations", self.inter_op_threads))
+        if self.num_workers > 1:
+            parameters.append(("Training processes", self.num_workers))
+        if self.num_seeds > 1:
+            parameters.append(("Seeds in ensemble", self.num_seeds))
 
         return parameters
 
@@ -360,7 +593,19 @@ class OWAdversarialDebiasing(ConcurrentWidgetMixin, OWBaseLearner):
     def on_done(self, result: Model):
         assert isinstance(result, Model) or result is None
         self.model = result
+        self._fitted = self._fitting if result is not None else None
         self.Outputs.model.send(result)
+        self.Information.seed_fairness.clear()
+        if isinstance(result, AdversarialDebiasingEnsembleModel):
+            self.Information.seed_fairness(
+                len(result.networks),
+                ", ".join(
+                    f"{name.replace('_', ' ')} {np.nanmean(scores):.3f} ± "
+                    f"{np.nanstd(scores):.3f}"
+                    for name, scores in result.seed_fairness.items()
+                ),
+            )
+        show_timing(self, self._tracer)
 
     def on_exception(self, ex):
         raise ex
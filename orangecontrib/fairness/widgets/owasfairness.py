@@ -15,7 +15,10 @@ from Orange.widgets.widget import Input, Output, OWWidget
 from Orange.widgets.utils.itemmodels import DomainModel, PyListModel
 from Orange.data import Table, Domain, DiscreteVariable
 
-from orangecontrib.fairness.widgets.utils import check_data_structure
+from orangecontrib.fairness.widgets.utils import (
+    as_fairness_data,
+    check_data_structure,
+)
 
 
 class OWAsFairness(OWWidget):
@@ -133,10 +136,8 @@ class OWAsFairness(OWWidget):
         domain: Optional[Domain] = None
 
         if data is not None:
-            # Create a table with the same data but a different domain
-            self._data = data.transform(data.domain)
-            # Copy the attributes from the original data to the new data
-            self._data.attributes = data.attributes.copy()
+            # The input table is not modified, the output shares its arrays
+            self._data = data
 
             # A new Domain object is created from the attributes and class variables of the
             # input data. This Domain object represents the structure of the input data
@@ -329,33 +330,15 @@ class OWAsFairness(OWWidget):
         ):
             return None
 
-        old_domain = data.domain
-
-        # Create the new attribute or copy the old ones
-        new_attributes = []
-        for attribute in old_domain.attributes:
-            # If the attribute is the protected attribute, then create a new attribute with
-            # the same values but add the privileged_pa_values attribute.
-            if attribute.name == self.protected_attribute.name:
-                new_attr = attribute.copy()
-                new_attr.attributes["privileged_pa_values"] = self.privileged_pa_values
-            # Else copy the attribute and remove the privileged_pa_values attribute if it exists
-            else:
-                new_attr = attribute.copy()
-                if "privileged_pa_values" in new_attr.attributes:
-                    del new_attr.attributes["privileged_pa_values"]
-
-            new_attributes.append(new_attr)
-
-        # Create new class_var
-        new_class_var = old_domain.class_var.copy()
-        new_class_var.attributes["favorable_class_value"] = self.favorable_class_value
-
-        new_domain = Domain(new_attributes, new_class_var, old_domain.metas)
-
-        # Create a new table with the new domain
-        new_data = data.transform(new_domain)
-        return new_data
+        # The domain with the fairness attributes is created (or reused if it was
+        # already created for this domain) and the new table shares the arrays with
+        # the data, because only the attributes of the variables are changed
+        return as_fairness_data(
+            data,
+            self.favorable_class_value,
+            self.protected_attribute,
+            self.privileged_pa_values,
+        )
 
     # The defered allows us to only call the function once the user has stopped
     # changing the values of the comboboxes or listboxes and "Applies" the changes
@@ -11,12 +11,15 @@ from Orange.widgets import gui
 from Orange.widgets.widget import Input, OWWidget
 from Orange.data import Table
 
-from aif360.metrics import BinaryLabelDatasetMetric
-
+from orangecontrib.fairness.instrumentation import span
 from orangecontrib.fairness.widgets.utils import (
-    table_to_standard_dataset,
+    FairnessView,
     check_fairness_data,
     check_for_missing_values,
+    new_tracer,
+    show_timing,
+    timing_box,
+    traced,
 )
 
 
@@ -50,6 +53,7 @@ class OWDatasetBias(OWWidget):
         box = gui.vBox(self.mainArea, "Bias")
         self.disparate_impact_label = gui.label(box, self, "No data detected.")
         self.statistical_parity_difference_label = gui.label(box, self, "")
+        timing_box(self, self.mainArea)
 
     @Inputs.data
     @check_fairness_data
@@ -63,17 +67,15 @@ class OWDatasetBias(OWWidget):
             self.statistical_parity_difference_label.setToolTip("")
             return
 
-        # Convert Orange data to aif360 StandardDataset
-        standard_dataset, privileged_groups, unprivileged_groups = (
-            table_to_standard_dataset(data)
-        )
-
-        # Compute the bias of the dataset (disparate impact and statistical parity difference)
-        dataset_metric = BinaryLabelDatasetMetric(
-            standard_dataset, unprivileged_groups, privileged_groups
-        )
-        disparate_impact = dataset_metric.disparate_impact()
-        statistical_parity_difference = dataset_metric.statistical_parity_difference()
+        # Compute the bias of the dataset (disparate impact and statistical parity
+        # difference) from the groups and the labels, the features are not needed
+        tracer = new_tracer()
+        with traced(tracer):
+            view = FairnessView.from_table(data)
+            with span("dataset bias", rows=len(view)):
+                disparate_impact = view.disparate_impact()
+                statistical_parity_difference = view.statistical_parity_difference()
+        show_timing(self, tracer)
         self.disparate_impact_label.setText(
             f"Disparate Impact (ideal = 1): {round(disparate_impact, 3):.3f}"
         )
@@ -18,9 +18,16 @@ from AnyQt.QtWidgets import QFormLayout
 from AnyQt.QtCore import Qt
 
 from orangecontrib.fairness.modeling.postprocessing import PostprocessingLearner
+from orangecontrib.fairness.instrumentation import Tracer
 from orangecontrib.fairness.widgets.utils import (
     check_fairness_data,
     check_for_missing_values,
+    fitted_models,
+    model_cache_key,
+    new_tracer,
+    show_timing,
+    timing_box,
+    traced,
 )
 
 
@@ -37,13 +44,27 @@ class EqualizedOddsRunner:
     """
 
     @staticmethod
-    def run(learner: Learner, data: Table, state: TaskState) -> Model:
+    def run(
+        learner: Learner,
+        data: Table,
+        state: TaskState,
+        tracer: Tracer = None,
+        cached: bool = False,
+    ) -> Model:
         """
         Function used to run the EqualizedOddsLearner in a separate
         thread and display progress using the callback.
+
+        If cached, the model is taken from the cache of fitted models if the learner
+        was already fitted on the data, otherwise the fitted model is added to it. The
+        key is computed here, since hashing the data would block the widget's thread.
         """
         if data is None:
             return None
+        cache_key = model_cache_key(learner, data) if cached else None
+        model = fitted_models.get(cache_key)
+        if model is not None:
+            return model
 
         def callback(progress: float, msg: str = None) -> bool:
             state.set_progress_value(progress)
@@ -51,7 +72,10 @@ class EqualizedOddsRunner:
                 raise InterruptException
 
         state.set_status("Training model...")
-        model = learner(data, progress_callback=callback)
+        # The stages of the fitting are timed for the widget's timing box
+        with traced(tracer):
+            model = learner(data, progress_callback=callback)
+        fitted_models.put(cache_key, model)
         return model
 
 
@@ -82,6 +106,7 @@ class OWEqualizedOdds(ConcurrentWidgetMixin, OWBaseLearner):
 
     def __init__(self):
         self.input_learner: Learner = None
+        self._tracer = None
         ConcurrentWidgetMixin.__init__(self)
         OWBaseLearner.__init__(self)
 
@@ -101,6 +126,7 @@ class OWEqualizedOdds(ConcurrentWidgetMixin, OWBaseLearner):
                 attribute=Qt.WA_LayoutUsesWidgetRect,
             )
         )
+        timing_box(self, self.controlArea)
 
     @Inputs.data
     @check_fairness_data
@@ -155,10 +181,21 @@ class OWEqualizedOdds(ConcurrentWidgetMixin, OWBaseLearner):
 
     def update_model(self):
         """Responsible for starting a new thread, fitting the learner
-        and sending the created model to the output"""
+        and sending the created model to the output
+
+        The model is taken from the cache if the same learner was already fitted
+        on the same data with replicable training"""
         self.cancel()
         if self.data is not None and self.input_learner is not None:
-            self.start(EqualizedOddsRunner.run, self.learner, self.data)
+            self._tracer = new_tracer()
+            self.start(
+                EqualizedOddsRunner.run,
+                self.learner,
+                self.data,
+                tracer=self._tracer,
+                # Without a seed, applying again must fit a new model
+                cached=self.repeatable,
+            )
         else:
             self.Outputs.model.send(None)
 
@@ -169,6 +206,7 @@ class OWEqualizedOdds(ConcurrentWidgetMixin, OWBaseLearner):
         assert isinstance(result, Model) or result is None
         self.model = result
         self.Outputs.model.send(result)
+        show_timing(self, self._tracer)
 
     def on_exception(self, ex):
         raise ex
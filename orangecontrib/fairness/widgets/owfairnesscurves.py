@@ -0,0 +1,207 @@
+"""
+This module contains the Fairness Curves widget.
+
+This widget plots the fairness metrics and the accuracy of a model for every decision
+threshold, which helps with choosing a threshold with a good fairness/accuracy trade-off.
+"""
+
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+import pyqtgraph as pg
+
+from AnyQt.QtCore import Qt
+from AnyQt.QtGui import QColor
+
+from Orange.evaluation import Results
+from Orange.widgets import gui
+from Orange.widgets.settings import Setting
+from Orange.widgets.evaluate.utils import check_results_adequacy
+from Orange.widgets.utils import colorpalettes
+from Orange.widgets.widget import Input, Msg, OWWidget
+
+from orangecontrib.fairness.evaluation.curves import FairnessCurves
+from orangecontrib.fairness.widgets.utils import (
+    contains_fairness_attributes,
+    MISSING_FAIRNESS_ATTRIBUTES,
+)
+
+
+MetricDefinition = namedtuple("MetricDefinition", ("name", "function", "ideal"))
+
+Metrics = [
+    MetricDefinition("Statistical Parity Difference", FairnessCurves.spd, 0),
+    MetricDefinition("Equal Opportunity Difference", FairnessCurves.eod, 0),
+    MetricDefinition("Average Odds Difference", FairnessCurves.aod, 0),
+    MetricDefinition("Disparate Impact", FairnessCurves.di, 1),
+]
+
+
+class OWFairnessCurves(OWWidget):
+    """
+    Widget for plotting the fairness metrics and the accuracy
+    of a model's predictions for every decision threshold.
+    """
+
+    name = "Fairness Curves"
+    description = (
+        "Plots the fairness metrics and the accuracy of a model's "
+        "predictions for every decision threshold."
+    )
+    icon = "icons/fairness_curves.svg"
+    priority = 45
+
+    class Inputs:
+        """Input for the widget - evaluation results."""
+
+        evaluation_results = Input("Evaluation Results", Results)
+
+    class Error(OWWidget.Error):
+        """Errors shown when the results can not be plotted."""
+
+        missing_data = Msg(
+            "Evaluation results do not contain the data.\n"
+            "The data is needed to determine the groups."
+        )
+        missing_fairness_data = Msg(MISSING_FAIRNESS_ATTRIBUTES)
+        no_probabilities = Msg("Evaluation results do not contain probabilities.")
+
+    selected_classifier = Setting(0)
+    metric_index = Setting(0)
+    show_accuracy = Setting(True)
+
+    graph_name = "plotview"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.results: Optional[Results] = None
+        self.curves: Optional[FairnessCurves] = None
+
+        box = gui.vBox(self.controlArea, "Model")
+        self.classifier_combo = gui.comboBox(
+            box, self, "selected_classifier", callback=self._on_classifier_changed
+        )
+
+        box = gui.vBox(self.controlArea, "Metric")
+        gui.radioButtons(
+            box,
+            self,
+            "metric_index",
+            btnLabels=[metric.name for metric in Metrics],
+            callback=self._replot,
+        )
+        gui.checkBox(
+            box, self, "show_accuracy", "Show accuracy", callback=self._replot
+        )
+        gui.rubber(self.controlArea)
+
+        self.plotview = pg.PlotWidget(background="w")
+        self.plot = self.plotview.getPlotItem()
+        self.plot.setMouseEnabled(False, False)
+        self.plot.hideButtons()
+        self.plot.setLabel("bottom", "Threshold")
+        self.plot.setXRange(0, 1, padding=0.02)
+        self.plot.addLegend(offset=(-10, 10))
+        self.mainArea.layout().addWidget(self.plotview)
+
+    @Inputs.evaluation_results
+    def set_results(self, results: Optional[Results]) -> None:
+        """Stores the results, computes the curves and plots them."""
+        self.Error.clear()
+        self.results = check_results_adequacy(results, self.Error)
+        if self.results is not None:
+            if self.results.data is None:
+                self.Error.missing_data()
+                self.results = None
+            elif not contains_fairness_attributes(self.results.data.domain):
+                self.Error.missing_fairness_data()
+                self.results = None
+            elif self.results.probabilities is None:
+                self.Error.no_probabilities()
+                self.results = None
+
+        self.classifier_combo.clear()
+        if self.results is not None:
+            self.classifier_combo.addItems(
+                getattr(self.results, "learner_names", None)
+                or [f"#{i + 1}" for i in range(len(self.results.predicted))]
+            )
+            if self.selected_classifier >= len(self.results.predicted):
+                self.selected_classifier = 0
+            self.classifier_combo.setCurrentIndex(self.selected_classifier)
+        self._on_classifier_changed()
+
+    def _on_classifier_changed(self):
+        self.curves = None
+        if self.results is not None:
+            self.curves = FairnessCurves.from_results(
+                self.results, model_index=self.selected_classifier
+            )
+        self._replot()
+
+    def _replot(self):
+        self.plot.clear()
+        if self.curves is None:
+            return
+
+        metric = Metrics[self.metric_index]
+        colors = colorpalettes.LimitedDiscretePalette(2).qcolors
+        values = metric.function(self.curves)
+        values[~np.isfinite(values)] = np.nan
+        self.plot.addItem(
+            pg.PlotCurveItem(
+                self.curves.thresholds,
+                values,
+                pen=pg.mkPen(colors[0], width=2),
+                connect="finite",
+                name=metric.name,
+            )
+        )
+        if self.show_accuracy:
+            self.plot.addItem(
+                pg.PlotCurveItem(
+                    self.curves.thresholds,
+                    self.curves.ca(),
+                    pen=pg.mkPen(colors[1], width=2),
+                    name="Classification accuracy",
+                )
+            )
+        self.plot.addItem(
+            pg.InfiniteLine(
+                metric.ideal,
+                angle=0,
+                pen=pg.mkPen(QColor(Qt.gray), width=1, style=Qt.DashLine),
+            )
+        )
+        self.plot.addItem(
+            pg.InfiniteLine(
+                0.5,
+                angle=90,
+                pen=pg.mkPen(QColor(Qt.gray), width=1, style=Qt.DotLine),
+            )
+        )
+        self.plot.setLabel("left", metric.name)
+
+    def send_report(self):
+        if self.results is None:
+            return
+        self.report_items(
+            (
+                ("Model", self.classifier_combo.currentText()),
+                ("Metric", Metrics[self.metric_index].name),
+            )
+        )
+        self.report_plot()
+
+
+if __name__ == "__main__":
+    from Orange.data import Table
+    from Orange.evaluation import CrossValidation
+    from Orange.classification import LogisticRegressionLearner
+    from Orange.widgets.utils.widgetpreview import WidgetPreview
+
+    table = Table("https://datasets.biolab.si/core/adult.tab")
+    WidgetPreview(OWFairnessCurves).run(
+        CrossValidation(k=5, store_data=True)(table, [LogisticRegressionLearner()])
+    )
@@ -6,17 +6,23 @@ This widget applies the reweighing algorithm to a dataset, which adjusts the wei
 
 from typing import Optional
 
+import numpy as np
+
 from Orange.widgets import gui
 from Orange.widgets.widget import Input, Output, OWWidget
 from Orange.data import Table, Domain, ContinuousVariable
 from Orange.preprocess import preprocess
 
-from aif360.algorithms.preprocessing import Reweighing as ReweighingAlgorithm
-
+from orangecontrib.fairness.instrumentation import span
 from orangecontrib.fairness.widgets.utils import (
-    table_to_standard_dataset,
+    DEFAULT_DTYPE,
+    FairnessView,
     check_fairness_data,
     check_for_missing_values,
+    new_tracer,
+    show_timing,
+    timing_box,
+    traced,
 )
 
 
@@ -24,40 +30,59 @@ class MzCom:
     """
     A class used to compute the weights of the rows of a
     dataset using a already fitted reweighing algorithm
+
+    Args:
+        model (np.ndarray): the reweighing factors of the groups and classes
+        original_domain (Domain): the domain of the data the factors were fitted on
+        dtype (np.dtype): the dtype the weights are computed in
     """
 
-    def __init__(self, model, original_domain=None):
+    def __init__(self, model, original_domain=None, dtype=DEFAULT_DTYPE):
         self.original_domain = original_domain
         self.model = model
+        self.dtype = dtype
+
+    def __setstate__(self, state):
+        # MzCom objects pickled by the earlier versions hold a fitted aif360 Reweighing
+        # instead of the factors and have no dtype
+        model = state["model"]
+        if hasattr(model, "w_p_fav"):
+            state["model"] = np.array(
+                [
+                    [model.w_up_unfav, model.w_up_fav],
+                    [model.w_p_unfav, model.w_p_fav],
+                ]
+            )
+        state.setdefault("dtype", DEFAULT_DTYPE)
+        self.__dict__.update(state)
 
     def __call__(self, data):
-        # For creating the standard dataset we need to know the encoding the table uses for
-        # the class variable. This can be found in the domain and is the same as the order
-        # of values of the class variable in the domain. This is why we need to add it back
-        # to the domain if it was removed.
+        # For reading the groups and the labels we need to know the encoding the table uses
+        # for the class variable. This can be found in the domain and is the same as the
+        # order of values of the class variable in the domain. This is why we need to add
+        # it back to the domain if it was removed.
         if not data.domain.class_var:
             data.domain.class_var = self.original_domain.class_var
-        data, _, _ = table_to_standard_dataset(data)
-        data = self.model.transform(data)
-        return data.instance_weights
+        view = FairnessView.from_table(data, self.dtype)
+        with span("reweigh", rows=len(view)):
+            return view.reweighed(self.model)
 
     InheritEq = True
 
 
 class ReweighingModel:
     """
-    A class used to create a ReweighingAlgoritm instance, fitting it to the data and returning it.
+    A class used to fit the reweighing algorithm to the data, which returns the
+    factors of the weights of the instances in each group and class.
     """
 
+    def __init__(self, dtype=DEFAULT_DTYPE):
+        self.dtype = dtype
+
     def __call__(self, data):
-        (
-            standard_dataset,
-            privileged_groups,
-            unprivileged_groups,
-        ) = table_to_standard_dataset(data)
-        reweighing = ReweighingAlgorithm(unprivileged_groups, privileged_groups)
-        reweighing = reweighing.fit(standard_dataset)
-        return reweighing
+        view = FairnessView.from_table(data, self.dtype)
+        with span("reweighing factors", rows=len(view)):
+            return view.reweighing_factors()
 
 
 class ReweighingTransform(preprocess.Preprocess):
@@ -65,12 +90,19 @@ class ReweighingTransform(preprocess.Preprocess):
     A class used to add a new column/variable to the data with the weights of
     the rows of the data computed by the fitted reweighing algorithm stored in
     the MzCom class instance as a compute_value function.
+
+    Args:
+        dtype (np.dtype): the dtype the weights are computed in, float32 or float64
     """
 
+    def __init__(self, dtype=DEFAULT_DTYPE):
+        self.dtype = dtype
+
     def __call__(self, data):
-        model = ReweighingModel()(data)
+        model = ReweighingModel(self.dtype)(data)
         weights = ContinuousVariable(
-            "weights", compute_value=MzCom(model, original_domain=data.domain)
+            "weights",
+            compute_value=MzCom(model, original_domain=data.domain, dtype=self.dtype),
         )
         # Alternative for the compute_value:
         # compute_value=lambda data, model=model: transf(data, model)
@@ -129,6 +161,8 @@ class OWReweighing(OWWidget):
             ),
         )
 
+        timing_box(self, self.mainArea)
+
         self._data: Optional[Table] = None
 
     @Inputs.data
@@ -153,7 +187,10 @@ class OWReweighing(OWWidget):
         if self._data is None:
             return
 
-        preprocessed_data = self.preprocessor(self._data)
+        tracer = new_tracer()
+        with traced(tracer):
+            preprocessed_data = self.preprocessor(self._data)
+        show_timing(self, tracer)
 
         self.Outputs.data.send(preprocessed_data)
         self.Outputs.preprocessor.send(self.preprocessor)
@@ -0,0 +1,136 @@
+"""
+This module contains the OWWeightedLearner widget.
+
+This widget is used to fit any learner with the instance weights
+computed by the reweighing preprocessor.
+"""
+
+from Orange.base import Learner
+from Orange.data import Table
+from Orange.preprocess import Impute
+from Orange.widgets import gui
+from Orange.widgets.settings import Setting
+from Orange.widgets.utils.owlearnerwidget import OWBaseLearner
+from Orange.widgets.widget import Input
+
+from AnyQt.QtWidgets import QFormLayout
+from AnyQt.QtCore import Qt
+
+from orangecontrib.fairness.modeling.weighted import WeightedLearner
+from orangecontrib.fairness.widgets.utils import (
+    check_for_missing_values,
+    has_missing_values,
+)
+
+
+class OWWeightedLearner(OWBaseLearner):
+    """
+    Widget which fits the input learner with the instance weights of the data
+    (the "weights" meta attribute added by the reweighing).
+    """
+
+    name = "Weighted Learner"
+    description = (
+        "Fits any learner with the instance weights computed by the reweighing. "
+        "Learners which do not support instance weights are fitted on a weighted "
+        "sample of the data."
+    )
+    icon = "icons/weighted_learner.svg"
+    priority = 55
+    keywords = "weighted learner reweighing"
+
+    LEARNER = WeightedLearner
+    resample = Setting(False)
+    repeatable = Setting(True)
+
+    class Inputs(OWBaseLearner.Inputs):
+        """
+        Inputs for the widget, which are the same as the inputs
+        for the super class plus a learner input.
+        """
+
+        input_learner = Input("Learner", Learner)
+
+    def __init__(self):
+        self.input_learner: Learner = None
+        super().__init__()
+
+    def add_main_layout(self):
+        """Adds the checkboxes for the resampling and the replicable training."""
+        form = QFormLayout()
+        form.setFieldGrowthPolicy(form.AllNonFixedFieldsGrow)
+        form.setLabelAlignment(Qt.AlignLeft)
+        gui.widgetBox(self.controlArea, True, orientation=form)
+        form.addRow(
+            gui.checkBox(
+                None,
+                self,
+                "resample",
+                label="Resample even if the learner supports weights",
+                callback=self.settings_changed,
+                attribute=Qt.WA_LayoutUsesWidgetRect,
+            )
+        )
+        form.addRow(
+            gui.checkBox(
+                None,
+                self,
+                "repeatable",
+                label="Replicable resampling",
+                callback=self.settings_changed,
+                attribute=Qt.WA_LayoutUsesWidgetRect,
+            )
+        )
+
+    @Inputs.data
+    @check_for_missing_values
+    def set_data(self, data: Table):
+        """
+        Handling input data by first imputing missing values if any and then calling the super class
+        """
+        if data is not None and has_missing_values(data):
+            data = Impute()(data)
+        super().set_data(data)
+
+    @Inputs.input_learner
+    def set_learner(self, input_learner: Learner):
+        """
+        Function which handles the learner input by storing the
+        learner as a class variable and updating the widget name.
+        """
+        self.input_learner = input_learner
+        if input_learner is not None:
+            self.learner_name = f"Weighted: {input_learner.name}"
+
+    def create_learner(self):
+        """
+        Responsible for creating the weighted learner with
+        the input_learner and the preprocessors.
+        """
+        if not self.input_learner:
+            return None
+        return self.LEARNER(
+            self.input_learner,
+            resample=self.resample,
+            preprocessors=self.preprocessors,
+            repeatable=self.repeatable,
+        )
+
+    def handleNewSignals(self):
+        if not self.input_learner:
+            return
+        self.update_learner()
+        if self.data is not None:
+            self.update_model()
+
+    def get_learner_parameters(self):
+        return (
+            ("Learner", self.input_learner.name if self.input_learner else None),
+            ("Resample", self.resample),
+        )
+
+
+if __name__ == "__main__":
+    from Orange.widgets.utils.widgetpreview import WidgetPreview
+
+    WidgetPreview(OWWeightedLearner).run()
@@ -7,11 +7,14 @@ can use instance weights in the training process.
 
 import Orange.widgets.model.owlogisticregression
 
-from Orange.base import Learner
 from Orange.classification.logistic_regression import LogisticRegressionLearner
 from Orange.preprocess import Impute
 
-from orangecontrib.fairness.widgets.utils import check_for_missing_values
+from orangecontrib.fairness.widgets.utils import (
+    check_for_missing_values,
+    get_instance_weights,
+    has_missing_values,
+)
 
 
 class WeightedLogisticRegressionLearner(LogisticRegressionLearner):
@@ -20,18 +23,20 @@ class WeightedLogisticRegressionLearner(LogisticRegressionLearner):
     use instance weights in the training and prediction process
     """
 
+    def fit_storage(self, data):
+        """
+        Fit the model with the instance weights from the "weights" meta attribute
+        (added by the reweighing) or, if there is none, the weights of the table;
+        the weights are passed to scikit-learn as the sample_weight
+        """
+        return self.fit(data.X, data.Y, get_instance_weights(data))
+
     def _fit_model(self, data):
         """
         A override of the _fit_model function of the LogisticRegressionLearner
-        class which allows the use of instance weights
+        class which always fits with the instance weights of the data
         """
-        if type(self).fit is Learner.fit:
-            return self.fit_storage(data)
-        else:
-            X, Y, W = data.X, data.Y, data.W if data.has_weights() else None
-            if "weights" in map(lambda a: a.name, data.domain.metas):
-                return self.fit(X, Y, W=data[:, "weights"].metas[:, 0])
-            return self.fit(X, Y, W)
+        return self.fit_storage(data)
 
 
 class OWWeightedLogisticRegression(
@@ -64,6 +69,6 @@ class OWWeightedLogisticRegression(
         Handling input data by first imputing missing values if any and then calling the super class
         """
         if data is not None:
-            if data.has_missing():
+            if has_missing_values(data):
                 data = Impute()(data)
         super().set_data(data)
@@ -0,0 +1,97 @@
+"""
+This file contains the tests for the import time of the add-on.
+
+Orange imports the widgets and scorers of the add-on when the canvas starts, so aif360
+and TensorFlow must not be imported until they are used and the import time of the
+add-on's modules (measured with `python -X importtime`) must stay within a budget.
+"""
+
+import os
+import pkgutil
+import subprocess
+import sys
+import unittest
+
+
+# The cumulative import time of the add-on's modules in seconds, which excludes the
+# modules of Orange (they are imported before the add-on); with aif360 and TensorFlow
+# imported at the module level the import took several seconds
+IMPORT_TIME_BUDGET = 2
+
+HEAVY_MODULES = ("aif360", "tensorflow")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[".."] * 4))
+
+
+def addon_modules():
+    """Return the names of the add-on's modules, without the tests"""
+    path = os.path.join(ROOT, "orangecontrib", "fairness")
+    return ("orangecontrib.fairness",) + tuple(
+        module.name
+        for module in pkgutil.walk_packages([path], "orangecontrib.fairness.")
+        if ".tests" not in module.name
+    )
+
+
+# All the modules are imported, so none can be missed when one is added
+MODULES = addon_modules()
+
+SCRIPT = f"""
+import sys
+import Orange.evaluation, Orange.preprocess, Orange.widgets.utils.owlearnerwidget
+sys.stderr.write("--- add-on imports ---\\n")
+sys.stderr.flush()
+import {", ".join(MODULES)}
+print(",".join(m for m in sys.modules if m.split(".")[0] in {HEAVY_MODULES!r}))
+"""
+
+
+def measure_imports():
+    """
+    Import the add-on in a new process with `-X importtime`.
+
+    Returns:
+        heavy_modules (list): heavy modules imported by the add-on
+        import_time (float): cumulative import time of the add-on's modules in seconds
+    """
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))),
+        QT_QPA_PLATFORM="offscreen",
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    heavy_modules = list(filter(None, process.stdout.strip().split(",")))
+
+    # Lines are "import time: self [us] | cumulative | imported package", where
+    # the top-level imports are the ones without indentation of the package name
+    report = process.stderr.split("--- add-on imports ---", 1)[1]
+    import_time = 0
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  ") and cumulative.strip().isdigit():
+            import_time += int(cumulative) / 1e6
+    return heavy_modules, import_time
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Test class for the import time of the add-on.
+    """
+
+    def test_import_time(self):
+        """Check that heavy dependencies are imported lazily and the budget is kept"""
+        heavy_modules, import_time = measure_imports()
+        self.assertEqual(heavy_modules, [])
+        self.assertLess(import_time, IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+This file contains the tests for the instrumentation of the stages.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from Orange.classification import LogisticRegressionLearner
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness import instrumentation
+from orangecontrib.fairness.instrumentation import count, span, tracing, Tracer
+from orangecontrib.fairness.modeling.postprocessing import ThresholdOptimizerLearner
+from orangecontrib.fairness.widgets.owdatasetbias import OWDatasetBias
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+from orangecontrib.fairness.widgets.utils import table_to_standard_dataset
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Test class for the spans, the counters and the export of the traces.
+    """
+
+    def test_disabled(self):
+        """Check that nothing is recorded outside of the tracing context"""
+        tracer = Tracer()
+        with tracing(tracer):
+            pass
+        with span("stage"):
+            count("runs")
+        self.assertIs(span("stage"), instrumentation._DISABLED)
+        self.assertEqual(tracer.events, [])
+        self.assertEqual(tracer.counters, {})
+
+    def test_spans_and_counters(self):
+        """Check that the spans and the counters are recorded and aggregated"""
+        with tracing() as tracer, tracing() as inner:
+            for i in range(3):
+                with span("stage", i=i):
+                    count("runs", 2)
+            with span("other"):
+                pass
+        self.assertEqual(len(inner.events), 4)
+
+        stages = tracer.stages()
+        self.assertEqual([stage.name for stage in stages], ["stage", "other"])
+        self.assertEqual(stages[0].calls, 3)
+        self.assertGreaterEqual(stages[0].seconds, 0)
+        self.assertEqual(tracer.counters, {"runs": 6})
+        self.assertEqual(tracer.events[2].args, {"i": 2})
+        self.assertIn("stage:", tracer.summary())
+        self.assertIn("(3 calls)", tracer.summary())
+        self.assertIn("runs: 6", tracer.summary())
+
+    def test_export(self):
+        """Check the Chrome trace and the JSON export"""
+        with tracing() as tracer:
+            with span("stage", rows=10):
+                count("runs")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.save(path)
+            with open(path, encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+            self.assertEqual(
+                [(event["name"], event["ph"]) for event in events],
+                [("stage", "X"), ("runs", "C")],
+            )
+            self.assertEqual(events[0]["args"], {"rows": 10})
+            self.assertGreaterEqual(events[0]["dur"], 0)
+
+            tracer.save(path, chrome=False)
+            with open(path, encoding="utf-8") as f:
+                trace = json.load(f)
+            self.assertEqual(trace["spans"][0]["name"], "stage")
+            self.assertEqual(trace["stages"][0]["calls"], 1)
+            self.assertEqual(trace["counters"], {"runs": 1})
+
+    def test_stages(self):
+        """Check that the stages of the conversion and the postprocessing are recorded"""
+        data = adult_like_data(300)
+        with tracing() as tracer:
+            table_to_standard_dataset(data)
+            ThresholdOptimizerLearner(LogisticRegressionLearner())(data)
+        names = {stage.name for stage in tracer.stages()}
+        self.assertTrue(
+            {
+                "to_pandas_dfs",
+                "StandardDataset",
+                "fit model",
+                "cross validation",
+                "fit postprocessor",
+            }
+            <= names
+        )
+
+
+class TestTimingBox(WidgetTest):
+    """
+    Test class for the timing box of the widgets.
+    """
+
+    def test_timing_box(self):
+        """Check that the timing box is only shown when the instrumentation is enabled"""
+        widget = self.create_widget(OWDatasetBias)
+        self.assertTrue(widget.timing_label.parentWidget().isHidden())
+        self.send_signal(widget.Inputs.data, adult_like_data(100))
+        self.assertEqual(widget.timing_label.text(), "")
+
+        with patch.object(instrumentation, "enabled", return_value=True):
+            widget = self.create_widget(OWDatasetBias)
+            self.assertFalse(widget.timing_label.parentWidget().isHidden())
+            self.send_signal(widget.Inputs.data, adult_like_data(100))
+        self.assertIn("FairnessView", widget.timing_label.text())
+        self.assertIn("dataset bias", widget.timing_label.text())
+
+
+if __name__ == "__main__":
+    unittest.main()
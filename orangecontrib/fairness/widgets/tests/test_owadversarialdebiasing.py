@@ -2,15 +2,60 @@
 This file contains the tests for the OWAdversarialDebiasing widget.
 """
 
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
+from unittest.mock import patch
+
+import numpy as np
+import scipy.sparse as sp
 
 from Orange.evaluation import CrossValidation, AUC, CA
 from Orange.base import Model
 from Orange.widgets.tests.base import WidgetTest
 from Orange.data import Table
 
-from orangecontrib.fairness.widgets.owadversarialdebiasing import OWAdversarialDebiasing
-from orangecontrib.fairness.modeling.adversarial import AdversarialDebiasingLearner
+from orangecontrib.fairness.widgets import owadversarialdebiasing
+from orangecontrib.fairness.widgets.owadversarialdebiasing import (
+    AdversarialDebiasingRunner,
+    OWAdversarialDebiasing,
+    parse_cpu_list,
+)
+from orangecontrib.fairness.instrumentation import tracing
+from orangecontrib.fairness.modeling.adversarial import (
+    AdversarialDebiasingLearner,
+    AdversarialDebiasingModel,
+)
+from orangecontrib.fairness.modeling.adversarial_network import (
+    AdversarialNetwork,
+    table_to_arrays,
+    _import_tensorflow,
+)
+from orangecontrib.fairness.modeling.ensemble import (
+    FAIRNESS_METRICS,
+    AdversarialDebiasingEnsembleLearner,
+)
+from orangecontrib.fairness.modeling.parallel import GradientWorkers
+from orangecontrib.fairness.modeling.process import (
+    WorkerError,
+    fit_in_process,
+    fit_in_processes,
+)
+from orangecontrib.fairness.modeling.streaming import MemmapDataset, MinibatchStream
+from orangecontrib.fairness.widgets.utils import (
+    fitted_models,
+    model_cache_key,
+    table_to_standard_dataset,
+)
+from orangecontrib.fairness.widgets.tests.utils import (
+    adult_like_data,
+    assert_not_densified,
+)
 
 
 class TestOWAdversarialDebiasing(WidgetTest):
@@ -25,6 +70,7 @@ class TestOWAdversarialDebiasing(WidgetTest):
         self.incorrect_input_data_path = (
             "https://datasets.biolab.si/core/breast-cancer.tab"
         )
+        fitted_models.clear()
         self.widget = self.create_widget(OWAdversarialDebiasing)
 
     def test_no_data(self):
@@ -47,6 +93,58 @@ class TestOWAdversarialDebiasing(WidgetTest):
         self.assertEqual(self.widget.debias, False)
         self.assertEqual(self.widget.repeatable, True)
 
+    def test_threads(self):
+        """Check that the numbers of threads and the CPUs are passed to the session"""
+        self.widget.controls.intra_op_threads.setValue(1)
+        self.widget.controls.inter_op_threads.setValue(1)
+        self.widget.controls.cpu_affinity.setText("0")
+        self.widget.apply()
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertEqual(learner.intra_op_threads, 1)
+        self.assertEqual(learner.inter_op_threads, 1)
+        self.assertEqual(learner.cpu_affinity, [0])
+
+        learner.model_params["num_epochs"] = 1
+        model = learner(adult_like_data(200))
+        config = model._model.sess._config
+        self.assertEqual(config.intra_op_parallelism_threads, 1)
+        self.assertEqual(config.inter_op_parallelism_threads, 1)
+
+        self.widget.controls.cpu_affinity.setText("3-1")
+        self.widget.apply()
+        self.assertTrue(self.widget.Error.invalid_cpu_affinity.is_shown())
+        self.assertIsNone(self.get_output(self.widget.Outputs.learner).cpu_affinity)
+
+    def test_num_workers(self):
+        """Check that the number of processes is passed to the learner"""
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertEqual(learner.model_params["num_workers"], 1)
+        self.widget.num_workers = 2
+        self.widget.controls.repeatable.setChecked(True)
+        self.widget.apply()
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertEqual(learner.model_params["num_workers"], 2)
+        self.assertTrue(learner.model_params["deterministic"])
+
+    def test_num_seeds(self):
+        """Check that the widget makes an ensemble learner with several seeds"""
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertNotIsInstance(learner, AdversarialDebiasingEnsembleLearner)
+        self.widget.num_seeds = 3
+        self.widget.apply()
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertIsInstance(learner, AdversarialDebiasingEnsembleLearner)
+        self.assertEqual(learner.num_seeds, 3)
+        self.assertEqual(learner.params["num_epochs"], self.widget.number_of_epochs)
+
+    def test_parse_cpu_list(self):
+        """Check the parsing of the lists of CPUs"""
+        self.assertEqual(parse_cpu_list("0-3, 8,2"), [0, 1, 2, 3, 8])
+        self.assertIsNone(parse_cpu_list(""))
+        for text in ("a", "3-1", "-1", "1-"):
+            with self.assertRaises(ValueError):
+                parse_cpu_list(text)
+
     def test_incorrect_input_data(self):
         """
         Check that the widget displays an error message when the
@@ -73,6 +171,214 @@ class TestOWAdversarialDebiasing(WidgetTest):
         model = self.get_output(self.widget.Outputs.model)
         self.assertIsNotNone(model)
 
+    def test_training_in_process(self):
+        """Check that the model trained in the worker process is sent to the output"""
+        self.widget.controls.number_of_epochs.setValue(1)
+        data = adult_like_data(300)
+        self.send_signal(self.widget.Inputs.data, data)
+        self.wait_until_finished(self.widget, timeout=60000)
+        model = self.get_output(self.widget.Outputs.model)
+        self.assertIsInstance(model, AdversarialDebiasingModel)
+        self.assertEqual(model(data).shape, (300,))
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_warm_start(self):
+        """Check that the training continues when only the number of epochs increases"""
+        self.widget.controls.number_of_epochs.setValue(1)
+        data = adult_like_data(300)
+        self.send_signal(self.widget.Inputs.data, data)
+        self.wait_until_finished(self.widget, timeout=60000)
+        model = self.get_output(self.widget.Outputs.model)
+        self.assertEqual(model._model.epochs_trained, 1)
+
+        self.widget.controls.number_of_epochs.setValue(3)
+        self.widget.apply()
+        self.wait_until_finished(self.widget, timeout=60000)
+        continued = self.get_output(self.widget.Outputs.model)
+        self.assertEqual(continued._model.epochs_trained, 3)
+        self.assertEqual(continued.params["num_epochs"], 3)
+        self.assertEqual(model._model.epochs_trained, 1)
+
+        with patch.object(AdversarialDebiasingRunner, "run") as run:
+            self.widget.controls.number_of_epochs.setValue(2)
+            self.widget.apply()
+            self.assertIsNone(run.call_args[1]["warm_start"])
+            self.widget.controls.number_of_epochs.setValue(4)
+            self.widget.apply()
+            self.assertIs(run.call_args[1]["warm_start"], continued)
+            self.widget.controls.batch_size.setValue(64)
+            self.widget.apply()
+            self.assertIsNone(run.call_args[1]["warm_start"])
+
+    def test_repeatable_without_warm_start(self):
+        """Check that the replicable models do not depend on the previous fits"""
+        self.widget.controls.number_of_epochs.setValue(1)
+        self.widget.controls.repeatable.setChecked(True)
+        data = adult_like_data(300)
+        self.send_signal(self.widget.Inputs.data, data)
+        self.wait_until_finished(self.widget, timeout=60000)
+        self.widget.controls.number_of_epochs.setValue(2)
+        self.wait_until_finished(self.widget, timeout=60000)
+        model = self.get_output(self.widget.Outputs.model)
+        self.assertEqual(model._model.epochs_trained, 2)
+
+        # A fit of two epochs from scratch, without the cache
+        fitted_models.clear()
+        self.send_signal(self.widget.Inputs.data, data.copy())
+        self.wait_until_finished(self.widget, timeout=60000)
+        fresh = self.get_output(self.widget.Outputs.model)
+        self.assertIsNot(fresh, model)
+        np.testing.assert_equal(
+            fresh(data, ret=Model.Probs), model(data, ret=Model.Probs)
+        )
+
+    def test_cached_model(self):
+        """Check that only the models fitted at once with a seed are cached"""
+        self.widget.controls.number_of_epochs.setValue(1)
+        self.widget.controls.repeatable.setChecked(True)
+        data = adult_like_data(300)
+        self.send_signal(self.widget.Inputs.data, data)
+        self.wait_until_finished(self.widget, timeout=60000)
+        model = self.get_output(self.widget.Outputs.model)
+
+        # The replicable models are fitted from scratch, so each is cached
+        self.widget.controls.number_of_epochs.setValue(2)
+        self.wait_until_finished(self.widget, timeout=60000)
+        self.assertEqual(len(fitted_models), 2)
+
+        # The continued training is not cached under the key of a fit at once
+        self.widget.controls.repeatable.setChecked(False)
+        self.wait_until_finished(self.widget, timeout=60000)
+        self.widget.controls.number_of_epochs.setValue(3)
+        self.wait_until_finished(self.widget, timeout=60000)
+        continued = self.get_output(self.widget.Outputs.model)
+        self.assertEqual(continued._model.epochs_trained, 3)
+        self.assertEqual(len(fitted_models), 2)
+        self.widget.controls.repeatable.setChecked(True)
+        self.wait_until_finished(self.widget, timeout=60000)
+
+        threads = []
+
+        def cache_key(learner, data):
+            threads.append(threading.current_thread())
+            return model_cache_key(learner, data)
+
+        with patch.object(
+            owadversarialdebiasing, "model_cache_key", cache_key
+        ), patch.object(
+            owadversarialdebiasing, "fit_in_process", wraps=fit_in_process
+        ) as fit:
+            self.widget.controls.number_of_epochs.setValue(1)
+            self.send_signal(self.widget.Inputs.data, data.copy())
+            self.wait_until_finished(self.widget, timeout=60000)
+            fit.assert_not_called()
+            self.assertIs(self.get_output(self.widget.Outputs.model), model)
+            # Hashing the data does not block the widget
+            self.assertTrue(threads)
+            self.assertNotIn(threading.main_thread(), threads)
+
+            # Without a seed, applying again trains a new network
+            self.widget.controls.repeatable.setChecked(False)
+            self.wait_until_finished(self.widget, timeout=60000)
+            self.widget.apply()
+            self.wait_until_finished(self.widget, timeout=60000)
+            self.assertEqual(fit.call_count, 2)
+            self.assertIsNot(self.get_output(self.widget.Outputs.model), model)
+            self.assertEqual(len(threads), 2)
+
+
+class TestFitInProcess(unittest.TestCase):
+    """
+    Test class for fitting the learner in a worker process.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(300)
+
+    def test_fit(self):
+        """Check the progress, the model and the spans sent by the worker"""
+        progress = []
+        learner = AdversarialDebiasingLearner(num_epochs=2, seed=42)
+        with tracing() as tracer:
+            model = fit_in_process(learner, self.data, progress.append)
+        self.assertEqual(max(progress), 100)
+        self.assertIn("epoch", [stage.name for stage in tracer.stages()])
+        np.testing.assert_allclose(
+            model(self.data, ret=Model.Probs),
+            learner(self.data)(self.data, ret=Model.Probs),
+            atol=1e-6,
+        )
+
+    def test_cancel(self):
+        """Check that the worker is killed as soon as the callback raises"""
+
+        def callback(_):
+            raise KeyboardInterrupt
+
+        learner = AdversarialDebiasingLearner(num_epochs=1000)
+        start = time.perf_counter()
+        with self.assertRaises(KeyboardInterrupt):
+            fit_in_process(learner, self.data, callback)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_error(self):
+        """Check that an error in the worker is raised with the worker's traceback"""
+        learner = AdversarialDebiasingLearner(num_epochs=1)
+        with self.assertRaisesRegex(WorkerError, "Traceback"):
+            fit_in_process(learner, self.data[:, :3])
+
+
+class TestEnsemble(unittest.TestCase):
+    """
+    Test class for the ensemble of networks trained with several seeds.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(300)
+
+    def test_fit_in_processes(self):
+        """Check that the models are returned in the order of the learners"""
+        learners = [
+            AdversarialDebiasingLearner(num_epochs=1, seed=seed) for seed in (1, 2, 3)
+        ]
+        progress = []
+        models = fit_in_processes(learners, self.data, progress.append, 2)
+        self.assertEqual(progress[-1], 100)
+        for learner, model in zip(learners, models):
+            np.testing.assert_allclose(
+                model(self.data, ret=Model.Probs),
+                learner(self.data)(self.data, ret=Model.Probs),
+                atol=1e-6,
+            )
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_ensemble(self):
+        """Check that the ensemble predicts the mean of the networks of the seeds"""
+        model = AdversarialDebiasingEnsembleLearner(num_seeds=3, num_epochs=1, seed=42)(
+            self.data
+        )
+        self.assertEqual(len(model.networks), 3)
+        expected = np.mean(
+            [
+                AdversarialDebiasingLearner(num_epochs=1, seed=seed)(self.data)(
+                    self.data, ret=Model.Probs
+                )
+                for seed in (42, 43, 44)
+            ],
+            axis=0,
+        )
+        probs = model(self.data, ret=Model.Probs)
+        np.testing.assert_allclose(probs, expected, atol=1e-6)
+        unpickled = pickle.loads(pickle.dumps(model))
+        np.testing.assert_allclose(unpickled(self.data, ret=Model.Probs), probs)
+
+        self.assertEqual(set(model.seed_fairness), set(FAIRNESS_METRICS))
+        for scores in model.seed_fairness.values():
+            self.assertEqual(scores.shape, (3,))
+        # The networks of the seeds differ
+        self.assertGreater(np.ptp(model.seed_fairness["average_odds_difference"]), 0)
+
 
 class TestAdversarialDebiasing(unittest.TestCase):
     """
@@ -110,6 +416,335 @@ class TestAdversarialDebiasing(unittest.TestCase):
         self.assertLess(abs(scores.sum(axis=1) - 1).all(), 1e-6)
         self.assertTrue(all(label in [0, 1] for label in labels))
 
+    def test_imputation_reused(self):
+        """Check that the data is imputed with the statistics of the training data"""
+        data = adult_like_data(300).copy()
+        with data.unlocked(data.X):
+            data.X[::5, 0] = np.nan
+        learner = AdversarialDebiasingLearner(num_epochs=1, seed=42)
+        model = learner(data[:200])
+
+        with patch("orangecontrib.fairness.widgets.utils.Impute") as impute:
+            labels, scores = model(data[200:], ret=Model.ValueProbs)
+            impute.assert_not_called()
+        self.assertEqual(len(labels), 100)
+        self.assertFalse(np.isnan(scores).any())
+
+    def test_pickle(self):
+        """Check that the unpickled model predicts the same as the fitted model"""
+        for data in (adult_like_data(300), adult_like_data(300).to_sparse()):
+            model = AdversarialDebiasingLearner(num_epochs=1, seed=42)(data)
+            unpickled = pickle.loads(pickle.dumps(model))
+            self.assertIsNone(unpickled._model.sess)
+            np.testing.assert_equal(
+                unpickled(data, ret=Model.Probs), model(data, ret=Model.Probs)
+            )
+
+    def test_sparse_data(self):
+        """Check that the learner fits and predicts sparse data without densifying it"""
+        data = adult_like_data(300).to_sparse()
+        learner = AdversarialDebiasingLearner(num_epochs=2, seed=42)
+        with assert_not_densified(self):
+            model = learner(data)
+            labels, scores = model(data, ret=Model.ValueProbs)
+        self.assertEqual(scores.shape, (300, 2))
+        self.assertFalse(np.isnan(scores).any())
+        np.testing.assert_equal(labels, np.argmax(scores, axis=1))
+
+    def test_partial_fit(self):
+        """Check that partial_fit continues the training of a copy of the model"""
+        data = adult_like_data(300)
+        learner = AdversarialDebiasingLearner(num_epochs=2, seed=42)
+        model = learner(data)
+        probs = model(data, ret=Model.Probs)
+        state = model._model.training_state()
+        self.assertIn("adversarial_debiasing/classifier_model/W1/Adam", state)
+
+        unchanged = learner.partial_fit(model, data, num_epochs=0)
+        for name, value in unchanged._model.training_state().items():
+            np.testing.assert_equal(value, state[name])
+
+        continued = learner.partial_fit(model, data[:200], num_epochs=3)
+        self.assertEqual(continued._model.epochs_trained, 5)
+        self.assertEqual(model._model.epochs_trained, 2)
+        np.testing.assert_equal(model(data, ret=Model.Probs), probs)
+        self.assertFalse(np.allclose(continued(data, ret=Model.Probs), probs))
+
+        # By default, the pickled models only have what they need to predict
+        unpickled = pickle.loads(pickle.dumps(continued))
+        self.assertIsNone(unpickled._model.training_state())
+        with self.assertRaises(ValueError):
+            learner.partial_fit(unpickled, data, num_epochs=1)
+
+    def test_keep_training_state(self):
+        """Check that the training of unpickled models continues with keep_training_state"""
+        data = adult_like_data(300)
+        learner = AdversarialDebiasingLearner(
+            num_epochs=2, seed=42, keep_training_state=True
+        )
+        model = learner(data)
+        state = model._model.training_state()
+        unpickled = pickle.loads(pickle.dumps(model))
+        for name, value in unpickled._model.training_state().items():
+            np.testing.assert_equal(value, state[name])
+        np.testing.assert_equal(
+            unpickled(data, ret=Model.Probs), model(data, ret=Model.Probs)
+        )
+
+        continued = learner.partial_fit(unpickled, data, num_epochs=1)
+        self.assertEqual(continued._model.epochs_trained, 3)
+        again = pickle.loads(pickle.dumps(continued))
+        self.assertEqual(learner.partial_fit(again, data, 1)._model.epochs_trained, 4)
+
+    def test_continue_fit(self):
+        """Check that continue_fit trains the network for the learner's number of epochs"""
+        data = adult_like_data(300)
+        model = AdversarialDebiasingLearner(num_epochs=1, seed=42)(data)
+        learner = AdversarialDebiasingLearner(num_epochs=3, seed=42)
+        progress = []
+        continued = learner.continue_fit(model, data, progress.append)
+        self.assertEqual(continued._model.epochs_trained, 3)
+        self.assertEqual(continued.params["num_epochs"], 3)
+        self.assertGreaterEqual(progress[-1], 100)
+
+        # A model fitted in another process
+        data = adult_like_data(300).to_sparse()
+        model = fit_in_process(
+            AdversarialDebiasingLearner(num_epochs=1, seed=42, keep_training_state=True),
+            data,
+        )
+        continued = learner.continue_fit(model, data)
+        self.assertEqual(continued._model.epochs_trained, 3)
+
+
+class TestAdversarialNetwork(unittest.TestCase):
+    """
+    Test class for the AdversarialNetwork, which replaces aif360's AdversarialDebiasing.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(500)
+        self.tf = _import_tensorflow()
+        self.tf.disable_eager_execution()
+
+    def _session(self):
+        self.tf.reset_default_graph()
+        return self.tf.Session()
+
+    def test_same_as_aif360(self):
+        """Check that the network gives the same scores as aif360 with the same seed"""
+        from aif360.algorithms.inprocessing import AdversarialDebiasing
+
+        dataset, privileged, unprivileged = table_to_standard_dataset(self.data)
+        features, labels, protected = table_to_arrays(self.data)
+        np.testing.assert_equal(features, dataset.features)
+
+        expected = (
+            AdversarialDebiasing(
+                unprivileged,
+                privileged,
+                "adversarial_debiasing",
+                self._session(),
+                seed=42,
+                num_epochs=2,
+                classifier_num_hidden_units=20,
+            )
+            .fit(dataset)
+            .predict(dataset)
+            .scores[:, 0]
+        )
+        network = AdversarialNetwork(
+            self._session(), seed=42, num_epochs=2, classifier_num_hidden_units=20
+        )
+        scores = network.fit(features, labels, protected).predict_scores(features)
+        np.testing.assert_allclose(scores, expected, rtol=1e-6)
+
+    def test_dtype(self):
+        """Check that float32 arrays give the same network as float64 arrays"""
+        features, labels, protected = table_to_arrays(self.data)
+        self.assertEqual(features.dtype, np.float64)
+        features32, labels8, protected8 = table_to_arrays(self.data, np.float32)
+        self.assertEqual(features32.dtype, np.float32)
+        self.assertEqual(labels8.dtype, np.int8)
+        self.assertEqual(protected8.dtype, np.int8)
+        np.testing.assert_equal(features32, features.astype(np.float32))
+        np.testing.assert_equal(labels8, labels)
+        np.testing.assert_equal(protected8, protected)
+        sparse_features, _, _ = table_to_arrays(self.data.to_sparse(), np.float32)
+        self.assertEqual(sparse_features.dtype, np.float32)
+        with self.assertRaises(ValueError):
+            table_to_arrays(self.data, np.int32)
+
+        network = AdversarialNetwork(self._session(), seed=42, num_epochs=2)
+        scores = network.fit(features, labels, protected).predict_scores(features)
+        network = AdversarialNetwork(self._session(), seed=42, num_epochs=2)
+        network.fit(features32, labels8, protected8)
+        np.testing.assert_equal(network.predict_scores(features32), scores)
+
+    def test_sparse_features(self):
+        """Check that sparse features give the same network as dense features"""
+        features, labels, protected = table_to_arrays(self.data)
+        sparse_features, sparse_labels, _ = table_to_arrays(self.data.to_sparse())
+        self.assertTrue(sp.isspmatrix_csr(sparse_features))
+        np.testing.assert_equal(sparse_features.toarray(), features)
+        np.testing.assert_equal(sparse_labels, labels)
+
+        network = AdversarialNetwork(self._session(), seed=42, num_epochs=2)
+        scores = network.fit(features, labels, protected).predict_scores(features)
+        network = AdversarialNetwork(self._session(), seed=42, num_epochs=2)
+        network.fit(sparse_features, labels, protected)
+        self.assertTrue(network.sparse)
+        np.testing.assert_allclose(
+            network.predict_scores(sparse_features), scores, atol=1e-5
+        )
+
+
+class TestParallelTraining(unittest.TestCase):
+    """
+    Test class for the data-parallel training with the gradient workers.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(300)
+        self.tf = _import_tensorflow()
+        self.tf.disable_eager_execution()
+
+    def test_gradients(self):
+        """Check that the averaged gradients of the shards are those of the minibatch"""
+        tf = self.tf
+        features, labels, protected = table_to_arrays(self.data)
+        labels, protected = labels.reshape(-1, 1), protected.reshape(-1, 1)
+        tf.reset_default_graph()
+        network = AdversarialNetwork(tf.Session(), num_workers=3)
+        with tf.variable_scope(network.scope_name):
+            network._build_parallel(tf, features.shape[1], [1, 2, 3, 4])
+        network.sess.run(tf.global_variables_initializer())
+        weights = network.sess.run(network.weights)
+        shapes = [weight.shape for weight in weights]
+
+        # The gradients of the whole minibatch, computed in this process
+        graph = tf.Graph()
+        with graph.as_default():
+            reference = AdversarialNetwork(None)
+            gradients = reference._build_gradients(tf, shapes, 4)
+        batch_ids = np.array([5, 17, 3, 250, 42, 7, 99])
+        feed_dict = dict(zip(reference.weights_ph, weights))
+        feed_dict.update(
+            {
+                reference.features_ph: features[batch_ids],
+                reference.true_labels_ph: labels[batch_ids],
+                reference.protected_attributes_ph: protected[batch_ids],
+                reference.keep_prob: 1.0,
+            }
+        )
+        expected = tf.Session(graph=graph).run(gradients, feed_dict=feed_dict)
+
+        with GradientWorkers(
+            network, features, labels, protected, shapes, 4, 3, seed=0
+        ) as workers:
+            workers.set_weights(weights)
+            averaged = workers.gradients(batch_ids, keep_prob=1.0)
+        self.assertEqual(len(averaged), len(expected))
+        for gradient, expected_gradient in zip(averaged, expected):
+            np.testing.assert_allclose(gradient, expected_gradient, atol=1e-6)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_deterministic(self):
+        """Check that the deterministic training gives the same model in every run"""
+        learner = AdversarialDebiasingLearner(
+            num_epochs=2, seed=42, num_workers=2, deterministic=True
+        )
+        # The worker process of the widgets can start the gradient workers
+        model = fit_in_process(learner, self.data)
+        np.testing.assert_equal(
+            model(self.data, ret=Model.Probs),
+            learner(self.data)(self.data, ret=Model.Probs),
+        )
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Test class for the training on minibatches streamed from memory-mapped files.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_memmap_dataset(self):
+        """Check that the files contain the arrays of the data, as float32 and int8"""
+        for data in (adult_like_data(1000), adult_like_data(1000).to_sparse()):
+            dataset = MemmapDataset.from_table(data, self.directory.name, chunk_rows=300)
+            features, labels, protected = table_to_arrays(data)
+            if sp.issparse(features):
+                features = features.toarray()
+            self.assertEqual(dataset.features.dtype, np.float32)
+            self.assertEqual(dataset.labels.dtype, np.int8)
+            np.testing.assert_equal(dataset.features, features.astype(np.float32))
+            np.testing.assert_equal(dataset.labels, labels)
+            np.testing.assert_equal(dataset.protected, protected)
+
+    def test_stream(self):
+        """Check that an epoch streams every row at most once, in a new order"""
+        data = adult_like_data(1000)
+        dataset = MemmapDataset.from_table(data, self.directory.name)
+        # The rows are identified by a feature with unique values
+        features = np.array(dataset.features)
+        features[:, 0] = np.arange(len(data))
+        dataset.features = features
+        stream = MinibatchStream(
+            dataset, batch_size=64, buffer_rows=200, block_rows=50, seed=0
+        )
+        epochs = []
+        for _ in range(2):
+            batches = list(stream.epoch())
+            self.assertEqual(len(batches), stream.num_batches)
+            rows = np.concatenate([batch[0][:, 0] for batch in batches]).astype(int)
+            self.assertEqual(len(set(rows)), 1000 // 64 * 64)
+            for batch_features, batch_labels, batch_protected in batches:
+                ids = batch_features[:, 0].astype(int)
+                np.testing.assert_equal(batch_features[:, 1:], features[ids, 1:])
+                np.testing.assert_equal(batch_labels[:, 0], dataset.labels[ids])
+                np.testing.assert_equal(batch_protected[:, 0], dataset.protected[ids])
+            epochs.append(rows)
+        self.assertFalse(np.array_equal(epochs[0], epochs[1]))
+
+        # The prefetching thread stops when the training stops early
+        threads = threading.active_count()
+        batches = stream.epoch()
+        next(batches)
+        batches.close()
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_bounded_memory(self):
+        """Check that streaming an epoch takes much less memory than the features"""
+        dataset = MemmapDataset.from_table(adult_like_data(200_000), self.directory.name)
+        stream = MinibatchStream(dataset, batch_size=128, buffer_rows=4096, seed=0)
+        tracemalloc.start()
+        try:
+            for _ in stream.epoch():
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(10 * peak, dataset.features.nbytes)
+
+    def test_learner(self):
+        """Check the learner which streams the minibatches from temporary files"""
+        data = adult_like_data(1000)
+        learner = AdversarialDebiasingLearner(
+            num_epochs=3, seed=42, memmap_dir=self.directory.name, shuffle_buffer=500
+        )
+        model = learner(data)
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertEqual(len(model._model.epoch_rows_per_second), 3)
+        in_memory = AdversarialDebiasingLearner(num_epochs=3, seed=42)(data)
+        self.assertAlmostEqual(
+            np.mean(model(data) == data.Y), np.mean(in_memory(data) == data.Y), delta=0.05
+        )
+        unpickled = pickle.loads(pickle.dumps(model))
+        np.testing.assert_equal(unpickled(data), model(data))
+
 
 class TestCallbackSession(unittest.TestCase):
     """
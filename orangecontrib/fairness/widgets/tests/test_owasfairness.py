@@ -2,15 +2,32 @@
 This file contains the tests for the OWAsFairness widget.
 """
 
+import gc
+import os
+import tempfile
+import weakref
 import unittest
 
+import numpy as np
+import scipy.sparse as sp
+
+from Orange.data import Domain, DiscreteVariable
 from Orange.data.table import Table
 from Orange.widgets.tests.base import WidgetTest
 from Orange.widgets.tests.utils import simulate
 from Orange.widgets.utils.itemmodels import select_rows
 
 from orangecontrib.fairness.widgets.owasfairness import OWAsFairness
-from orangecontrib.fairness.widgets.tests.utils import fairness_attributes
+from orangecontrib.fairness.widgets.tests.utils import (
+    adult_like_data,
+    fairness_attributes,
+)
+from orangecontrib.fairness.widgets.utils import (
+    annotate_files,
+    as_fairness_data,
+    contains_fairness_attributes,
+    table_with_domain,
+)
 
 
 class TestOWAsFairness(WidgetTest):
@@ -151,6 +168,175 @@ class TestOWAsFairness(WidgetTest):
                 contains_pa_values = True
         self.assertTrue(contains_pa_values)
 
+    def test_output_shares_arrays(self):
+        """Check that the output data shares the arrays with the input data"""
+        test_data = adult_like_data(100)
+        self.send_signal(self.widget.Inputs.data, test_data)
+        select_rows(self.widget.controls.privileged_pa_values, [0])
+
+        output_data = self.get_output(self.widget.Outputs.data)
+        self.assertIsNot(output_data.domain, test_data.domain)
+        self.assertEqual(
+            output_data.domain["sex"].attributes["privileged_pa_values"], ["Female"]
+        )
+        # The data has no metas and weights, which are empty arrays
+        for part in ("X", "Y", "ids"):
+            self.assertTrue(
+                np.shares_memory(getattr(output_data, part), getattr(test_data, part))
+            )
+        np.testing.assert_equal(output_data.X, test_data.X)
+        self.assertEqual(output_data.attributes, test_data.attributes)
+        self.assertIsNot(output_data.attributes, test_data.attributes)
+
+    def test_table_with_domain(self):
+        """Check that the table with the new domain is checked and shares sparse arrays"""
+        test_data = adult_like_data(100).to_sparse()
+        domain = test_data.domain
+        table = table_with_domain(
+            test_data, Domain([var.copy() for var in domain.attributes], domain.class_var)
+        )
+        self.assertTrue(np.shares_memory(table.X.data, test_data.X.data))
+        self.assertEqual((table.X != test_data.X).nnz, 0)
+
+        with self.assertRaises(ValueError):
+            table_with_domain(test_data, Domain(domain.attributes[1:], domain.class_var))
+
+
+    def test_table_with_domain_read_only(self):
+        """Check that the data can not be changed through the table with the new domain"""
+        for test_data in (adult_like_data(100), adult_like_data(100).to_sparse()):
+            domain = test_data.domain
+            table = table_with_domain(
+                test_data,
+                Domain([var.copy() for var in domain.attributes], domain.class_var),
+            )
+            x = test_data.X.copy()
+            with self.assertRaises(ValueError):
+                if sp.issparse(table.X):
+                    table.X.data[0] = 12345
+                else:
+                    table.X[0, 0] = 12345
+            with self.assertRaises(ValueError):
+                table.Y[0] = 1 - table.Y[0]
+            with self.assertRaises(ValueError):
+                with table.unlocked(table.X):
+                    pass
+            self.assertEqual((test_data.X != x).sum(), 0)
+
+            # The data itself stays writeable and a copy of the table can be modified
+            with test_data.unlocked(test_data.X):
+                if sp.issparse(test_data.X):
+                    test_data.X.data[0] = test_data.X.data[0]
+                else:
+                    test_data.X[0, 0] = test_data.X[0, 0]
+            copy = table.copy()
+            with copy.unlocked(copy.Y):
+                copy.Y[0] = 1 - copy.Y[0]
+            self.assertNotEqual(copy.Y[0], test_data.Y[0])
+
+        data = as_fairness_data(adult_like_data(100), "<=50K", "race", ["White"])
+        with self.assertRaises(ValueError):
+            data.X[0, 0] = 12345
+
+
+class TestAsFairnessData(unittest.TestCase):
+    """
+    Test class for the as_fairness_data and annotate_files functions.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(100)
+
+    def test_as_fairness_data(self):
+        """Check that the fairness attributes are added without changing the data"""
+        data = as_fairness_data(self.data, "<=50K", "race", ["White", "Other"])
+        self.assertTrue(contains_fairness_attributes(data.domain))
+        self.assertEqual(data.domain.class_var.attributes["favorable_class_value"], "<=50K")
+        self.assertEqual(
+            data.domain["race"].attributes["privileged_pa_values"], ["White", "Other"]
+        )
+        self.assertNotIn("privileged_pa_values", data.domain["sex"].attributes)
+        # The variables of the original data are not changed
+        self.assertEqual(self.data.domain["sex"].attributes["privileged_pa_values"], ["Male"])
+        self.assertNotIn("privileged_pa_values", self.data.domain["race"].attributes)
+        self.assertTrue(np.shares_memory(data.X, self.data.X))
+
+    def test_domain_reused(self):
+        """Check that the annotated domain is reused for tables with equal domains"""
+        domain = as_fairness_data(self.data, "<=50K", "sex", ["Female"]).domain
+        other = adult_like_data(50, seed=1)
+        self.assertIsNot(other.domain, self.data.domain)
+        self.assertIs(as_fairness_data(other, "<=50K", "sex", ["Female"]).domain, domain)
+        self.assertIsNot(as_fairness_data(other, ">50K", "sex", ["Female"]).domain, domain)
+
+        # An equal domain with different values of the protected attribute
+        sex = DiscreteVariable("sex", values=("Male", "Female", "Other"))
+        attributes = [
+            sex if var.name == "sex" else var for var in other.domain.attributes
+        ]
+        other = other.transform(Domain(attributes, other.domain.class_var))
+        self.assertEqual(other.domain, self.data.domain)
+        annotated = as_fairness_data(other, "<=50K", "sex", ["Female"])
+        self.assertIsNot(annotated.domain, domain)
+        self.assertEqual(annotated.domain["sex"].values, ("Male", "Female", "Other"))
+
+    def test_domain_attributes_kept(self):
+        """Check that an equal domain with other attributes of variables is annotated anew"""
+        domain = as_fairness_data(self.data, "<=50K", "sex", ["Female"]).domain
+        other = adult_like_data(50, seed=1)
+        other.domain["age"].attributes["unit"] = "years"
+        self.assertEqual(other.domain, self.data.domain)
+        annotated = as_fairness_data(other, "<=50K", "sex", ["Female"]).domain
+        self.assertIsNot(annotated, domain)
+        self.assertEqual(annotated["age"].attributes, {"unit": "years"})
+        self.assertNotIn("unit", domain["age"].attributes)
+
+    def test_domains_not_kept(self):
+        """Check that the cache does not keep the annotated domains alive"""
+        domain = as_fairness_data(self.data, "<=50K", "sex", ["Female"]).domain
+        ref = weakref.ref(domain)
+        del domain
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_invalid_attributes(self):
+        """Check that invalid fairness attributes raise errors"""
+        for args in (
+            ("unknown", "sex", ["Male"]),
+            ("<=50K", "unknown", ["Male"]),
+            ("<=50K", "age", ["Male"]),
+            ("<=50K", "sex", ["unknown"]),
+            ("<=50K", "sex", []),
+        ):
+            with self.assertRaises(ValueError):
+                as_fairness_data(self.data, *args)
+
+    def test_annotate_files(self):
+        """Check that the files in a directory are annotated"""
+        with tempfile.TemporaryDirectory() as input_dir, \
+                tempfile.TemporaryDirectory() as output_dir:
+            self.data.save(os.path.join(input_dir, "a.tab"))
+            self.data[:10].save(os.path.join(input_dir, "b.pkl"))
+            with open(os.path.join(input_dir, "c.txt"), "w") as file:
+                file.write("Not a data file")
+
+            paths = annotate_files(
+                input_dir, output_dir, "<=50K", "race", ["White"], n_jobs=2
+            )
+            self.assertEqual(
+                paths,
+                [os.path.join(output_dir, name) for name in ("a.tab", "b.pkl")],
+            )
+            for path, length in zip(paths, (100, 10)):
+                data = Table(path)
+                self.assertEqual(len(data), length)
+                self.assertEqual(
+                    data.domain["race"].attributes["privileged_pa_values"], ["White"]
+                )
+                self.assertEqual(
+                    data.domain.class_var.attributes["favorable_class_value"], "<=50K"
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,10 +4,14 @@ This file contains the tests for the OWDatasetBias widget.
 
 import unittest
 
+import numpy as np
+
 from Orange.data.table import Table
 from Orange.widgets.tests.base import WidgetTest
 
 from orangecontrib.fairness.widgets.owdatasetbias import OWDatasetBias
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+from orangecontrib.fairness.widgets.utils import table_to_standard_dataset
 
 
 class TestOWDatasetBias(WidgetTest):
@@ -55,6 +59,49 @@ class TestOWDatasetBias(WidgetTest):
             )
         )
 
+    def test_bias_values(self):
+        """Check that the displayed bias matches the bias computed by aif360"""
+        from aif360.metrics import BinaryLabelDatasetMetric
+
+        data = adult_like_data(500)
+        dataset, privileged, unprivileged = table_to_standard_dataset(data)
+        metric = BinaryLabelDatasetMetric(dataset, unprivileged, privileged)
+
+        self.send_signal(self.widget.Inputs.data, data)
+        self.assertEqual(
+            self.widget.disparate_impact_label.text(),
+            f"Disparate Impact (ideal = 1): {metric.disparate_impact():.3f}",
+        )
+        self.assertEqual(
+            self.widget.statistical_parity_difference_label.text(),
+            "Statistical Parity Difference (ideal = 0): "
+            f"{metric.statistical_parity_difference():.3f}",
+        )
+
+    def test_instance_weights(self):
+        """Check that the bias of weighted data is the bias of the repeated rows"""
+        data = adult_like_data(500).copy()
+        weights = np.random.default_rng(0).integers(0, 4, len(data))
+        with data.unlocked_reference():
+            data.W = weights.astype(float)
+        self.send_signal(self.widget.Inputs.data, data)
+        weighted = (
+            self.widget.disparate_impact_label.text(),
+            self.widget.statistical_parity_difference_label.text(),
+        )
+
+        repeated = data[np.repeat(np.arange(len(data)), weights)]
+        with repeated.unlocked_reference():
+            repeated.W = np.empty((len(repeated), 0))
+        self.send_signal(self.widget.Inputs.data, repeated)
+        self.assertEqual(
+            weighted,
+            (
+                self.widget.disparate_impact_label.text(),
+                self.widget.statistical_parity_difference_label.text(),
+            ),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,8 @@
 """This file contains the tests for the OWEqualizedOdds widget."""
 
+import threading
 import unittest
+from unittest.mock import patch
 
 from Orange.widgets.tests.base import WidgetTest
 from Orange.classification.logistic_regression import LogisticRegressionLearner
@@ -11,8 +13,11 @@ from Orange.base import Model
 from Orange.data import Table
 
 from orangecontrib.fairness.evaluation import scoring as bias_scoring
+from orangecontrib.fairness.widgets import owequalizedodds
 from orangecontrib.fairness.widgets.owequalizedodds import OWEqualizedOdds
 from orangecontrib.fairness.modeling.postprocessing import PostprocessingLearner
+from orangecontrib.fairness.widgets.utils import fitted_models, model_cache_key
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
 
 
 class TestOWEqualizedOdds(WidgetTest):
@@ -25,6 +30,7 @@ class TestOWEqualizedOdds(WidgetTest):
         self.incorrect_input_data_path = (
             "https://datasets.biolab.si/core/breast-cancer.tab"
         )
+        fitted_models.clear()
         self.widget = self.create_widget(OWEqualizedOdds)
         self.predictions = self.create_widget(OWPredictions)
         self.test_and_score = self.create_widget(OWTestAndScore)
@@ -158,6 +164,47 @@ class TestOWEqualizedOdds(WidgetTest):
         # Check that the absolute value of aod is smaller than the normal aod
         # self.assertLessEqual(np.abs(aod), np.abs(normal_aod))
 
+    def test_cached_model(self):
+        """Check that the model is not fitted again on the same data and learner"""
+        data = adult_like_data(300)
+        self.widget.repeatable = True
+        self.send_signal(self.widget.Inputs.input_learner, LogisticRegressionLearner())
+        self.send_signal(self.widget.Inputs.data, data)
+        self.wait_until_finished(self.widget)
+        model = self.get_output(self.widget.Outputs.model)
+        self.assertIsNotNone(model)
+
+        threads = []
+
+        def cache_key(learner, data):
+            threads.append(threading.current_thread())
+            return model_cache_key(learner, data)
+
+        with patch.object(owequalizedodds, "model_cache_key", cache_key), patch.object(
+            PostprocessingLearner,
+            "fit",
+            autospec=True,
+            side_effect=PostprocessingLearner.fit,
+        ) as fit:
+            self.send_signal(self.widget.Inputs.data, None)
+            self.send_signal(self.widget.Inputs.data, data.copy())
+            self.wait_until_finished(self.widget)
+            fit.assert_not_called()
+            self.assertIs(self.get_output(self.widget.Outputs.model), model)
+            # Hashing the data does not block the widget
+            self.assertTrue(threads)
+            self.assertNotIn(threading.main_thread(), threads)
+
+            # Without a seed, applying again fits a new model
+            self.widget.repeatable = False
+            self.widget.apply()
+            self.wait_until_finished(self.widget)
+            self.widget.apply()
+            self.wait_until_finished(self.widget)
+            self.assertEqual(fit.call_count, 2)
+            self.assertIsNot(self.get_output(self.widget.Outputs.model), model)
+            self.assertEqual(len(threads), 1)
+
     def test_repeatable_parameter(self):
         """Check that the repeatable parameter works"""
         self.widget.repeatable = True
@@ -0,0 +1,172 @@
+"""
+This file contains the tests for the OWFairnessCurves widget and the FairnessCurves class.
+"""
+
+import unittest
+
+import numpy as np
+
+from Orange.classification import LogisticRegressionLearner
+from Orange.evaluation import CrossValidation, Results, TestOnTrainingData
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.evaluation import scoring as bias_scoring
+from orangecontrib.fairness.evaluation.curves import FairnessCurves
+from orangecontrib.fairness.widgets.owfairnesscurves import OWFairnessCurves, Metrics
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+
+
+class TestOWFairnessCurves(WidgetTest):
+    """
+    Test class for the OWFairnessCurves widget.
+    """
+
+    def setUp(self) -> None:
+        self.widget = self.create_widget(OWFairnessCurves)
+        self.data = adult_like_data(500)
+        self.results = CrossValidation(k=3, store_data=True)(
+            self.data, [LogisticRegressionLearner()]
+        )
+
+    def test_no_data(self):
+        """Check that the widget doesn't crash on empty data"""
+        self.send_signal(self.widget.Inputs.evaluation_results, None)
+        self.assertIsNone(self.widget.curves)
+
+    def test_incorrect_input_data(self):
+        """
+        Check that the widget displays an error message when
+        the data does not have the fairness attributes
+        """
+        data = adult_like_data(500)
+        data.domain.class_var.attributes.pop("favorable_class_value")
+        results = CrossValidation(k=3, store_data=True)(
+            data, [LogisticRegressionLearner()]
+        )
+        self.send_signal(self.widget.Inputs.evaluation_results, results)
+        self.assertTrue(self.widget.Error.missing_fairness_data.is_shown())
+        self.assertIsNone(self.widget.curves)
+
+    def test_results_without_data(self):
+        """Check that the widget displays an error when the results do not store the data"""
+        results = CrossValidation(k=3)(self.data, [LogisticRegressionLearner()])
+        self.send_signal(self.widget.Inputs.evaluation_results, results)
+        self.assertTrue(self.widget.Error.missing_data.is_shown())
+
+    def test_plot(self):
+        """Check that the curves are plotted for every metric"""
+        self.send_signal(self.widget.Inputs.evaluation_results, self.results)
+        self.assertIsNotNone(self.widget.curves)
+        for i in range(len(Metrics)):
+            self.widget.metric_index = i
+            self.widget._replot()
+            self.assertEqual(self.widget.plot.getAxis("left").labelText, Metrics[i].name)
+        self.send_signal(self.widget.Inputs.evaluation_results, None)
+        self.assertIsNone(self.widget.curves)
+
+
+class TestFairnessCurves(unittest.TestCase):
+    """
+    Test class for the FairnessCurves class.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(1000)
+        self.results = TestOnTrainingData(store_data=True)(
+            self.data, [LogisticRegressionLearner()]
+        )
+
+    def _thresholded_results(self, threshold):
+        """Create results with the predictions of the model at the given threshold"""
+        results = Results(
+            self.data,
+            nmethods=1,
+            row_indices=self.results.row_indices,
+            actual=self.results.actual,
+            predicted=(self.results.probabilities[:, :, 1] >= threshold).astype(float),
+            probabilities=self.results.probabilities,
+            store_data=True,
+        )
+        return results
+
+    def test_matches_scorers(self):
+        """Check that the curves match the scorers at individual thresholds"""
+        curves = FairnessCurves.from_results(self.results)
+        for i in (len(self.data) // 4, len(self.data) // 2, 3 * len(self.data) // 4):
+            threshold = curves.thresholds[i]
+            results = self._thresholded_results(threshold)
+            for scorer, curve in (
+                (bias_scoring.StatisticalParityDifference, curves.spd()),
+                (bias_scoring.EqualOpportunityDifference, curves.eod()),
+                (bias_scoring.AverageOddsDifference, curves.aod()),
+                (bias_scoring.DisparateImpact, curves.di()),
+            ):
+                # With ties the first position of the threshold in the sorted
+                # scores gives the classifier which uses this threshold
+                first = np.searchsorted(curves.thresholds, threshold, side="left")
+                self.assertAlmostEqual(scorer(results)[0], curve[first])
+
+    def test_boundaries(self):
+        """Check the curves at the lowest and the highest threshold"""
+        curves = FairnessCurves.from_results(self.results)
+        self.assertEqual(len(curves.thresholds), len(self.data) + 1)
+        np.testing.assert_almost_equal(curves.spd()[0], 0)
+        np.testing.assert_almost_equal(curves.di()[0], 1)
+        np.testing.assert_almost_equal(curves.eod()[0], 0)
+        np.testing.assert_almost_equal(curves.aod()[0], 0)
+        ca = np.mean(self.results.actual == 1)
+        np.testing.assert_almost_equal(curves.ca()[0], ca)
+
+    def test_repeated_rows(self):
+        """Check that rows used multiple times are counted multiple times"""
+        ytrue = np.array([1, 0, 1, 0], dtype=bool)
+        probs = np.array([0.9, 0.8, 0.3, 0.1])
+        privileged = np.array([True, True, False, False])
+        curves = FairnessCurves(ytrue, probs, privileged)
+        np.testing.assert_equal(curves.thresholds, [0.1, 0.3, 0.8, 0.9, 1])
+        np.testing.assert_almost_equal(curves.spd(), [0, -0.5, -1, -0.5, 0])
+
+        curves = FairnessCurves(
+            np.repeat(ytrue, 2), np.repeat(probs, 2), np.repeat(privileged, 2)
+        )
+        np.testing.assert_almost_equal(
+            curves.spd()[::2], [0, -0.5, -1, -0.5, 0]
+        )
+
+    def test_instance_weights(self):
+        """Check that the curves of weighted data are the curves of the repeated rows"""
+        data = self.data.copy()
+        weights = np.random.default_rng(2).integers(0, 4, len(data))
+        with data.unlocked_reference():
+            data.W = weights.astype(float)
+        results = TestOnTrainingData(store_data=True)(data, [LogisticRegressionLearner()])
+
+        repeat = np.repeat(
+            np.arange(len(results.row_indices)), weights[results.row_indices]
+        )
+        repeated = Results(
+            self.data,
+            nmethods=1,
+            row_indices=results.row_indices[repeat],
+            actual=results.actual[repeat],
+            predicted=results.predicted[:, repeat],
+            probabilities=results.probabilities[:, repeat],
+            store_data=True,
+        )
+        curves = FairnessCurves.from_results(results)
+        repeated_curves = FairnessCurves.from_results(repeated)
+        # The classifiers with the same threshold are at its first positions
+        thresholds = np.unique(curves.thresholds)
+        first = np.searchsorted(curves.thresholds, thresholds, side="left")
+        repeated_first = np.searchsorted(
+            repeated_curves.thresholds, thresholds, side="left"
+        )
+        for name in ("ca", "spd", "eod", "aod", "di"):
+            np.testing.assert_almost_equal(
+                getattr(curves, name)()[first],
+                getattr(repeated_curves, name)()[repeated_first],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
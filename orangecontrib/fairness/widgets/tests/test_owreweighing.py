@@ -2,18 +2,37 @@
 This file contains the tests for the OWReweighing widget.
 """
 
+import pickle
 import unittest
+from unittest.mock import patch
+
 import numpy as np
 
 from Orange.widgets.tests.base import WidgetTest
 from Orange.preprocess.preprocess import PreprocessorList
-from Orange.data import Table
+from Orange.data import Table, Domain, ContinuousVariable, StringVariable
+
+from aif360.algorithms.preprocessing import Reweighing
 
-from orangecontrib.fairness.widgets.owreweighing import OWReweighing
+from orangecontrib.fairness.widgets.owreweighing import (
+    MzCom,
+    OWReweighing,
+    ReweighingTransform,
+)
 from orangecontrib.fairness.widgets.owweightedlogisticregression import (
     OWWeightedLogisticRegression,
+    WeightedLogisticRegressionLearner,
 )
 from orangecontrib.fairness.widgets.owcombinepreprocessors import OWCombinePreprocessors
+from orangecontrib.fairness.widgets.tests.utils import (
+    adult_like_data,
+    assert_not_densified,
+)
+from orangecontrib.fairness.widgets.utils import (
+    FairnessView,
+    get_weights_column,
+    table_to_standard_dataset,
+)
 
 
 class TestOWReweighing(WidgetTest):
@@ -57,6 +76,18 @@ class TestOWReweighing(WidgetTest):
         self.assertIsNotNone(output_data)
         self.assertIn("weights", output_data.domain)
 
+    def test_sparse_data(self):
+        """Check that the weights of sparse data are computed without densifying it"""
+        data = adult_like_data(300)
+        self.send_signal(self.widget.Inputs.data, data)
+        expected = self.get_output(self.widget.Outputs.data).get_column("weights")
+
+        with assert_not_densified(self):
+            self.send_signal(self.widget.Inputs.data, data.to_sparse())
+            output_data = self.get_output(self.widget.Outputs.data)
+        self.assertTrue(output_data.is_sparse())
+        np.testing.assert_equal(output_data.get_column("weights"), expected)
+
     def test_preprocessor_output(self):
         """Check that the widget returns a working preprocessor"""
         test_data = Table(self.data_path_adult)
@@ -126,5 +157,95 @@ class TestOWReweighing(WidgetTest):
         )
 
 
+class TestReweighingTransform(unittest.TestCase):
+    """
+    Test class for the ReweighingTransform preprocessor.
+    """
+
+    def test_dtype(self):
+        """Check that the weights computed in float32 and float64 are the same"""
+        data = adult_like_data(300)
+        weights64 = ReweighingTransform()(data).get_column("weights")
+        weights32 = ReweighingTransform(np.float32)(data).get_column("weights")
+        np.testing.assert_allclose(weights32, weights64, rtol=1e-6)
+
+        view = FairnessView.from_table(data)
+        self.assertEqual(view.reweighed(view.reweighing_factors()).dtype, np.float64)
+        view = FairnessView.from_table(data, np.float32)
+        self.assertEqual(view.reweighed(view.reweighing_factors()).dtype, np.float32)
+
+    def test_unpickle_aif360_model(self):
+        """Check that the MzCom pickled with a fitted aif360 Reweighing still works"""
+        data = adult_like_data(300)
+        dataset, privileged, unprivileged = table_to_standard_dataset(data)
+        reweighing = Reweighing(unprivileged, privileged).fit(dataset)
+        # The MzCom of the earlier versions only had the model and the domain
+        old = MzCom.__new__(MzCom)
+        old.__dict__.update(model=reweighing, original_domain=data.domain)
+
+        mzcom = pickle.loads(pickle.dumps(old))
+        self.assertIsInstance(mzcom.model, np.ndarray)
+        self.assertEqual(mzcom.dtype, np.float64)
+        np.testing.assert_allclose(
+            mzcom(data), reweighing.transform(dataset).instance_weights
+        )
+        np.testing.assert_allclose(
+            mzcom(data), ReweighingTransform()(data).get_column("weights")
+        )
+
+
+class TestWeightedLogisticRegressionLearner(unittest.TestCase):
+    """
+    Test class for the weights used by the WeightedLogisticRegressionLearner.
+    """
+
+    def setUp(self):
+        data = adult_like_data(200)
+        metas = (StringVariable("name"), ContinuousVariable("weights"))
+        self.data = data.transform(
+            Domain(data.domain.attributes, data.domain.class_vars, metas)
+        ).copy()
+        self.weights = np.random.default_rng(0).random(len(self.data))
+        with self.data.unlocked(self.data.metas):
+            self.data.metas[:, 0] = "a"
+            self.data.metas[:, 1] = self.weights
+
+    def test_weights_column(self):
+        """Check that the weights are read from the metas without slicing the table"""
+        with patch.object(Table, "__getitem__") as getitem:
+            weights = get_weights_column(self.data)
+            getitem.assert_not_called()
+        self.assertEqual(weights.dtype, np.float64)
+        np.testing.assert_equal(weights, self.weights)
+        self.assertIsNone(get_weights_column(adult_like_data(10)))
+
+        domain = self.data.domain
+        data = self.data.transform(
+            Domain(domain.attributes, domain.class_vars, domain.metas[1:])
+        )
+        weights = get_weights_column(data)
+        self.assertTrue(np.shares_memory(weights, data.metas))
+
+    def test_sample_weight(self):
+        """Check that the weights are passed to scikit-learn as the sample_weight"""
+        from sklearn.linear_model import LogisticRegression
+
+        learner = WeightedLogisticRegressionLearner()
+        with patch.object(
+            LogisticRegression, "fit", autospec=True, side_effect=LogisticRegression.fit
+        ) as fit:
+            learner(self.data)
+            np.testing.assert_equal(fit.call_args.kwargs["sample_weight"], self.weights)
+
+            # Without the "weights" meta attribute the weights of the table are used
+            data = adult_like_data(200)
+            with data.unlocked_reference():
+                data.W = self.weights[::-1].copy()
+            learner(data)
+            np.testing.assert_equal(
+                fit.call_args.kwargs["sample_weight"], self.weights[::-1]
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,106 @@
+"""This file contains the tests for the OWWeightedLearner widget and the WeightedLearner."""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from Orange.base import Model
+from Orange.classification import KNNLearner, RandomForestLearner
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.modeling.weighted import (
+    WeightedLearner,
+    WeightedModel,
+    weighted_sample_indices,
+    weighted_table,
+)
+from orangecontrib.fairness.widgets.owreweighing import ReweighingTransform
+from orangecontrib.fairness.widgets.owweightedlearner import OWWeightedLearner
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+from orangecontrib.fairness.widgets.utils import get_weights_column
+
+
+class TestWeightedLearner(unittest.TestCase):
+    """
+    Test class for the WeightedLearner.
+    """
+
+    def setUp(self):
+        self.data = ReweighingTransform()(adult_like_data(500))
+        self.weights = get_weights_column(self.data)
+
+    def test_weighted_table(self):
+        """Check that the weighted table shares the arrays with the data"""
+        table = weighted_table(self.data, self.weights)
+        self.assertTrue(np.shares_memory(table.X, self.data.X))
+        self.assertTrue(np.shares_memory(table.Y, self.data.Y))
+        np.testing.assert_equal(table.W, self.weights)
+
+    def test_sample_weight(self):
+        """Check that learners which support weights get them as the sample_weight"""
+        learner = RandomForestLearner(n_estimators=3, random_state=0)
+        with patch.object(
+            RandomForestLearner, "fit", autospec=True, side_effect=RandomForestLearner.fit
+        ) as fit:
+            model = WeightedLearner(learner)(self.data)
+            np.testing.assert_equal(fit.call_args.args[3], self.weights)
+        self.assertIsInstance(model, WeightedModel)
+        self.assertFalse(model.resampled)
+        values, probs = model(self.data, ret=Model.ValueProbs)
+        self.assertEqual(values.shape, (len(self.data),))
+        self.assertEqual(probs.shape, (len(self.data), 2))
+
+        model = WeightedLearner(learner, resample=True)(self.data)
+        self.assertTrue(model.resampled)
+
+    def test_resampling(self):
+        """Check that learners without weights are fitted on a weighted sample"""
+        model = WeightedLearner(KNNLearner(), repeatable=True)(self.data)
+        self.assertTrue(model.resampled)
+        np.testing.assert_equal(
+            model(self.data),
+            WeightedLearner(KNNLearner(), repeatable=True)(self.data)(self.data),
+        )
+
+        # Data without weights is not resampled
+        model = WeightedLearner(KNNLearner())(adult_like_data(100))
+        self.assertFalse(model.resampled)
+
+    def test_weighted_sample_indices(self):
+        """Check that the instances are drawn proportionally to their weights"""
+        weights = np.array([0, 1, 3, np.nan])
+        indices = weighted_sample_indices(weights, size=40_000, seed=0)
+        counts = np.bincount(indices, minlength=4) / len(indices)
+        np.testing.assert_allclose(counts, [0, 0.25, 0.75, 0], atol=0.01)
+        with self.assertRaises(ValueError):
+            weighted_sample_indices(np.zeros(3))
+
+
+class TestOWWeightedLearner(WidgetTest):
+    """
+    Test class for the OWWeightedLearner widget.
+    """
+
+    def setUp(self):
+        self.widget = self.create_widget(OWWeightedLearner)
+        self.data = ReweighingTransform()(adult_like_data(300))
+
+    def test_no_learner(self):
+        """Check that the widget has no output without an input learner"""
+        self.send_signal(self.widget.Inputs.data, self.data)
+        self.assertIsNone(self.get_output(self.widget.Outputs.model))
+
+    def test_model_output(self):
+        """Check that the widget outputs the weighted learner and model"""
+        self.send_signal(self.widget.Inputs.input_learner, KNNLearner())
+        self.send_signal(self.widget.Inputs.data, self.data)
+        learner = self.get_output(self.widget.Outputs.learner)
+        self.assertIsInstance(learner, WeightedLearner)
+        model = self.get_output(self.widget.Outputs.model)
+        self.assertIsInstance(model, WeightedModel)
+        self.assertTrue(model.resampled)
+
+
+if __name__ == "__main__":
+    unittest.main()
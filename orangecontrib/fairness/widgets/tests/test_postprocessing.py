@@ -0,0 +1,351 @@
+"""This file contains the tests for the postprocessing of the predicted probabilities."""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from Orange.classification.logistic_regression import LogisticRegressionLearner
+from Orange.evaluation import TestOnTestData, CA
+from Orange.base import Model
+
+from aif360.algorithms.postprocessing import (
+    CalibratedEqOddsPostprocessing,
+    RejectOptionClassification,
+)
+
+from orangecontrib.fairness.evaluation import scoring as bias_scoring
+from orangecontrib.fairness.modeling.postprocessing import (
+    ThresholdOptimizerLearner,
+    CalibratedEqOddsLearner,
+    RejectOptionLearner,
+    fit_group_thresholds,
+)
+from orangecontrib.fairness.widgets.utils import table_to_standard_dataset
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+
+
+class TestThresholdOptimizer(unittest.TestCase):
+    """
+    Test class for the ThresholdOptimizerLearner and ThresholdOptimizerModel.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(4000)
+
+    def test_fit_group_thresholds(self):
+        """Check that the thresholds equalize the rates of the groups"""
+        rng = np.random.default_rng(0)
+        privileged = rng.random(2000) < 0.6
+        probs = np.clip(rng.random(2000) + 0.2 * privileged, 0, 1)
+        ytrue = rng.random(2000) < probs
+
+        for constraint in (
+            ThresholdOptimizerLearner.DemographicParity,
+            ThresholdOptimizerLearner.EqualOpportunity,
+        ):
+            threshold_u, threshold_p = fit_group_thresholds(
+                ytrue, probs, privileged, constraint
+            )
+            favorable = probs >= np.where(privileged, threshold_p, threshold_u)
+            if constraint == ThresholdOptimizerLearner.DemographicParity:
+                rate_u = favorable[~privileged].mean()
+                rate_p = favorable[privileged].mean()
+            else:
+                rate_u = favorable[~privileged & ytrue].mean()
+                rate_p = favorable[privileged & ytrue].mean()
+            self.assertAlmostEqual(rate_u, rate_p, delta=0.01)
+            # Using any thresholds is better than the trivial classifiers
+            self.assertGreater(np.mean(favorable == ytrue), 0.5)
+
+    def test_tied_scores(self):
+        """Check that the thresholds equalize the rates when many scores are tied"""
+        levels = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+        # The groups have the same proportions of each score and class, so the rates
+        # can be equalized exactly, but only with thresholds between the scores
+        counts = (120, 280)
+        probs = np.hstack([np.repeat(levels, count) for count in counts])
+        # The proportion of the favorable class of the instances with each score
+        ytrue = np.hstack(
+            [
+                np.tile(np.arange(count), 5) < np.repeat(levels * count, count)
+                for count in counts
+            ]
+        )
+        privileged = np.arange(len(probs)) >= 5 * counts[0]
+        order = np.random.default_rng(0).permutation(len(probs))
+        probs, privileged, ytrue = probs[order], privileged[order], ytrue[order]
+
+        for constraint in (
+            ThresholdOptimizerLearner.DemographicParity,
+            ThresholdOptimizerLearner.EqualOpportunity,
+        ):
+            threshold_u, threshold_p = fit_group_thresholds(
+                ytrue, probs, privileged, constraint
+            )
+            self.assertFalse(np.isin([threshold_u, threshold_p], levels).any())
+            favorable = probs >= np.where(privileged, threshold_p, threshold_u)
+            if constraint == ThresholdOptimizerLearner.DemographicParity:
+                mask_u, mask_p = ~privileged, privileged
+            else:
+                mask_u, mask_p = ~privileged & ytrue, privileged & ytrue
+            self.assertAlmostEqual(favorable[mask_u].mean(), favorable[mask_p].mean())
+            self.assertGreater(np.mean(favorable == ytrue), 0.6)
+
+    def test_weighted_thresholds(self):
+        """Check that the thresholds equalize the weighted rates of the groups"""
+        rng = np.random.default_rng(0)
+        privileged = rng.random(2000) < 0.6
+        probs = np.clip(rng.random(2000) + 0.2 * privileged, 0, 1)
+        ytrue = rng.random(2000) < probs
+        # Heavier weights of the highly scored unprivileged instances
+        weights = np.where(~privileged & (probs > 0.5), 3.0, 1.0)
+
+        for constraint in (
+            ThresholdOptimizerLearner.DemographicParity,
+            ThresholdOptimizerLearner.EqualOpportunity,
+        ):
+            thresholds = fit_group_thresholds(
+                ytrue, probs, privileged, constraint, weights
+            )
+            favorable = probs >= np.where(privileged, thresholds[1], thresholds[0])
+            if constraint == ThresholdOptimizerLearner.DemographicParity:
+                mask_u, mask_p = ~privileged, privileged
+            else:
+                mask_u, mask_p = ~privileged & ytrue, privileged & ytrue
+            self.assertAlmostEqual(
+                np.average(favorable[mask_u], weights=weights[mask_u]),
+                np.average(favorable[mask_p], weights=weights[mask_p]),
+                delta=0.01,
+            )
+            self.assertNotEqual(
+                thresholds, fit_group_thresholds(ytrue, probs, privileged, constraint)
+            )
+            np.testing.assert_equal(
+                fit_group_thresholds(
+                    ytrue, probs, privileged, constraint, np.ones(2000)
+                ),
+                fit_group_thresholds(ytrue, probs, privileged, constraint),
+            )
+
+    def test_unknown_constraint(self):
+        """Check that an unknown constraint raises an error"""
+        with self.assertRaises(ValueError):
+            fit_group_thresholds(
+                np.array([True]), np.array([0.5]), np.array([True]), "unknown"
+            )
+
+    def test_reduces_bias(self):
+        """Check that the model is less biased than the model without postprocessing"""
+        train, test = self.data[:3000], self.data[3000:]
+        learner = LogisticRegressionLearner()
+        for constraint, scorer in (
+            (
+                ThresholdOptimizerLearner.DemographicParity,
+                bias_scoring.StatisticalParityDifference,
+            ),
+            (
+                ThresholdOptimizerLearner.EqualOpportunity,
+                bias_scoring.EqualOpportunityDifference,
+            ),
+        ):
+            optimizer = ThresholdOptimizerLearner(learner, constraint=constraint)
+            normal = TestOnTestData(store_data=True)(train, test, [learner])
+            optimized = TestOnTestData(store_data=True)(train, test, [optimizer])
+            self.assertLess(abs(scorer(optimized)[0]), abs(scorer(normal)[0]))
+            self.assertGreater(CA(optimized)[0], 0.6)
+
+    def test_model(self):
+        """Check the predictions of the model"""
+        learner = ThresholdOptimizerLearner(LogisticRegressionLearner())
+        model = learner(self.data)
+        values, probs = model(self.data, ret=Model.ValueProbs)
+        self.assertEqual(len(values), len(self.data))
+        self.assertEqual(probs.shape, (len(self.data), 2))
+        self.assertTrue(set(np.unique(values)) <= {0, 1})
+
+        # The model is deterministic
+        np.testing.assert_equal(learner(self.data).thresholds, model.thresholds)
+
+    def test_incompatible_data(self):
+        """Check that the learner reports data without the fairness attributes"""
+        data = adult_like_data(100)
+        data.domain.class_var.attributes.pop("favorable_class_value")
+        learner = ThresholdOptimizerLearner(LogisticRegressionLearner())
+        self.assertIsNotNone(learner.incompatibility_reason(data.domain))
+
+
+class TestScorePostprocessing(unittest.TestCase):
+    """
+    Test class for the CalibratedEqOddsLearner and RejectOptionLearner,
+    which are compared with their aif360 implementations.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(2000)
+        self.dataset, self.privileged_groups, self.unprivileged_groups = (
+            table_to_standard_dataset(self.data)
+        )
+        rng = np.random.default_rng(0)
+        self.ytrue = (
+            self.dataset.labels.ravel() == self.dataset.favorable_label
+        )
+        self.privileged = self.dataset.protected_attributes[:, 0] == 1
+        self.probs = np.clip(
+            0.6 * rng.random(len(self.data)) + 0.2 * self.privileged + 0.2 * self.ytrue,
+            0,
+            1,
+        )
+        self.dataset_pred = self.dataset.copy(deepcopy=True)
+        self.dataset_pred.scores = self.probs.reshape(-1, 1)
+
+    def test_calibrated_eq_odds(self):
+        """Check that the parameters match the aif360 implementation"""
+        for cost_constraint in ("fpr", "fnr", "weighted"):
+            postprocessor = CalibratedEqOddsPostprocessing(
+                self.unprivileged_groups,
+                self.privileged_groups,
+                cost_constraint=cost_constraint,
+            ).fit(self.dataset, self.dataset_pred)
+            learner = CalibratedEqOddsLearner(
+                LogisticRegressionLearner(), cost_constraint=cost_constraint
+            )
+            model = learner.fit_postprocessor(
+                None, self.ytrue, self.probs, self.privileged
+            )
+            np.testing.assert_almost_equal(
+                model.base_rates,
+                (postprocessor.base_rate_unpriv, postprocessor.base_rate_priv),
+            )
+            np.testing.assert_almost_equal(
+                model.mix_rates,
+                (postprocessor.unpriv_mix_rate, postprocessor.priv_mix_rate),
+            )
+
+    def test_weighted_calibrated_eq_odds(self):
+        """Check that the weighted parameters match the aif360 implementation"""
+        weights = np.random.default_rng(1).uniform(0.2, 3, len(self.data))
+        self.dataset.instance_weights = weights
+        self.dataset_pred.instance_weights = weights
+        for cost_constraint in ("fpr", "fnr", "weighted"):
+            postprocessor = CalibratedEqOddsPostprocessing(
+                self.unprivileged_groups,
+                self.privileged_groups,
+                cost_constraint=cost_constraint,
+            ).fit(self.dataset, self.dataset_pred)
+            learner = CalibratedEqOddsLearner(
+                LogisticRegressionLearner(), cost_constraint=cost_constraint
+            )
+            model = learner.fit_postprocessor(
+                None, self.ytrue, self.probs, self.privileged, weights
+            )
+            np.testing.assert_almost_equal(
+                model.base_rates,
+                (postprocessor.base_rate_unpriv, postprocessor.base_rate_priv),
+            )
+            np.testing.assert_almost_equal(
+                model.mix_rates,
+                (postprocessor.unpriv_mix_rate, postprocessor.priv_mix_rate),
+            )
+
+    def test_weighted_reject_option(self):
+        """Check that the weighted grid search matches the aif360 implementation"""
+        weights = np.random.default_rng(1).uniform(0.2, 3, len(self.data))
+        self.dataset.instance_weights = weights
+        self.dataset_pred.instance_weights = weights
+        postprocessor = RejectOptionClassification(
+            self.unprivileged_groups,
+            self.privileged_groups,
+            num_class_thresh=20,
+            num_ROC_margin=10,
+        ).fit(self.dataset, self.dataset_pred)
+        learner = RejectOptionLearner(
+            LogisticRegressionLearner(), num_class_thresh=20, num_roc_margin=10
+        )
+        model = learner.fit_postprocessor(
+            None, self.ytrue, self.probs, self.privileged, weights
+        )
+        self.assertAlmostEqual(
+            model.classification_threshold, postprocessor.classification_threshold
+        )
+        self.assertAlmostEqual(model.margin, postprocessor.ROC_margin)
+
+    def test_reject_option(self):
+        """Check that the selected grid point matches the aif360 implementation"""
+        for metric, metric_name in (
+            ("spd", "Statistical parity difference"),
+            ("aod", "Average odds difference"),
+            ("eod", "Equal opportunity difference"),
+        ):
+            postprocessor = RejectOptionClassification(
+                self.unprivileged_groups,
+                self.privileged_groups,
+                num_class_thresh=20,
+                num_ROC_margin=10,
+                metric_name=metric_name,
+            ).fit(self.dataset, self.dataset_pred)
+            for n_jobs in (1, 3):
+                learner = RejectOptionLearner(
+                    LogisticRegressionLearner(),
+                    num_class_thresh=20,
+                    num_roc_margin=10,
+                    metric=metric,
+                    n_jobs=n_jobs,
+                )
+                model = learner.fit_postprocessor(
+                    None, self.ytrue, self.probs, self.privileged
+                )
+                self.assertAlmostEqual(
+                    model.classification_threshold,
+                    postprocessor.classification_threshold,
+                )
+                self.assertAlmostEqual(model.margin, postprocessor.ROC_margin)
+
+            favorable, _ = model.postprocess(self.probs, self.privileged)
+            predicted = postprocessor.predict(self.dataset_pred)
+            np.testing.assert_equal(
+                favorable, predicted.labels.ravel() == self.dataset.favorable_label
+            )
+
+    def test_models(self):
+        """Check the predictions of the models"""
+        for learner in (
+            CalibratedEqOddsLearner(LogisticRegressionLearner(), repeatable=True),
+            RejectOptionLearner(LogisticRegressionLearner()),
+        ):
+            model = learner(self.data)
+            values, probs = model(self.data, ret=Model.ValueProbs)
+            self.assertEqual(len(values), len(self.data))
+            self.assertTrue(set(np.unique(values)) <= {0, 1})
+            np.testing.assert_almost_equal(probs.sum(axis=1), 1)
+
+    def test_instance_weights(self):
+        """Check that the learners pass the weights of the data to the postprocessor"""
+        data = self.data.copy()
+        with data.unlocked():
+            data.W = np.random.default_rng(1).uniform(0.2, 3, len(data))
+        for learner in (
+            ThresholdOptimizerLearner(LogisticRegressionLearner()),
+            CalibratedEqOddsLearner(LogisticRegressionLearner()),
+            RejectOptionLearner(LogisticRegressionLearner()),
+        ):
+            with patch.object(
+                type(learner), "fit_postprocessor", wraps=learner.fit_postprocessor
+            ) as fit_postprocessor:
+                learner(data)
+            model, ytrue, probs, privileged, weights = fit_postprocessor.call_args[0]
+            self.assertEqual(len(weights), len(data))
+            np.testing.assert_equal(np.sort(weights), np.sort(data.W))
+
+    def test_invalid_parameters(self):
+        """Check that invalid parameters raise errors"""
+        with self.assertRaises(ValueError):
+            CalibratedEqOddsLearner(LogisticRegressionLearner(), cost_constraint="x")
+        with self.assertRaises(ValueError):
+            RejectOptionLearner(LogisticRegressionLearner(), metric="x")
+        with self.assertRaises(ValueError):
+            RejectOptionLearner(LogisticRegressionLearner(), low_class_thresh=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+This file contains the tests for the fairness scorers and the FairnessResult class.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from Orange.data import ContinuousVariable, Domain
+from Orange.evaluation import Results
+
+from orangecontrib.fairness.evaluation import scoring as bias_scoring
+from orangecontrib.fairness.evaluation.scoring import FairnessResult
+from orangecontrib.fairness.widgets.tests.utils import adult_like_data
+from orangecontrib.fairness.widgets.utils import FairnessView, table_to_standard_dataset
+
+
+SCORERS = (
+    (bias_scoring.StatisticalParityDifference, "statistical_parity_difference"),
+    (bias_scoring.EqualOpportunityDifference, "equal_opportunity_difference"),
+    (bias_scoring.AverageOddsDifference, "average_odds_difference"),
+    (bias_scoring.DisparateImpact, "disparate_impact"),
+)
+
+
+def random_results(data, n_models=1, seed=0):
+    """Create test results with random predictions, which use some rows twice"""
+    rng = np.random.default_rng(seed)
+    row_indices = np.hstack((np.arange(len(data)), np.arange(len(data) // 10)))
+    probabilities = rng.random((n_models, len(row_indices)))
+    return Results(
+        data,
+        nmethods=n_models,
+        row_indices=row_indices,
+        actual=data.Y[row_indices],
+        predicted=(probabilities > 0.5).astype(float),
+        probabilities=np.stack((1 - probabilities, probabilities), axis=2),
+        store_data=True,
+    )
+
+
+def aif360_scores(results, model_index=0):
+    """Compute the scores with aif360's ClassificationMetric, as the scorers did before"""
+    from aif360.metrics import ClassificationMetric
+
+    dataset, privileged_groups, unprivileged_groups = table_to_standard_dataset(
+        results.data, fairness_columns_only=True
+    )
+    dataset = dataset.subset(results.row_indices)
+    dataset_pred = dataset.copy()
+    dataset_pred.labels = results.predicted[model_index].reshape(-1, 1)
+    return ClassificationMetric(
+        dataset,
+        dataset_pred,
+        unprivileged_groups=unprivileged_groups,
+        privileged_groups=privileged_groups,
+    )
+
+
+class TestFairnessScorers(unittest.TestCase):
+    """
+    Test class for the fairness scorers, compared to aif360's ClassificationMetric.
+    """
+
+    def setUp(self):
+        data = adult_like_data(500)
+        weights = ContinuousVariable("weights")
+        self.data = data.transform(
+            Domain(data.domain.attributes, data.domain.class_vars, [weights])
+        ).copy()
+        with self.data.unlocked(self.data.metas):
+            self.data.metas[:, 0] = np.random.default_rng(0).random(len(self.data))
+
+    def test_same_as_aif360(self):
+        """Check that the scores of all models match aif360"""
+        results = random_results(self.data, n_models=3)
+        for model_index in range(3):
+            metric = aif360_scores(results, model_index)
+            for scorer, name in SCORERS:
+                self.assertAlmostEqual(
+                    scorer(results)[model_index], getattr(metric, name)(), 6
+                )
+
+    def test_repeated_rows(self):
+        """Check the scores of results which use the rows several times (bootstrap)"""
+        rng = np.random.default_rng(1)
+        row_indices = rng.integers(0, len(self.data), 5 * len(self.data))
+        predicted = rng.integers(0, 2, (2, len(row_indices))).astype(float)
+        results = Results(
+            self.data,
+            nmethods=2,
+            row_indices=row_indices,
+            actual=self.data.Y[row_indices],
+            predicted=predicted,
+            store_data=True,
+        )
+        with patch.object(
+            FairnessView, "from_table", wraps=FairnessView.from_table
+        ) as from_table:
+            data = self.data.copy()
+            results.data = data
+            scores = {name: scorer(results) for scorer, name in SCORERS}
+            # The fairness columns are read once for all the scorers
+            from_table.assert_called_once_with(data)
+
+        for model_index in range(2):
+            metric = aif360_scores(results, model_index)
+            for _, name in SCORERS:
+                self.assertAlmostEqual(
+                    scores[name][model_index], getattr(metric, name)(), 6
+                )
+
+        result = FairnessResult.from_results(results)
+        nbytes = sum(
+            array.nbytes
+            for array in (result.groups, result.actual, result.predicted, result.weights)
+        )
+        self.assertEqual(nbytes, (1 + 1 + 2 + 8) * len(row_indices))
+
+    def test_instance_weights(self):
+        """Check that the scores of weighted data are the scores of the repeated rows"""
+        data = adult_like_data(500).copy()
+        weights = np.random.default_rng(2).integers(0, 4, len(data))
+        with data.unlocked_reference():
+            data.W = weights.astype(float)
+        results = random_results(data, n_models=2)
+
+        repeat = np.repeat(
+            np.arange(len(results.row_indices)), weights[results.row_indices]
+        )
+        repeated = Results(
+            adult_like_data(500),
+            nmethods=2,
+            row_indices=results.row_indices[repeat],
+            actual=results.actual[repeat],
+            predicted=results.predicted[:, repeat],
+            store_data=True,
+        )
+        for scorer, _ in SCORERS:
+            np.testing.assert_almost_equal(scorer(results), scorer(repeated), 6)
+
+    def test_fairness_result(self):
+        """Check the dtypes of the arrays and the shape of the confusion matrices"""
+        results = random_results(self.data, n_models=2)
+        result = FairnessResult.from_results(results)
+        self.assertEqual(result.groups.dtype, np.int8)
+        self.assertEqual(result.actual.dtype, np.int8)
+        self.assertEqual(result.predicted.dtype, np.int8)
+        self.assertEqual(result.weights.dtype, np.float64)
+        self.assertEqual(result.predicted.shape, (2, len(results.row_indices)))
+        self.assertFalse(hasattr(result, "__dict__"))
+
+        confusion = result.confusion()
+        self.assertEqual(confusion.shape, (2, 2, 3, 2))
+        np.testing.assert_almost_equal(
+            confusion.sum(axis=(1, 2, 3)),
+            2 * [np.sum(result.weights, dtype=float)],
+            decimal=3,
+        )
+
+        result32 = FairnessResult.from_results(results, np.float32)
+        self.assertEqual(result32.groups.dtype, np.int8)
+        self.assertEqual(result32.weights.dtype, np.float32)
+        np.testing.assert_almost_equal(
+            result32.average_odds_difference(), result.average_odds_difference(), 6
+        )
+
+    def test_classification_metric_scorer(self):
+        """Check that the scorers with the deprecated metric method still work"""
+        with self.assertWarns(DeprecationWarning):
+
+            class LegacyScorer(bias_scoring.FairnessScorer, abstract=True):
+                def metric(self, classification_metric):
+                    return classification_metric.average_odds_difference()
+
+        results = random_results(self.data)
+        self.assertAlmostEqual(
+            LegacyScorer()(results)[0],
+            bias_scoring.AverageOddsDifference(results)[0],
+            6,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,325 @@
+"""
+This file contains the tests for the input checks in the widgets' utils module.
+"""
+
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from Orange.data import ContinuousVariable, Domain, Table
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.fairness.widgets.owdatasetbias import OWDatasetBias
+from orangecontrib.fairness.widgets.tests.utils import (
+    adult_like_data,
+    assert_not_densified,
+)
+from orangecontrib.fairness.widgets.utils import (
+    check_data_structure,
+    check_fairness_data,
+    check_for_missing_values,
+    domain_checks,
+    FairnessView,
+    has_missing_values,
+    learner_fingerprint,
+    model_cache_key,
+    ModelCache,
+    table_fingerprint,
+    table_to_standard_dataset,
+)
+
+
+@check_fairness_data
+@check_for_missing_values
+@check_data_structure
+def handler(widget, data):
+    """A handler which only runs the input checks"""
+    return data
+
+
+class TestInputChecks(WidgetTest):
+    """
+    Test class for the input checks and their caches.
+    """
+
+    def setUp(self):
+        self.widget = self.create_widget(OWDatasetBias)
+        self.data = adult_like_data(100)
+
+    def test_domain_checks_by_identity(self):
+        """Check that equal domains without the fairness attributes are not confused"""
+        domain = self.data.domain
+        self.assertTrue(domain_checks(domain).fairness_attributes)
+
+        class_var = domain.class_var.copy()
+        class_var.attributes.pop("favorable_class_value")
+        other = Domain(domain.attributes, class_var, domain.metas)
+        self.assertEqual(domain, other)
+        self.assertFalse(domain_checks(other).fairness_attributes)
+        self.assertIs(domain_checks(domain), domain_checks(domain))
+
+    def test_missing_values_scanned_once(self):
+        """Check that the missing values are scanned once for each table"""
+        with patch.object(Table, "has_missing", return_value=False) as has_missing:
+            self.assertFalse(has_missing_values(self.data))
+            self.assertFalse(has_missing_values(self.data))
+            handler(self.widget, self.data)
+            self.assertEqual(has_missing.call_count, 1)
+
+        data = self.data.copy()
+        with data.unlocked(data.X):
+            data.X[0, 0] = np.nan
+        self.assertTrue(has_missing_values(data))
+
+    def test_messages(self):
+        """Check that the messages are shown and cleared"""
+        self.assertIs(handler(self.widget, self.data), self.data)
+        self.assertFalse(self.widget.Error.missing_fairness_data.is_shown())
+
+        domain = self.data.domain
+        class_var = domain.class_var.copy()
+        class_var.attributes.pop("favorable_class_value")
+        data = self.data.transform(Domain(domain.attributes, class_var, domain.metas))
+        self.assertIsNone(handler(self.widget, data))
+        self.assertTrue(self.widget.Error.missing_fairness_data.is_shown())
+
+        data = self.data.transform(Domain(domain.attributes, None, domain.metas))
+        self.assertIsNone(check_data_structure(lambda _, d: d)(self.widget, data))
+        self.assertTrue(self.widget.Error.missing_class_variable.is_shown())
+
+        self.assertIsNone(handler(self.widget, None))
+        self.assertFalse(self.widget.Error.missing_fairness_data.is_shown())
+        self.assertFalse(self.widget.Error.missing_class_variable.is_shown())
+
+
+class TestTableToStandardDataset(unittest.TestCase):
+    """
+    Test class for the conversion of the fairness columns only.
+    """
+
+    def setUp(self):
+        data = adult_like_data(200)
+        weights = ContinuousVariable("weights")
+        self.data = data.transform(
+            Domain(data.domain.attributes, data.domain.class_vars, [weights])
+        ).copy()
+        rng = np.random.default_rng(0)
+        with self.data.unlocked():
+            self.data.metas[:, 0] = rng.random(len(self.data))
+            # Missing values in an unrelated column and in the protected attribute
+            self.data.X[::7, 0] = np.nan
+            self.data.X[::11, self.data.domain.index("sex")] = np.nan
+
+    def test_fairness_columns(self):
+        """Check that the fairness columns match the conversion of the whole table"""
+        full, privileged_groups, unprivileged_groups = table_to_standard_dataset(
+            self.data
+        )
+        with patch("orangecontrib.fairness.widgets.utils.Impute") as impute:
+            dataset, privileged, unprivileged = table_to_standard_dataset(
+                self.data, fairness_columns_only=True
+            )
+            impute.assert_not_called()
+
+        self.assertEqual(dataset.feature_names, ["sex"])
+        self.assertEqual(privileged, privileged_groups)
+        self.assertEqual(unprivileged, unprivileged_groups)
+        np.testing.assert_equal(dataset.labels, full.labels)
+        np.testing.assert_equal(dataset.protected_attributes, full.protected_attributes)
+        np.testing.assert_equal(dataset.instance_weights, full.instance_weights)
+        self.assertEqual(dataset.favorable_label, full.favorable_label)
+
+    def test_sparse(self):
+        """Check that the fairness columns of sparse data are read without densifying"""
+        expected, _, _ = table_to_standard_dataset(self.data, fairness_columns_only=True)
+        data = self.data.to_sparse()
+        with assert_not_densified(self), patch.object(
+            Table, "to_pandas_dfs"
+        ) as to_pandas_dfs:
+            dataset, _, _ = table_to_standard_dataset(data, fairness_columns_only=True)
+            to_pandas_dfs.assert_not_called()
+        np.testing.assert_equal(dataset.labels, expected.labels)
+        np.testing.assert_equal(dataset.protected_attributes, expected.protected_attributes)
+        np.testing.assert_equal(dataset.instance_weights, expected.instance_weights)
+
+
+class TestFairnessView(unittest.TestCase):
+    """
+    Test class for the FairnessView, compared to the aif360 algorithms.
+    """
+
+    def setUp(self):
+        data = adult_like_data(300)
+        weights = ContinuousVariable("weights")
+        self.data = data.transform(
+            Domain(data.domain.attributes, data.domain.class_vars, [weights])
+        ).copy()
+        rng = np.random.default_rng(0)
+        with self.data.unlocked():
+            self.data.metas[:, 0] = rng.random(len(self.data))
+            self.data.X[::11, self.data.domain.index("sex")] = np.nan
+
+    def test_from_table(self):
+        """Check that the view reads the groups, the labels and the weights"""
+        view = FairnessView.from_table(self.data)
+        dataset, _, _ = table_to_standard_dataset(self.data, fairness_columns_only=True)
+        self.assertEqual(view.groups.dtype, np.int8)
+        self.assertEqual(view.labels.dtype, np.int8)
+        self.assertEqual(view.weights.dtype, np.float64)
+        view32 = FairnessView.from_table(self.data, np.float32)
+        self.assertEqual(view32.weights.dtype, np.float32)
+        np.testing.assert_equal(view.groups, dataset.protected_attributes[:, 0])
+        np.testing.assert_equal(
+            view.labels, dataset.labels[:, 0] == dataset.favorable_label
+        )
+        np.testing.assert_almost_equal(view.weights, dataset.instance_weights)
+
+        data = self.data.copy()
+        with data.unlocked(data.Y):
+            data.Y[:5] = np.nan
+        view = FairnessView.from_table(data)
+        np.testing.assert_equal(view.labels[:5], -1)
+        self.assertAlmostEqual(view.counts().sum(), np.sum(view.weights[5:]), places=4)
+
+        view = FairnessView.from_table(adult_like_data(10))
+        self.assertIsNone(view.weights)
+        np.testing.assert_equal(view.subset([1, 1, 0]).groups, view.groups[[1, 1, 0]])
+
+    def test_dataset_bias(self):
+        """Check that the bias of the data is the same as with aif360"""
+        from aif360.metrics import BinaryLabelDatasetMetric
+
+        dataset, privileged, unprivileged = table_to_standard_dataset(
+            self.data, fairness_columns_only=True
+        )
+        metric = BinaryLabelDatasetMetric(dataset, unprivileged, privileged)
+        view = FairnessView.from_table(self.data)
+        self.assertAlmostEqual(view.disparate_impact(), metric.disparate_impact(), 6)
+        self.assertAlmostEqual(
+            view.statistical_parity_difference(),
+            metric.statistical_parity_difference(),
+            6,
+        )
+
+    def test_reweighing(self):
+        """Check that the reweighed weights are the same as with aif360"""
+        from aif360.algorithms.preprocessing import Reweighing
+
+        dataset, privileged, unprivileged = table_to_standard_dataset(
+            self.data, fairness_columns_only=True
+        )
+        expected = Reweighing(unprivileged, privileged).fit_transform(dataset)
+        view = FairnessView.from_table(self.data)
+        np.testing.assert_allclose(
+            view.reweighed(view.reweighing_factors()),
+            expected.instance_weights,
+            rtol=1e-6,
+        )
+
+        view.labels[:3] = -1
+        self.assertTrue(np.isnan(view.reweighed(view.reweighing_factors())[:3]).all())
+
+
+
+class TestModelCache(unittest.TestCase):
+    """
+    Test class for the fingerprints of the tables and learners and the ModelCache.
+    """
+
+    def setUp(self):
+        self.data = adult_like_data(300)
+
+    def test_table_fingerprint(self):
+        """Check that the fingerprint depends on the values and the variables"""
+        fingerprint = table_fingerprint(self.data)
+        self.assertEqual(table_fingerprint(self.data.copy()), fingerprint)
+        self.assertEqual(
+            table_fingerprint(pickle.loads(pickle.dumps(self.data))), fingerprint
+        )
+
+        changed = self.data.copy()
+        with changed.unlocked(changed.X):
+            changed.X[0, 0] += 1
+        self.assertNotEqual(table_fingerprint(changed), fingerprint)
+        self.assertNotEqual(table_fingerprint(self.data[:299]), fingerprint)
+
+        # The fairness attributes are a part of the domain's description
+        other = adult_like_data(300)
+        other.domain.class_var.attributes["favorable_class_value"] = "<=50K"
+        self.assertNotEqual(table_fingerprint(other), fingerprint)
+
+        sparse = self.data.to_sparse()
+        self.assertEqual(table_fingerprint(sparse.copy()), table_fingerprint(sparse))
+        self.assertNotEqual(table_fingerprint(sparse), fingerprint)
+
+    def test_learner_fingerprint(self):
+        """Check that the fingerprint depends on the class and the parameters"""
+        from Orange.classification import LogisticRegressionLearner
+
+        learner = LogisticRegressionLearner(C=1)
+        fingerprint = learner_fingerprint(learner)
+        self.assertEqual(learner_fingerprint(LogisticRegressionLearner(C=1)), fingerprint)
+        self.assertNotEqual(
+            learner_fingerprint(LogisticRegressionLearner(C=2)), fingerprint
+        )
+        learner.name = "other"
+        self.assertNotEqual(learner_fingerprint(learner), fingerprint)
+
+        learner = LogisticRegressionLearner()
+        learner.params["scorer"] = lambda: None
+        self.assertIsNone(learner_fingerprint(learner))
+        self.assertIsNone(model_cache_key(learner, self.data))
+
+    def test_bounded_memory(self):
+        """Check that the least recently used models are removed"""
+        size = len(pickle.dumps(np.zeros(1000), pickle.HIGHEST_PROTOCOL))
+        cache = ModelCache(max_bytes=2.5 * size)
+        for key in "abc":
+            cache.put(key, np.zeros(1000))
+            self.assertLessEqual(cache.nbytes, cache.max_bytes)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+
+        model = cache.get("b")
+        self.assertIsNotNone(model)
+        cache.put("d", np.zeros(1000))
+        self.assertIs(cache.get("b"), model)
+        self.assertIsNone(cache.get("c"))
+
+        # Models larger than the cache and models which can not be pickled are skipped
+        cache.put("e", np.zeros(10000))
+        cache.put("f", lambda: None)
+        self.assertIsNone(cache.get("e"))
+        self.assertIsNone(cache.get("f"))
+        self.assertIsNone(cache.get(None))
+
+    def test_spill_dir(self):
+        """Check that the removed models are stored in the spill directory"""
+        size = len(pickle.dumps(np.zeros(1000), pickle.HIGHEST_PROTOCOL))
+        with tempfile.TemporaryDirectory() as spill_dir:
+            cache = ModelCache(
+                max_bytes=1.5 * size, spill_dir=spill_dir, max_spill_bytes=2.5 * size
+            )
+            for i, key in enumerate("abcd"):
+                cache.put(key, np.full(1000, i))
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(sorted(os.listdir(spill_dir)), ["b.pkl", "c.pkl"])
+            self.assertNotIn("a", cache)
+            self.assertIn("b", cache)
+
+            # The spilled models are read without removing the models in memory
+            np.testing.assert_equal(cache.get("b"), np.full(1000, 1))
+            self.assertEqual(len(cache), 1)
+            np.testing.assert_equal(cache.get("d"), np.full(1000, 3))
+
+            # Another cache (e.g. in the next session) uses the same files
+            other = ModelCache(spill_dir=spill_dir)
+            np.testing.assert_equal(other.get("c"), np.full(1000, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
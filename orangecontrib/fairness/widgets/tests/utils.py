@@ -2,9 +2,16 @@
 Utility functions for testing.
 """
 
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import scipy.sparse as sp
+
 from Orange.evaluation import scoring
 
 from orangecontrib.fairness.evaluation import scoring as bias_scoring
+# The synthetic data is shared with the benchmarks
+from orangecontrib.fairness.synthetic import adult_like_data
 
 
 def print_metrics(results, bias=True):
@@ -51,3 +58,25 @@ def fairness_attributes(domain):
                 privileged_pa_values = var.attributes["privileged_pa_values"]
                 break
     return favorable_class_value, protected_attribute, privileged_pa_values
+
+
+@contextmanager
+def assert_not_densified(testcase):
+    """
+    Check that sparse matrices are not converted to dense arrays within the context.
+
+    Converting single columns (e.g. with `Table.get_column`) is allowed.
+
+    Args:
+        testcase (unittest.TestCase): The test case used for the assertion.
+    """
+    shapes = []
+    toarray = sp.csr_matrix.toarray
+
+    def recording_toarray(matrix, *args, **kwargs):
+        shapes.append(matrix.shape)
+        return toarray(matrix, *args, **kwargs)
+
+    with patch.object(sp.csr_matrix, "toarray", recording_toarray):
+        yield
+    testcase.assertEqual([shape for shape in shapes if shape[1] > 1], [])
@@ -1,17 +1,38 @@
 """
 This module contains utility functions and decorators used by the fairness widgets.
+
+The module is imported when Orange discovers the widgets and scorers of the add-on,
+so aif360 (and through it TensorFlow and the rest of its dependencies) is only
+imported by the functions which need it, not at the import of the module.
 """
 
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import weakref
 import importlib.util
 
-from functools import wraps
-from aif360.datasets import StandardDataset
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+from copy import deepcopy
+from functools import lru_cache, wraps
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
 
+from Orange.base import Learner
+from Orange.widgets import gui
 from Orange.widgets.utils.messages import UnboundMsg
 from Orange.data import Table, Domain
 from Orange.preprocess.preprocess import PreprocessorList
 from Orange.preprocess import Impute
 
+from orangecontrib.fairness import instrumentation
+from orangecontrib.fairness.instrumentation import span
+
 MISSING_FAIRNESS_ATTRIBUTES: str = (
     "The dataset does not contain the fairness attributes. \n"
     'Use the "As Fairness Data" widget to add them. '
@@ -56,77 +77,167 @@ TENSORFLOW_NOT_INSTALLED: str = (
 )
 
 
+@lru_cache(maxsize=None)
 def is_tensorflow_installed():
+    """
+    Check if tensorflow is installed.
+
+    The result is cached for the process, since installing an add-on requires a restart.
+    """
     spec = importlib.util.find_spec("tensorflow")
     return spec is not None
 
 
-def check_for_tensorflow(f):
-    """A function which checks if tensorflow is installed."""
+#############################################################
+# Validation of the widget inputs
+#############################################################
+
+
+class _IdentityCache:
+    """
+    Cache of values computed for objects, keyed by the identity of the object.
+
+    Domains compare equal when their variables have the same names, even if only one of
+    them contains the fairness attributes, so the objects themselves can not be used as
+    keys. The values are removed when the objects are garbage collected.
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+        self.values = {}
+
+    def __call__(self, obj):
+        key = id(obj)
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        value = self.compute(obj)
+        self.values[key] = value
+        weakref.finalize(obj, self.values.pop, key, None)
+        return value
+
+
+DomainChecks = namedtuple(
+    "DomainChecks",
+    (
+        "fairness_attributes",
+        "class_variable",
+        "discrete_class_variable",
+        "categorical_attributes",
+        "weights",
+    ),
+)
+
+
+def _check_domain(domain: Domain) -> DomainChecks:
+    class_var = domain.class_var
+    return DomainChecks(
+        fairness_attributes=contains_fairness_attributes(domain),
+        class_variable=bool(class_var),
+        discrete_class_variable=bool(class_var) and class_var.is_discrete,
+        categorical_attributes=any(attr.is_discrete for attr in domain.attributes),
+        weights=any(var.name == "weights" for var in domain.metas),
+    )
+
+
+# The domains (and tables) passed between widgets are not modified,
+# so the checks are done once for each domain and table
+_domain_checks = _IdentityCache(_check_domain)
+_has_missing_values = _IdentityCache(lambda data: bool(data.has_missing()))
+_weights_index = _IdentityCache(
+    lambda domain: next(
+        (i for i, var in enumerate(domain.metas) if var.name == "weights"), None
+    )
+)
+
+
+def domain_checks(domain: Domain) -> DomainChecks:
+    """Return the (cached) results of the domain checks done by the input decorators."""
+    return _domain_checks(domain)
+
+
+def has_missing_values(data: Table) -> bool:
+    """Check if the data contains missing values; the scan is done once for each table."""
+    return _has_missing_values(data)
+
+
+_MESSAGES = {
+    "reweighing_preprocessor": UnboundMsg(REWEIGHING_PREPROCESSOR),
+    "reweighinghted_data": UnboundMsg(REWEIGHTED_DATA),
+    "missing_fairness_data": UnboundMsg(MISSING_FAIRNESS_ATTRIBUTES),
+    "missing_values_detected": UnboundMsg(MISSING_VALUES),
+    "missing_class_variable": UnboundMsg(MISSING_CLASS_VARIABLE),
+    "numerical_class_variable": UnboundMsg(NUMERICAL_CLASS_VARIABLE),
+    "no_categorical_attributes": UnboundMsg(NO_CATEGORICAL_ATTRIBUTES),
+}
+
+
+def _message(group, name):
+    """Get the message from the widget's message group, add it on first use and clear it"""
+    message = group.__dict__.get(name)
+    if message is None:
+        group.add_message(name, _MESSAGES[name])
+        message = getattr(group, name)
+    message.clear()
+    return message
+
+
+def _input_check(f, check):
+    """
+    Wrap the input handler so that the input is first passed to the check.
+
+    The check shows the widget's messages and returns the input or None,
+    which is passed to the handler instead of the input.
+    """
 
     @wraps(f)
     def wrapper(widget, input, *args, **kwargs):
-        if not is_tensorflow_installed():
-            input = None
-
-        return f(widget, input, *args, **kwargs)
+        return f(widget, check(widget, input), *args, **kwargs)
 
     return wrapper
 
 
+def check_for_tensorflow(f):
+    """A function which checks if tensorflow is installed."""
+
+    def check(widget, input):
+        return input if is_tensorflow_installed() else None
+
+    return _input_check(f, check)
+
+
 def check_for_reweighing_preprocessor(f):
     """A function which checks if the input to a widget is a reweighing preprocessor."""
     from orangecontrib.fairness.widgets.owreweighing import ReweighingTransform
 
-    @wraps(f)
-    def wrapper(widget, input, *args, **kwargs):
-        # Add the preprocessor error message
-        widget.Error.add_message(
-            "reweighing_preprocessor", UnboundMsg(REWEIGHING_PREPROCESSOR)
-        )
-        widget.Error.reweighing_preprocessor.clear()
-
-        if isinstance(input, ReweighingTransform):
-            widget.Error.reweighing_preprocessor()
-            input = None
-
-        elif isinstance(input, PreprocessorList) and any(
-            isinstance(p, ReweighingTransform) for p in input.preprocessors
+    def check(widget, input):
+        message = _message(widget.Error, "reweighing_preprocessor")
+        if (
+            isinstance(input, ReweighingTransform)
+            or isinstance(input, PreprocessorList)
+            and any(isinstance(p, ReweighingTransform) for p in input.preprocessors)
+            or isinstance(input, Table)
+            and domain_checks(input.domain).weights
         ):
-            widget.Error.reweighing_preprocessor()
+            message()
             input = None
+        return input
 
-        elif isinstance(input, Table):
-            for variable in input.domain.metas:
-                if variable.name == "weights":
-                    widget.Error.reweighing_preprocessor()
-                    input = None
-                    break
-
-        return f(widget, input, *args, **kwargs)
-
-    return wrapper
+    return _input_check(f, check)
 
 
 def check_for_reweighted_data(f):
     """A function which checks if the input data war reweighted by a reweighing preprocessor."""
 
-    @wraps(f)
-    def wrapper(widget, input, *args, **kwargs):
-        # Add the preprocessor error message
-        widget.Error.add_message("reweighinghted_data", UnboundMsg(REWEIGHTED_DATA))
-        widget.Error.reweighinghted_data.clear()
-
-        if isinstance(input, Table):
-            for variable in input.domain.metas:
-                if variable.name == "weights":
-                    widget.Error.reweighinghted_data()
-                    input = None
-                    break
+    def check(widget, input):
+        message = _message(widget.Error, "reweighinghted_data")
+        if isinstance(input, Table) and domain_checks(input.domain).weights:
+            message()
+            input = None
+        return input
 
-        return f(widget, input, *args, **kwargs)
-
-    return wrapper
+    return _input_check(f, check)
 
 
 def contains_fairness_attributes(domain: Domain) -> bool:
@@ -143,46 +254,34 @@ def contains_fairness_attributes(domain: Domain) -> bool:
 
 def is_standard_dataset(data) -> bool:
     """Check if the data is of type standard dataset."""
-    return isinstance(data, StandardDataset)
+    # The data can only be a StandardDataset if aif360 was already imported
+    datasets = sys.modules.get("aif360.datasets")
+    return datasets is not None and isinstance(data, datasets.StandardDataset)
 
 
 def check_fairness_data(f):
     """Wrapper function which checks if the data contains fairness attributes."""
 
-    @wraps(f)
-    def wrapper(widget, data: Table, *args, **kwargs):
-        widget.Error.add_message(
-            "missing_fairness_data", UnboundMsg(MISSING_FAIRNESS_ATTRIBUTES)
-        )
-        widget.Error.missing_fairness_data.clear()
-
-        if data is not None and isinstance(data, Table):
-            if not contains_fairness_attributes(data.domain):
-                widget.Error.missing_fairness_data()
-                data = None
+    def check(widget, data):
+        message = _message(widget.Error, "missing_fairness_data")
+        if isinstance(data, Table) and not domain_checks(data.domain).fairness_attributes:
+            message()
+            data = None
+        return data
 
-        return f(widget, data, *args, **kwargs)
-
-    return wrapper
+    return _input_check(f, check)
 
 
 def check_for_missing_values(f):
     """A wrapper function which checks if the data contains missing rows."""
 
-    @wraps(f)
-    def wrapper(widget, data: Table, *args, **kwargs):
-        widget.Warning.add_message(
-            "missing_values_detected", UnboundMsg(MISSING_VALUES)
-        )
-        widget.Warning.missing_values_detected.clear()
-
-        if data is not None and isinstance(data, Table):
-            if data.has_missing():
-                widget.Warning.missing_values_detected()
-
-        return f(widget, data, *args, **kwargs)
+    def check(widget, data):
+        message = _message(widget.Warning, "missing_values_detected")
+        if isinstance(data, Table) and has_missing_values(data):
+            message()
+        return data
 
-    return wrapper
+    return _input_check(f, check)
 
 
 def check_data_structure(f):
@@ -190,45 +289,31 @@ def check_data_structure(f):
     Check if the data has a (categorical) class variable and more than one categorical attribute.
     """
 
-    @wraps(f)
-    def wrapper(widget, data: Table, *args, **kwargs):
-        widget.Error.add_message(
-            "missing_class_variable", UnboundMsg(MISSING_CLASS_VARIABLE)
-        )
-        widget.Error.add_message(
-            "numerical_class_variable", UnboundMsg(NUMERICAL_CLASS_VARIABLE)
-        )
-        widget.Error.add_message(
-            "no_categorical_attributes", UnboundMsg(NO_CATEGORICAL_ATTRIBUTES)
-        )
-
-        widget.Error.missing_class_variable.clear()
-        widget.Error.numerical_class_variable.clear()
-        widget.Error.no_categorical_attributes.clear()
-
-        if data is not None and isinstance(data, Table):
-            if not data.domain.class_var:
-                widget.Error.missing_class_variable()
-                data = None
-
-            elif not data.domain.class_var.is_discrete:
-                widget.Error.numerical_class_variable()
-                data = None
-
-            if data is not None:
-                categorical = False
-                for attribute in data.domain.attributes:
-                    if attribute.is_discrete:
-                        categorical = True
-                        break
-
-                if not categorical:
-                    widget.Error.no_categorical_attributes()
-                    data = None
-
-        return f(widget, data, *args, **kwargs)
-
-    return wrapper
+    def check(widget, data):
+        messages = [
+            _message(widget.Error, name)
+            for name in (
+                "missing_class_variable",
+                "numerical_class_variable",
+                "no_categorical_attributes",
+            )
+        ]
+        if isinstance(data, Table):
+            checks = domain_checks(data.domain)
+            for message, passed in zip(
+                messages,
+                (
+                    checks.class_variable,
+                    checks.discrete_class_variable,
+                    checks.categorical_attributes,
+                ),
+            ):
+                if not passed:
+                    message()
+                    return None
+        return data
+
+    return _input_check(f, check)
 
 
 #############################################################
@@ -299,20 +384,45 @@ def _correct_standard_dataset(standard_dataset, favorable_class_value_indexes):
         )
 
 
-def table_to_standard_dataset(data) -> None:
-    """Converts an Orange.data.Table to an aif360 StandardDataset."""
+def table_to_standard_dataset(data, fairness_columns_only=False) -> None:
+    """
+    Converts an Orange.data.Table to an aif360 StandardDataset.
+
+    Args:
+        data (Table): the data with the fairness attributes
+        fairness_columns_only (bool): if true, the dataset only contains the class and
+            the protected attribute, which is all the fairness metrics, reweighing and
+            postprocessing read; only the missing values of the protected attribute are
+            imputed instead of imputing the whole table
+    """
+    import pandas as pd
+    from aif360.datasets import StandardDataset
 
     if not contains_fairness_attributes(data.domain):
         raise ValueError(MISSING_FAIRNESS_ATTRIBUTES)
 
-    if data.has_missing():
-        data = Impute()(data)
-
-    xdf, ydf, mdf = data.to_pandas_dfs()
-    # Merge xdf and ydf (currently not merging mdf because it is not used)
-    # This dataframe consists of all the data, the categorical variables values are
-    # represented with the index of the value in domain[attribute].values
-    df = ydf.merge(xdf, left_index=True, right_index=True)
+    if fairness_columns_only:
+        # The protected attribute is already mapped to 1 (privileged) and 0
+        class_var = data.domain.class_var
+        df = pd.DataFrame(
+            {
+                class_var.name: data.get_column(class_var),
+                _get_fairness_attributes(data)[1]: get_privileged_mask(data).astype(int),
+            }
+        )
+    else:
+        # Learners which use all the features impute the data with their preprocessors,
+        # so the imputation is fitted on the training data and reused for predictions
+        if has_missing_values(data):
+            with span("impute", rows=len(data)):
+                data = Impute()(data)
+
+        with span("to_pandas_dfs", rows=len(data)):
+            xdf, ydf, _ = data.to_pandas_dfs()
+        # Merge xdf and ydf (the metas are not used)
+        # This dataframe consists of all the data, the categorical variables values are
+        # represented with the index of the value in domain[attribute].values
+        df = ydf.merge(xdf, left_index=True, right_index=True)
 
     # Read the fairness attributes from the domain of the data,
     # which will be used to get the index representations
@@ -347,26 +457,28 @@ def table_to_standard_dataset(data) -> None:
     # Map the protected_attribute privileged values to 1 and the unprivileged values to 0
     # This is so AdversarialDebiasing can work when the protected attribute has more than
     # two unique values. It does not affect the performance of any other algorithm.
-    df[protected_attribute] = df[protected_attribute].map(
-        lambda x: 1 if x in privileged_pa_values_indexes else 0
-    )
+    if not fairness_columns_only:
+        df[protected_attribute] = df[protected_attribute].map(
+            lambda x: 1 if x in privileged_pa_values_indexes else 0
+        )
 
     # Create the StandardDataset, this is the dataset that aif360 uses
-    standard_dataset = StandardDataset(
-        df=df,  # df: a pandas dataframe containing all the data
-        label_name=data.domain.class_var.name,  # label_name: the name of the class variable
-        favorable_classes=[
-            favorable_class_value_indexes
-        ],  # favorable_classes: the values of the class variable that are considered favorable
-        protected_attribute_names=[
-            protected_attribute
-        ],  # protected_attribute_names: the name of the protected attribute
-        privileged_classes=[
-            [1]
-        ],  # privileged_classes: the values of the protected attribute that are considered
-        # privileged (in this case they are index encoded).
-        # categorical_features = discrete_variables,
-    )
+    with span("StandardDataset", rows=len(df), columns=len(df.columns)):
+        standard_dataset = StandardDataset(
+            df=df,  # df: a pandas dataframe containing all the data
+            label_name=data.domain.class_var.name,  # label_name: the name of the class variable
+            favorable_classes=[
+                favorable_class_value_indexes
+            ],  # favorable_classes: the values of the class variable that are considered favorable
+            protected_attribute_names=[
+                protected_attribute
+            ],  # protected_attribute_names: the name of the protected attribute
+            privileged_classes=[
+                [1]
+            ],  # privileged_classes: the values of the protected attribute that are considered
+            # privileged (in this case they are index encoded).
+            # categorical_features = discrete_variables,
+        )
 
     # Adversarial debiasing bug fix (in the prediction phase when using Average Impute
     # and Predictions widget all labels are set to the same value for some reason.
@@ -377,8 +489,10 @@ def table_to_standard_dataset(data) -> None:
     # have it here as a precaution)
     _correct_standard_dataset(standard_dataset, favorable_class_value_indexes)
 
-    if "weights" in mdf:
-        standard_dataset.instance_weights = mdf["weights"].to_numpy()
+    weights = get_instance_weights(data)
+    if weights is not None:
+        # A copy, so aif360 can not change the table through the dataset
+        standard_dataset.instance_weights = np.array(weights)
 
     # Create the privileged and unprivileged groups
     # The format was a list of dictionaries, each dictionary contains the name of the protected
@@ -389,3 +503,767 @@ def table_to_standard_dataset(data) -> None:
     unprivileged_groups = [{protected_attribute: 0}]
 
     return standard_dataset, privileged_groups, unprivileged_groups
+
+
+##############################################################
+# Functions for reading the fairness columns without conversion
+##############################################################
+
+
+# The dtype of the features and the weights which the fairness algorithms convert the
+# data to. float64 is the precision of the tables, so the weights and the scores are the
+# same as with aif360's datasets. float32 (with int8 labels and groups) halves the memory
+# and the bandwidth of the conversion, but changes the weights and the scores in their
+# last digits, so it is only used when it is passed explicitly.
+DEFAULT_DTYPE = np.float64
+
+
+def codes_dtype(dtype=DEFAULT_DTYPE) -> np.dtype:
+    """
+    Return the dtype of the labels and the groups (0 or 1) which goes with the dtype
+    of the features: int8 for float32 and the same dtype for float64.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"Unsupported dtype: {dtype}; use float32 or float64.")
+    return np.dtype(np.int8) if dtype == np.float32 else dtype
+
+
+def _fill_with_most_frequent(column):
+    """
+    Replace the missing values of an index encoded column with its most frequent value.
+
+    This is the same value the Impute preprocessor (used by table_to_standard_dataset)
+    would use for a categorical variable.
+    """
+    nans = np.isnan(column)
+    if not nans.any():
+        return column
+    known = column[~nans].astype(np.intp)
+    column = column.copy()
+    column[nans] = np.argmax(np.bincount(known)) if len(known) else 0
+    return column
+
+
+def get_privileged_mask(data) -> np.ndarray:
+    """
+    Return a boolean array which marks the rows of the data in the privileged group.
+
+    Only the protected attribute column is read from the table, which makes this much
+    cheaper than converting the whole table with the table_to_standard_dataset function.
+    """
+    if not contains_fairness_attributes(data.domain):
+        raise ValueError(MISSING_FAIRNESS_ATTRIBUTES)
+
+    _, protected_attribute, privileged_pa_values = _get_fairness_attributes(data)
+    protected_attribute = data.domain[protected_attribute]
+    privileged_pa_values_indexes = [
+        protected_attribute.values.index(value) for value in privileged_pa_values
+    ]
+    column = _fill_with_most_frequent(data.get_column(protected_attribute))
+    return np.isin(column, privileged_pa_values_indexes)
+
+
+def get_favorable_class_index(domain) -> int:
+    """Return the index of the favorable class value in the values of the class variable."""
+    return domain.class_var.values.index(
+        domain.class_var.attributes["favorable_class_value"]
+    )
+
+
+def get_protected_attribute_index(domain) -> int:
+    """Return the index of the protected attribute in the attributes of the domain."""
+    for index, attribute in enumerate(domain.attributes):
+        if "privileged_pa_values" in attribute.attributes:
+            return index
+    raise ValueError(MISSING_FAIRNESS_ATTRIBUTES)
+
+
+def get_weights_column(data) -> Optional[np.ndarray]:
+    """
+    Return the values of the "weights" meta attribute (added by the reweighing) as floats,
+    or None if the data has no such attribute.
+
+    The index of the column is looked up once for each domain, and the column is a view
+    of the metas when they are stored as floats, so no table is sliced or copied.
+    """
+    index = _weights_index(data.domain)
+    if index is None:
+        return None
+    if sp.issparse(data.metas):
+        return data.metas[:, index].toarray().ravel().astype(float)
+    column = data.metas[:, index]
+    return column if column.dtype == np.float64 else column.astype(float)
+
+
+def get_instance_weights(data) -> Optional[np.ndarray]:
+    """
+    Return the instance weights of the data: the "weights" meta attribute (added by the
+    reweighing) if there is one, otherwise the weights of the table, or None.
+    """
+    weights = get_weights_column(data)
+    if weights is None and data.has_weights():
+        weights = data.W
+    return weights
+
+
+class FairnessView:
+    """
+    The columns of a table read by the fairness algorithms which do not need the features.
+
+    The dataset bias, the reweighing and the fairness scores only depend on the group and
+    the class of each instance (and its weight), so instead of converting the table to a
+    StandardDataset they use these compact arrays, which take 2 bytes per instance (10 with
+    the weights, 6 with float32 weights) and are read directly from the columns of the table.
+
+    Attributes:
+        groups (np.ndarray): int8 vector, 1 for the privileged and 0 for the unprivileged
+            instances; missing values of the protected attribute are replaced with the
+            most frequent value
+        labels (np.ndarray): int8 vector, 1 for the instances with the favorable class,
+            0 for the unfavorable and -1 for the unknown class
+        weights (np.ndarray or None): vector of instance weights, None if all the
+            instances have the weight 1
+        dtype (np.dtype): the dtype of the weights and of the reweighed weights
+    """
+
+    __slots__ = ("groups", "labels", "weights", "dtype")
+
+    def __init__(self, groups, labels, weights=None, dtype=DEFAULT_DTYPE):
+        self.groups = groups
+        self.labels = labels
+        self.weights = weights
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_table(cls, data, dtype=DEFAULT_DTYPE):
+        """
+        Read the groups, the labels and the weights (the "weights" meta attribute or
+        the weights of the table) from the data with the fairness attributes.
+
+        The groups and the labels are index codes, so they are int8 for any dtype
+        (see codes_dtype), which only sets the dtype of the weights.
+        """
+        codes_dtype(dtype)
+        with span("FairnessView", rows=len(data)):
+            groups = get_privileged_mask(data).astype(np.int8)
+            column = data.get_column(data.domain.class_var)
+            labels = (column == get_favorable_class_index(data.domain)).astype(np.int8)
+            labels[np.isnan(column)] = -1
+            weights = get_instance_weights(data)
+            if weights is not None:
+                weights = weights.astype(dtype, copy=False)
+        return cls(groups, labels, weights, dtype)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def subset(self, indices):
+        """Return the view of the given rows (which can repeat)"""
+        return FairnessView(
+            self.groups[indices],
+            self.labels[indices],
+            None if self.weights is None else self.weights[indices],
+            self.dtype,
+        )
+
+    def counts(self):
+        """
+        Return the weighted number of instances with a known class in each group.
+
+        Returns:
+            counts (np.ndarray): 2x2 array of float64 counts, the rows are the groups
+                (unprivileged, privileged) and the columns are the classes (unfavorable,
+                favorable)
+        """
+        known = self.labels >= 0
+        cells = 2 * self.groups[known].astype(np.intp) + self.labels[known]
+        weights = None if self.weights is None else self.weights[known]
+        return np.bincount(cells, weights, minlength=4).astype(float).reshape(2, 2)
+
+    def base_rates(self):
+        """Return the proportions of favorable instances of the unprivileged and
+        privileged group"""
+        counts = self.counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return counts[:, 1] / counts.sum(axis=1)
+
+    def statistical_parity_difference(self):
+        """Difference of the base rates of the unprivileged and privileged group"""
+        unprivileged, privileged = self.base_rates()
+        return unprivileged - privileged
+
+    def disparate_impact(self):
+        """Ratio of the base rates of the unprivileged and privileged group"""
+        unprivileged, privileged = self.base_rates()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return unprivileged / privileged
+
+    def reweighing_factors(self):
+        """
+        Compute the factors of the weights given by the reweighing algorithm.
+
+        The weights of the instances in each group and class are multiplied by
+        the expected (if the class was independent of the group) and observed
+        proportion of the instances in them (Kamiran and Calders, 2012).
+
+        Returns:
+            factors (np.ndarray): 2x2 array indexed by the group and the label
+        """
+        counts = self.counts()
+        expected = np.outer(counts.sum(axis=1), counts.sum(axis=0)) / counts.sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return expected / counts
+
+    def reweighed(self, factors):
+        """
+        Return the weights multiplied by the reweighing factors of each instance.
+
+        The instances with an unknown class get a missing weight.
+        """
+        weights = factors.astype(self.dtype)[self.groups, np.maximum(self.labels, 0)]
+        if self.weights is not None:
+            weights = weights * self.weights
+        weights[self.labels < 0] = np.nan
+        return weights
+
+
+# The scorers of the test results read the fairness columns of the same data for each
+# score (and each model), so the view is made once for each table (and dtype)
+_fairness_views = {
+    np.dtype(DEFAULT_DTYPE): _IdentityCache(lambda data: FairnessView.from_table(data)),
+    np.dtype(np.float32): _IdentityCache(
+        lambda data: FairnessView.from_table(data, np.float32)
+    ),
+}
+
+
+def fairness_view(data, dtype=DEFAULT_DTYPE) -> FairnessView:
+    """
+    Return the (cached) FairnessView of the data; the arrays of the view are shared,
+    so they must not be modified, which subsets (e.g. by the row indices) never do.
+    """
+    codes_dtype(dtype)
+    return _fairness_views[np.dtype(dtype)](data)
+
+
+def _read_only(array):
+    """Return a new read-only array object which shares the buffer with the array"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def _view(array):
+    """
+    Return a new read-only array object which shares the buffers with the given
+    array; the array itself stays writeable
+    """
+    if sp.issparse(array):
+        return type(array)(
+            (
+                _read_only(array.data),
+                _read_only(array.indices),
+                _read_only(array.indptr),
+            ),
+            shape=array.shape,
+            copy=False,
+        )
+    return _read_only(array)
+
+
+def _same_variables(domain1: Domain, domain2: Domain) -> bool:
+    """Check if the domains have variables with the same names, types and values"""
+    for vars1, vars2 in (
+        (domain1.attributes, domain2.attributes),
+        (domain1.class_vars, domain2.class_vars),
+        (domain1.metas, domain2.metas),
+    ):
+        if len(vars1) != len(vars2) or any(
+            var1.name != var2.name
+            or type(var1) is not type(var2)
+            or var1.is_discrete
+            and var1.values != var2.values
+            for var1, var2 in zip(vars1, vars2)
+        ):
+            return False
+    return True
+
+
+def table_with_domain(data: Table, domain: Domain) -> Table:
+    """
+    Create a table with a new domain, which shares the arrays with the data.
+
+    This is used instead of `data.transform(domain)` when the variables of the new domain
+    only differ from the variables of the data in their attributes (e.g. the fairness
+    attributes), so the values are encoded in the same way and nothing needs to be
+    computed or copied. The arrays of the new table are read-only views and the table
+    is locked, so the data can not be changed through it; the data itself stays
+    writeable. Use `table.copy()` to get a table which can be modified.
+
+    Args:
+        domain (Domain): a domain with the same variables, in the same order
+
+    Returns:
+        table (Table): the table with the new domain
+    """
+    if not _same_variables(domain, data.domain):
+        raise ValueError("The domains do not have the same variables.")
+
+    table = type(data)()
+    table.domain = domain
+    with table.unlocked_reference():
+        table.X = _view(data.X)
+        table.Y = _view(data.Y)
+        table.metas = _view(data.metas)
+        table.W = _view(data.W)
+        table.ids = _view(data.ids)
+        table.name = getattr(data, "name", "")
+        table.attributes = deepcopy(getattr(data, "attributes", {}))
+    # Locked regardless of Table.LOCKING, since the views are read-only anyway
+    table._unlocked = 0  # pylint: disable=protected-access
+    return table
+
+
+##############################################################
+# Timing of the stages shown in the widgets
+##############################################################
+
+
+def timing_box(widget, parent):
+    """
+    Add the box which shows the time spent in each stage of the widget's last
+    computation. The box is only shown when the instrumentation is enabled (see the
+    instrumentation module); the label is stored in the widget's timing_label.
+    """
+    box = gui.vBox(parent, "Timing")
+    widget.timing_label = gui.widgetLabel(box, "")
+    box.setVisible(instrumentation.enabled())
+    return box
+
+
+def new_tracer():
+    """Return a Tracer for a widget's computation, None if the instrumentation is disabled"""
+    return instrumentation.Tracer() if instrumentation.enabled() else None
+
+
+def traced(tracer):
+    """Return a context which records into the tracer, if there is one"""
+    return nullcontext() if tracer is None else instrumentation.tracing(tracer)
+
+
+def show_timing(widget, tracer):
+    """Show the stages recorded by the tracer in the widget's timing box"""
+    if tracer is not None:
+        widget.timing_label.setText(tracer.summary())
+
+
+##############################################################
+# Cache of the models fitted by the widgets
+##############################################################
+
+
+MODEL_CACHE_DIR_ENV = "ORANGE_FAIRNESS_MODEL_CACHE"
+
+
+def _update_with_array(digest, array):
+    """Add the shape, the dtype and the values of a (sparse) array to the digest"""
+    if array is None:
+        digest.update(b"none")
+    elif sp.issparse(array):
+        array = sp.csr_matrix(array)
+        digest.update(repr(("csr", array.shape, array.dtype.str)).encode())
+        for part in (array.data, array.indices, array.indptr):
+            digest.update(np.ascontiguousarray(part).data)
+    else:
+        array = np.asarray(array)
+        digest.update(repr((array.shape, array.dtype.str)).encode())
+        if array.dtype == object:
+            # The buffer of an object array holds pointers, not the values
+            digest.update(pickle.dumps(array.tolist(), protocol=4))
+        else:
+            digest.update(np.ascontiguousarray(array).data)
+
+
+def _domain_description(domain: Domain):
+    """
+    Describe the variables of the domain, including the values of the categorical
+    variables and the attributes of the variables (e.g. the fairness attributes).
+
+    The description is the same in every session, so it does not contain the compute
+    values, only whether a variable has one.
+    """
+    return tuple(
+        (
+            part,
+            type(var).__name__,
+            var.name,
+            tuple(var.values) if var.is_discrete else None,
+            sorted((str(key), repr(value)) for key, value in var.attributes.items()),
+            var.compute_value is not None,
+        )
+        for part, variables in (
+            ("attribute", domain.attributes),
+            ("class", domain.class_vars),
+            ("meta", domain.metas),
+        )
+        for var in variables
+    )
+
+
+def _table_fingerprint(data: Table) -> bytes:
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(_domain_description(data.domain)).encode())
+    for array in (data.X, data.Y, data.metas, data.W):
+        _update_with_array(digest, array)
+    return digest.digest()
+
+
+# Tables are locked, so their contents are fingerprinted once
+_table_fingerprints = _IdentityCache(_table_fingerprint)
+
+
+def table_fingerprint(data: Table) -> bytes:
+    """
+    Return the fingerprint of the contents of the table: a hash of the buffers of its
+    arrays (X, Y, metas and W) and the description of its domain. Tables with the same
+    values and variables have the same fingerprint, also in different sessions.
+    """
+    return _table_fingerprints(data)
+
+
+def _learner_description(learner):
+    """
+    Describe the learner's class, name and parameters (the learners of the add-on and
+    Orange store them in params), with the learners among them described in turn.
+    """
+    params = getattr(learner, "params", None)
+    if not isinstance(params, dict):
+        params = vars(learner)
+    return (
+        type(learner).__module__,
+        type(learner).__qualname__,
+        getattr(learner, "name", None),
+        sorted(
+            (name, _learner_description(value) if isinstance(value, Learner) else value)
+            for name, value in params.items()
+            if name not in ("self", "__class__", "callback") and not name.startswith("_")
+        ),
+    )
+
+
+def learner_fingerprint(learner) -> Optional[bytes]:
+    """
+    Return the fingerprint of the learner's class, name and parameters, or None if
+    the parameters can not be pickled.
+    """
+    try:
+        pickled = pickle.dumps(_learner_description(learner), protocol=4)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return hashlib.blake2b(pickled, digest_size=20).digest()
+
+
+def model_cache_key(learner, data: Table) -> Optional[str]:
+    """
+    Return the key of the model fitted by the learner on the data in the ModelCache,
+    None if the learner's fingerprint can not be computed.
+    """
+    learner_digest = learner_fingerprint(learner)
+    if learner_digest is None or data is None:
+        return None
+    return hashlib.blake2b(
+        table_fingerprint(data) + learner_digest, digest_size=20
+    ).hexdigest()
+
+
+class ModelCache:
+    """
+    Least recently used cache of fitted models, so the widgets do not fit a model
+    again when the data and the learner did not change (e.g. after a link is
+    reconnected or a workflow reloaded).
+
+    The memory is bounded by the sizes of the pickled models. The least recently used
+    models are removed when the total size exceeds max_bytes; with a spill directory,
+    they are saved there instead, and the oldest files are removed when their total
+    size exceeds max_spill_bytes. Models which can not be pickled are not cached.
+
+    Models are added and taken from the threads which fit them, since they are pickled
+    to measure their sizes and their keys hash the data.
+
+    Args:
+        max_bytes (int): the maximal total size of the models kept in memory
+        spill_dir (str): the directory for the models removed from memory, or None
+        max_spill_bytes (int): the maximal total size of the files in spill_dir
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, spill_dir=None, max_spill_bytes=2**30):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self._models = OrderedDict()  # key -> (model, size)
+        self._lock = threading.Lock()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, key):
+        path = self._spill_path(key)
+        return key in self._models or path is not None and os.path.exists(path)
+
+    def _spill_path(self, key):
+        if self.spill_dir is None:
+            return None
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Return the model with the key, or None if it is not cached.
+
+        A spilled model is read from its file, which is kept, but it is not added to
+        the memory, so getting a model never pickles the models it would remove.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+        path = self._spill_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                model = pickle.load(f)
+            # The files are removed in the order of their modification times
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return model
+
+    def put(self, key, model):
+        """Add the model with the key to the cache; call it from the fitting thread"""
+        if key is None or model is None:
+            return
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return
+        try:
+            pickled = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # pylint: disable=broad-except
+            return
+        if len(pickled) > self.max_bytes:
+            self._spill(key, pickled)
+            return
+
+        removed = []
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = (model, len(pickled))
+                self.nbytes += len(pickled)
+            while self.nbytes > self.max_bytes:
+                old_key, (old_model, size) = self._models.popitem(last=False)
+                self.nbytes -= size
+                removed.append((old_key, old_model))
+        if self.spill_dir is not None:
+            for old_key, old_model in removed:
+                self._spill(old_key, pickle.dumps(old_model, pickle.HIGHEST_PROTOCOL))
+
+    def clear(self):
+        """Remove the models from memory; the spilled files are kept"""
+        with self._lock:
+            self._models.clear()
+            self.nbytes = 0
+
+    def _spill(self, key, pickled):
+        """Save the pickled model to the spill directory and remove the oldest files"""
+        path = self._spill_path(key)
+        if path is None or len(pickled) > self.max_spill_bytes:
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # The file is renamed when it is complete, so readers never see a part
+            with open(f"{path}.{threading.get_ident()}.tmp", "wb") as f:
+                f.write(pickled)
+            os.replace(f"{path}.{threading.get_ident()}.tmp", path)
+            files = [
+                entry
+                for entry in os.scandir(self.spill_dir)
+                if entry.name.endswith(".pkl")
+            ]
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            total = sum(entry.stat().st_size for entry in files)
+            for entry in files:
+                if total <= self.max_spill_bytes:
+                    break
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# The cache shared by the widgets; models are spilled to the directory given by
+# the environment variable ORANGE_FAIRNESS_MODEL_CACHE, if it is set
+fitted_models = ModelCache(spill_dir=os.environ.get(MODEL_CACHE_DIR_ENV) or None)
+
+
+##############################################################
+# Functions for adding the fairness attributes to the data
+##############################################################
+
+
+def _fairness_domain(
+    domain, favorable_class_value, protected_attribute, privileged_pa_values
+):
+    class_var = domain.class_var
+    if class_var is None or not class_var.is_discrete:
+        raise ValueError(MISSING_CLASS_VARIABLE)
+    if favorable_class_value not in class_var.values:
+        raise ValueError(f"Unknown class value: {favorable_class_value}")
+    if protected_attribute not in [var.name for var in domain.attributes]:
+        raise ValueError(f"Unknown attribute: {protected_attribute}")
+    protected = domain[protected_attribute]
+    if not protected.is_discrete:
+        raise ValueError(f"The protected attribute {protected_attribute} is not categorical.")
+    if not privileged_pa_values or not set(privileged_pa_values) <= set(protected.values):
+        raise ValueError(
+            f"The privileged values must be values of the attribute {protected_attribute}."
+        )
+
+    # Copy the attributes, so the original variables are not changed, add the
+    # privileged values to the protected attribute and remove them from the others
+    new_attributes = []
+    for attribute in domain.attributes:
+        new_attr = attribute.copy()
+        if attribute.name == protected_attribute:
+            new_attr.attributes["privileged_pa_values"] = list(privileged_pa_values)
+        elif "privileged_pa_values" in new_attr.attributes:
+            del new_attr.attributes["privileged_pa_values"]
+        new_attributes.append(new_attr)
+
+    new_class_var = class_var.copy()
+    new_class_var.attributes["favorable_class_value"] = favorable_class_value
+    return Domain(new_attributes, new_class_var, domain.metas)
+
+
+# The annotated domains by the descriptions of the domains and the fairness attributes;
+# a domain is kept only while it is used (e.g. by the annotated tables)
+_fairness_domains = weakref.WeakValueDictionary()
+
+
+def fairness_domain(
+    domain, favorable_class_value, protected_attribute, privileged_pa_values
+) -> Domain:
+    """
+    Create a domain with the fairness attributes, like the As Fairness Data widget.
+
+    The domains are cached, so a domain is annotated once and reused for all tables
+    with the same variables (e.g. tables read from files with the same columns). Unlike
+    Domain's equality, this also compares the values of the categorical variables and
+    the attributes of the variables.
+
+    Args:
+        domain (Domain): the domain of the data
+        favorable_class_value (str): the favorable value of the class variable
+        protected_attribute (str or Variable): the (categorical) protected attribute
+        privileged_pa_values (list of str): the privileged values of the protected attribute
+
+    Returns:
+        domain (Domain): the domain with the fairness attributes
+    """
+    args = (
+        favorable_class_value,
+        getattr(protected_attribute, "name", protected_attribute),
+        tuple(privileged_pa_values),
+    )
+    key = (
+        repr(_domain_description(domain)),
+        tuple(var.compute_value for var in domain.variables + domain.metas),
+        args,
+    )
+    try:
+        new_domain = _fairness_domains.get(key)
+    except TypeError:  # a compute value which can not be hashed
+        return _fairness_domain(domain, *args)
+    if new_domain is None:
+        new_domain = _fairness_domains[key] = _fairness_domain(domain, *args)
+    return new_domain
+
+
+def as_fairness_data(
+    data, favorable_class_value, protected_attribute, privileged_pa_values
+) -> Table:
+    """
+    Add the fairness attributes to the data, like the As Fairness Data widget.
+
+    The returned table shares the arrays with the data (see `table_with_domain`).
+
+    Args:
+        data (Table): the data
+        favorable_class_value (str): the favorable value of the class variable
+        protected_attribute (str or Variable): the (categorical) protected attribute
+        privileged_pa_values (list of str): the privileged values of the protected attribute
+
+    Returns:
+        data (Table): the data with the fairness attributes
+    """
+    domain = fairness_domain(
+        data.domain, favorable_class_value, protected_attribute, privileged_pa_values
+    )
+    return table_with_domain(data, domain)
+
+
+def _annotate_file(path, output_path, fairness_attributes):
+    as_fairness_data(Table(path), *fairness_attributes).save(output_path)
+    return output_path
+
+
+def annotate_files(
+    input_dir,
+    output_dir,
+    favorable_class_value,
+    protected_attribute,
+    privileged_pa_values,
+    n_jobs=None,
+):
+    """
+    Add the fairness attributes to all .tab and .pkl files in a directory.
+
+    The files are read, annotated and saved in parallel processes. The annotated
+    files are saved to the output directory with the same names.
+
+    Args:
+        input_dir (str): the directory with the data files
+        output_dir (str): the directory for the annotated files
+        favorable_class_value (str): the favorable value of the class variable
+        protected_attribute (str): the (categorical) protected attribute
+        privileged_pa_values (list of str): the privileged values of the protected attribute
+        n_jobs (int): the number of processes; by default the number of processors
+
+    Returns:
+        paths (list of str): the paths of the annotated files
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if os.path.splitext(name)[1] in (".tab", ".pkl")
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    fairness_attributes = (
+        favorable_class_value,
+        getattr(protected_attribute, "name", protected_attribute),
+        list(privileged_pa_values),
+    )
+    with ProcessPoolExecutor(n_jobs) as executor:
+        return list(
+            executor.map(
+                _annotate_file,
+                paths,
+                [os.path.join(output_dir, os.path.basename(path)) for path in paths],
+                [fairness_attributes] * len(paths),
+            )
+        )
@@ -40,7 +40,7 @@ setup(
         "orange3 add-on",
         "orange3 fairness",
     ],
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmark", "benchmark.*"]),
     package_data={
         "orangecontrib.fairness.widgets": ["icons/*"],
     },